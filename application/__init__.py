@@ -9,6 +9,7 @@ from flask.logging import default_handler
 from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy.exc import OperationalError
 
 # -------------
 # Configuration
@@ -29,6 +30,7 @@ def init_app():
     # Configure the Flask application
     config_type = os.getenv("CONFIG_TYPE", default="config.DevelopmentConfig")
     app.config.from_object(config_type)
+    apply_engine_profile(app)
 
     initialize_extensions(app)
     register_blueprints(app)
@@ -42,11 +44,17 @@ def init_app():
         f" TESTING={app.config['TESTING']}"
         f" SQLALCHEMY_DATABASE_URI={app.config['SQLALCHEMY_DATABASE_URI']}"
         f" CACHE_TYPE={app.config['CACHE_TYPE']}"
+        f" SQLITE_ENGINE_PROFILE={app.config['SQLITE_ENGINE_PROFILE']}"
     )
 
     if config_type in ("config.DevelopmentConfig", "config.ProductionConfig"):
         run_warm_up_queries(app, "app.db")
 
+    if app.config["WARM_CACHE_ON_STARTUP"]:
+        from application.search_page.cache_warming import start_search_cache_warming
+
+        start_search_cache_warming(app)
+
     return app
 
 
@@ -68,9 +76,46 @@ def register_blueprints(app):
 
 
 def initialize_extensions(app):
+    from application.search_page.preview_cache import preview_cache
+    from application.search_page.search_cache import search_cache
+    from application.search_page.search_pipeline import init_stage_executor
+
     db.init_app(app)
     csrf.init_app(app)
     cache.init_app(app)
+    preview_cache.init_app(app, backend=cache)
+    search_cache.init_app(app, backend=cache)
+    init_stage_executor(app)
+
+    register_database_events(app)
+
+
+def apply_engine_profile(app):
+    from application.database_events import (
+        ENGINE_PROFILE_READ_ONLY,
+        get_read_only_database_uri,
+    )
+
+    if app.config["SQLITE_ENGINE_PROFILE"] == ENGINE_PROFILE_READ_ONLY:
+        app.config["SQLALCHEMY_DATABASE_URI"] = get_read_only_database_uri(
+            app.config["SQLALCHEMY_DATABASE_URI"]
+        )
+
+
+def register_database_events(app):
+    from application.database_events import (
+        ENGINE_PROFILE_READ_ONLY,
+        set_page_text_decompression,
+        set_pragmas,
+        set_query_time_budget,
+    )
+
+    with app.app_context():
+        set_query_time_budget(db.engine, app.config["SEARCH_QUERY_TIME_BUDGET"])
+        set_page_text_decompression(db.engine)
+
+        if app.config["SQLITE_ENGINE_PROFILE"] == ENGINE_PROFILE_READ_ONLY:
+            set_pragmas(db.engine, app.config["SQLITE_READ_ONLY_PRAGMAS"])
 
 
 def register_error_pages(app):
@@ -82,6 +127,16 @@ def register_error_pages(app):
     def method_not_allowed(e):
         return render_template("405.html"), 405
 
+    @app.errorhandler(OperationalError)
+    def query_interrupted(e):
+        # only the queries interrupted because they exceeded the
+        # SEARCH_QUERY_TIME_BUDGET are handled
+        if "interrupted" not in str(e.orig):
+            raise e
+
+        app.logger.error(f"Query interrupted because it exceeded the time budget: {e}")
+        return render_template("no_results_found.html", search_interrupted=True), 503
+
 
 def configure_logging(app):
     # Logging Configuration
@@ -137,11 +192,11 @@ def run_warm_up_queries(app, database_name):
 
                 c.execute(
                     """
-                    SELECT mnc.id, mnc.magazine_number_id, mnc.magazine_page,
-                    mncf.rowid
-                    FROM magazine_number_content mnc
+                    SELECT sh.id, sh.name, sh.year, sh.magazine_number,
+                    sh.magazine_page, sh.magazine_number_link, mncf.rowid
+                    FROM search_hits sh
                     INNER JOIN magazine_number_content_fts mncf
-                    ON mnc.rowid = mncf.rowid
+                    ON sh.id = mncf.rowid
                     """
                 )
                 res = c.fetchall()
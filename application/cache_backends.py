@@ -0,0 +1,433 @@
+"""cache_backends module
+
+This module contains the Flask-Caching backends of the app. TwoTierCache keeps
+the hot entries in a bounded LRU dictionary in the memory of each process, in
+front of a shared backend (Redis in production), so the lookups of the terms a
+worker sees often don't go over the network. get_cache_lock() returns a lock
+of a key shared by all the processes that use a backend: a Redis lock, or a
+file lock for the shared backends that don't have a server (like
+FileSystemCache).
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from cachelib import NullCache as CachelibNullCache
+from cachelib import SimpleCache
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.nullcache import NullCache
+from werkzeug.utils import import_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# The backends that keep their data in the memory of each process, so the
+# processes don't share it
+PROCESS_BACKENDS = (SimpleCache, NullCache, CachelibNullCache)
+
+
+class TwoTierCache(BaseCache):
+    """
+    A Flask-Caching backend with an in-process LRU tier in front of a remote
+    backend.
+
+    The reads look up the local tier first and the keys it misses are read
+    from the remote backend (get_many() reads all of them with a single call)
+    and stored locally. The writes go to the remote backend first and then to
+    the local tier (write-through). The local tier is bounded by a number of
+    entries and by their approximate size in bytes, and its entries expire
+    after local_timeout seconds, so an entry changed by another process is
+    seen at most local_timeout seconds later. With an invalidation channel the
+    keys written or deleted by a process are also removed right away from the
+    local tier of the other processes.
+
+    Args:
+        remote (flask_caching.backends.base.BaseCache): The shared backend.
+        max_entries (int): The maximum number of entries of the local tier.
+        Default is 1 000.
+        max_bytes (int): The maximum approximate size in bytes of the entries of
+        the local tier. Default is 16 MiB.
+        local_timeout (int): The number of seconds an entry is kept in the local
+        tier (at most the timeout it was written with). Default is 30.
+        invalidation (RedisInvalidation or None): The channel the written and
+        deleted keys are published on. Default is None (no invalidation).
+        default_timeout (int): The default timeout of the entries of the remote
+        backend, in seconds. Default is 300.
+    """
+
+    def __init__(
+        self,
+        remote,
+        max_entries=1_000,
+        max_bytes=16 * 1024 * 1024,
+        local_timeout=30,
+        invalidation=None,
+        default_timeout=300,
+    ):
+        super().__init__(default_timeout=default_timeout)
+        self.remote = remote
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.local_timeout = local_timeout
+        self.invalidation = invalidation
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory = 0
+        self._instance_id = uuid.uuid4().hex
+        self._subscribed_pid = None
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        remote_type = config.get("CACHE_TWO_TIER_REMOTE_TYPE", "NullCache")
+        if "." not in remote_type:
+            remote_type = "flask_caching.backends." + remote_type
+        remote = import_string(remote_type).factory(app, config, args, dict(kwargs))
+
+        invalidation = None
+        if config.get("CACHE_TWO_TIER_INVALIDATION"):
+            invalidation = RedisInvalidation(
+                remote._write_client,
+                config.get("CACHE_KEY_PREFIX", "") + "two_tier_invalidation",
+            )
+
+        return cls(
+            remote,
+            max_entries=config.get("CACHE_TWO_TIER_MAX_ENTRIES", 1_000),
+            max_bytes=config.get("CACHE_TWO_TIER_MAX_BYTES", 16 * 1024 * 1024),
+            local_timeout=config.get("CACHE_TWO_TIER_LOCAL_TIMEOUT", 30),
+            invalidation=invalidation,
+            default_timeout=kwargs.get("default_timeout", 300),
+        )
+
+    def get(self, key):
+        self._subscribe()
+        found, value = self._get_locally(key)
+        if found:
+            return value
+
+        value = self.remote.get(key)
+        if value is not None:
+            self._store_locally(key, value, None)
+
+        return value
+
+    def get_many(self, *keys):
+        self._subscribe()
+        values = {}
+        missing_keys = []
+        for key in keys:
+            found, value = self._get_locally(key)
+            if found:
+                values[key] = value
+            else:
+                missing_keys.append(key)
+
+        if missing_keys:
+            for key, value in zip(missing_keys, self.remote.get_many(*missing_keys)):
+                values[key] = value
+                if value is not None:
+                    self._store_locally(key, value, None)
+
+        return [values[key] for key in keys]
+
+    def has(self, key):
+        return self._get_locally(key)[0] or self.remote.has(key)
+
+    def set(self, key, value, timeout=None):
+        result = self.remote.set(key, value, timeout=timeout)
+        if result:
+            self._store_locally(key, value, timeout)
+            self._publish([key])
+
+        return result
+
+    def add(self, key, value, timeout=None):
+        result = self.remote.add(key, value, timeout=timeout)
+        if result:
+            self._store_locally(key, value, timeout)
+            self._publish([key])
+
+        return result
+
+    def set_many(self, mapping, timeout=None):
+        result = self.remote.set_many(mapping, timeout=timeout)
+        for key in result:
+            self._store_locally(key, mapping[key], timeout)
+        self._publish(list(result))
+
+        return result
+
+    def delete(self, key):
+        self._delete_locally([key])
+        self._publish([key])
+
+        return self.remote.delete(key)
+
+    def delete_many(self, *keys):
+        self._delete_locally(keys)
+        self._publish(list(keys))
+
+        return self.remote.delete_many(*keys)
+
+    def clear(self):
+        self._clear_locally()
+        self._publish(None)
+
+        return self.remote.clear()
+
+    def inc(self, key, delta=1):
+        self._delete_locally([key])
+        self._publish([key])
+
+        return self.remote.inc(key, delta=delta)
+
+    def dec(self, key, delta=1):
+        self._delete_locally([key])
+        self._publish([key])
+
+        return self.remote.dec(key, delta=delta)
+
+    @property
+    def stats(self):
+        """The number and approximate size in bytes of the local entries."""
+        with self._lock:
+            return {"entries": len(self._entries), "memory_bytes": self._memory}
+
+    def _get_locally(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+
+            expires, value, size = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self._memory -= size
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, value
+
+    def _store_locally(self, key, value, timeout):
+        if self.max_entries < 1:
+            return
+
+        local_timeout = self.local_timeout
+        timeout = self._normalize_timeout(timeout)
+        if timeout > 0:
+            local_timeout = min(local_timeout, timeout)
+
+        size = self._get_size(key, value)
+        if size > self.max_bytes:
+            self._delete_locally([key])
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._memory -= self._entries.pop(key)[2]
+            self._entries[key] = (time.monotonic() + local_timeout, value, size)
+            self._memory += size
+
+            while (
+                len(self._entries) > self.max_entries or self._memory > self.max_bytes
+            ):
+                self._memory -= self._entries.popitem(last=False)[1][2]
+
+    def _delete_locally(self, keys):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._memory -= entry[2]
+
+    def _clear_locally(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+    def _publish(self, keys):
+        if self.invalidation is not None:
+            self.invalidation.publish(self._instance_id, keys)
+
+    def _subscribe(self):
+        # the subscription is started in each process (the processes of the
+        # workers are forked after the app is created)
+        if self.invalidation is None or self._subscribed_pid == os.getpid():
+            return
+
+        self._subscribed_pid = os.getpid()
+        self._instance_id = uuid.uuid4().hex
+        self.invalidation.subscribe(self._invalidate)
+
+    def _invalidate(self, instance_id, keys):
+        # the keys written by this process are already up to date locally
+        if instance_id == self._instance_id:
+            return
+
+        if keys is None:
+            self._clear_locally()
+        else:
+            self._delete_locally(keys)
+
+    @staticmethod
+    def _get_size(key, value):
+        if isinstance(value, (bytes, str)):
+            value_size = sys.getsizeof(value)
+        else:
+            value_size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+        return sys.getsizeof(key) + value_size
+
+
+class RedisInvalidation:
+    """
+    The Redis Pub/Sub channel the keys written or deleted by a TwoTierCache are
+    published on, so the other processes remove them from their local tier.
+
+    Args:
+        client (redis.Redis): The Redis client of the remote backend.
+        channel (str): The name of the channel.
+    """
+
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+        self._thread = None
+
+    def publish(self, instance_id, keys):
+        """Publish the keys changed by a cache (None when it was cleared)."""
+        self.client.publish(self.channel, json.dumps([instance_id, keys]))
+
+    def subscribe(self, callback):
+        """
+        Call callback(instance_id, keys) for every message of the channel, from
+        a daemon thread.
+        """
+
+        def handle_message(message):
+            callback(*json.loads(message["data"]))
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: handle_message})
+        self._thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+
+class RedisLock:
+    """
+    A lock shared by the processes that use a Redis server.
+
+    The lock expires after timeout seconds, so a worker that dies while it
+    holds the lock doesn't block the others.
+
+    Args:
+        client (redis.Redis): The Redis client of the backend.
+        name (str): The name of the lock.
+        timeout (int): The number of seconds after which the lock expires.
+    """
+
+    def __init__(self, client, name, timeout):
+        self._lock = client.lock(name, timeout=timeout)
+
+    def acquire(self, blocking=True, blocking_timeout=None):
+        """Acquire the lock, returns whether it was acquired."""
+        return self._lock.acquire(blocking=blocking, blocking_timeout=blocking_timeout)
+
+    def release(self):
+        """Release the lock, unless it already expired."""
+        from redis.exceptions import LockError
+
+        try:
+            self._lock.release()
+        except LockError:
+            # the lock expired and may be held by another worker now
+            pass
+
+
+class FileLock:
+    """
+    A lock shared by the processes of a machine, held on a lock file with
+    flock(). The lock is released by the system if its process dies.
+
+    Args:
+        path (str): The path of the lock file, created if it doesn't exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking=True, blocking_timeout=None):
+        """Acquire the lock, returns whether it was acquired."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, "a")
+
+        deadline = None
+        if blocking_timeout is not None:
+            deadline = time.monotonic() + blocking_timeout
+
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not blocking or (
+                    deadline is not None and time.monotonic() >= deadline
+                ):
+                    lock_file.close()
+                    return False
+                time.sleep(0.01)
+            else:
+                self._file = lock_file
+                return True
+
+    def release(self):
+        """Release the lock."""
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+def get_cache_lock(backend, name, timeout, lock_folder):
+    """
+    Get the lock of a key shared by all the processes that use a
+    Flask-Caching backend.
+
+    A Redis backend (also as the remote backend of a TwoTierCache) gets a
+    Redis lock. The other shared backends get a file lock in lock_folder named
+    after the key, shared by the processes of the machine. A backend that
+    keeps its data in the memory of each process (like SimpleCache) gets no
+    lock, since a process can't use the data computed by another one.
+
+    Args:
+        backend (flask_caching.backends.base.BaseCache): The backend.
+        name (str): The name of the lock, like the key it protects.
+        timeout (int): The number of seconds after which a Redis lock expires.
+        lock_folder (str): The folder of the lock files.
+
+    Returns:
+        lock (RedisLock, FileLock or None): The lock, or None if the processes
+        don't share the backend or can't share a lock (a backend without a
+        server on Windows).
+    """
+
+    if isinstance(backend, TwoTierCache):
+        backend = backend.remote
+
+    client = getattr(backend, "_write_client", None)
+    if client is not None:
+        return RedisLock(client, f"{backend.key_prefix}lock_{name}", timeout)
+
+    if fcntl is None or isinstance(backend, PROCESS_BACKENDS):
+        return None
+
+    # the name is hashed since a key can contain any character
+    lock_file = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    return FileLock(os.path.join(lock_folder, f"{lock_file}.lock"))
@@ -5,11 +5,26 @@ import click
 from flask import Blueprint, current_app
 
 from application.cli_database.cli_data_repository import (
+    compress_page_texts,
     create_database,
+    create_folded_content_table,
+    create_fts_shard_tables,
     create_fts_table,
+    create_fts_vocab_table,
     create_magazine_details_table,
+    create_search_hits_table,
+    create_trigram_fts_table,
+    stamp_database_build_id,
     write_data_to_database,
 )
+from application.page_text_compression import PAGE_TEXT_VIEW
+from application.search_page.cache_warming import (
+    format_warming_report,
+    get_top_search_terms,
+    read_search_log_terms,
+    read_term_list,
+    warm_search_cache,
+)
 
 # Blueprint Configuration
 cli_database_bp = Blueprint("cli_database_bp", __name__, cli_group="database")
@@ -54,6 +69,16 @@ def create_new_database(name):
     create_database_files_path = Path(current_app.config["DATABASE_FILES"])
     files_to_tables = current_app.config["FILES_TO_TABLES"]
     accepted_special_characters = current_app.config["ACCEPTED_FTS5_SPECIAL_CHARACTERS"]
+    prefix_index_lengths = current_app.config["FTS5_PREFIX_INDEX_LENGTHS"]
+    trigram_index = current_app.config["FTS5_TRIGRAM_INDEX"]
+    shards = current_app.config["FTS5_SHARDS"]
+    folded_content = current_app.config["PREVIEW_FOLDED_CONTENT"]
+    page_text_compression = current_app.config["PAGE_TEXT_COMPRESSION"]
+    # the fts5 tables of a database with compressed pages read the text of the
+    # pages from a view that decompresses it
+    content_table = (
+        PAGE_TEXT_VIEW if page_text_compression else "magazine_number_content"
+    )
 
     # check if a database file with the requested name already exists
     if database_path.is_file():
@@ -82,12 +107,125 @@ def create_new_database(name):
     # create and populate magazine_details table
     create_magazine_details_table(database_path)
 
+    # create and populate search_hits table
+    create_search_hits_table(database_path)
+
+    # create and populate the magazine_number_content_folded table used by the
+    # previews
+    if folded_content:
+        create_folded_content_table(database_path)
+
     # create and populate the fts table
     create_fts_table(
-        database_path, accepted_special_characters=accepted_special_characters
+        database_path,
+        accepted_special_characters=accepted_special_characters,
+        prefix_index_lengths=prefix_index_lengths,
+        content_table=content_table,
+    )
+    create_fts_vocab_table(database_path, "magazine_number_content_fts")
+
+    # create and populate the fts shard tables searched concurrently
+    if shards > 1:
+        create_fts_shard_tables(
+            database_path,
+            shards,
+            accepted_special_characters=accepted_special_characters,
+            prefix_index_lengths=prefix_index_lengths,
+            content_table=content_table,
+        )
+
+    # create and populate the trigram fts table used by the substring searches
+    if trigram_index:
+        build_time, index_size = create_trigram_fts_table(database_path)
+        create_fts_vocab_table(database_path, "magazine_number_content_trigram_fts")
+        print(
+            f"trigram index built in {build_time:.2f} s,"
+            f" size: {index_size / 1024 / 1024:.2f} MiB"
+        )
+
+    # compress the text of the pages, once all the tables built from it are
+    # created
+    if page_text_compression:
+        report = compress_page_texts(
+            database_path,
+            use_dictionary=current_app.config["PAGE_TEXT_COMPRESSION_DICTIONARY"],
+            level=current_app.config["PAGE_TEXT_COMPRESSION_LEVEL"],
+        )
+        saving = (
+            (1 - report["compressed_size"] / report["text_size"]) * 100
+            if report["text_size"]
+            else 0.0
+        )
+        print(
+            f"page text compressed: {report['text_size'] / 1024 / 1024:.2f} MiB"
+            f" -> {report['compressed_size'] / 1024 / 1024:.2f} MiB"
+            f" ({saving:.1f}%"
+            f" saved, dictionary: {report['dictionary_size'] / 1024:.1f} KiB),"
+            f" database file: {report['database_size_before'] / 1024 / 1024:.2f}"
+            f" MiB -> {report['database_size_after'] / 1024 / 1024:.2f} MiB,"
+            " decompression per preview:"
+            f" mean {report['decompression_time_mean'] * 1000:.3f} ms,"
+            f" p95 {report['decompression_time_p95'] * 1000:.3f} ms"
+        )
+
+    # the build id namespaces the keys of the cached search data
+    build_id = stamp_database_build_id(database_path)
+
+    print(f"database {name} created in {database_folder} (build id: {build_id})")
+
+
+@cli_database_bp.cli.command("warm-cache")
+@click.option("--top", type=int, help="The number of terms warmed.")
+@click.option(
+    "--terms-file",
+    type=click.Path(exists=True, dir_okay=False),
+    help="A file with a term on each line, read instead of the log of the app.",
+)
+@click.option("--log-file", help="The log of the app the terms are read from.")
+@click.option("--workers", type=int, help="The number of terms warmed at a time.")
+def warm_cache(top, terms_file, log_file, workers):
+    """
+    Fill the search cache with the most frequent searches.
+
+    This command reads the searched terms from the log of the app (or from a
+    term list) and caches the counts and the ids of the results of the most
+    frequent terms, and the previews of their first results page. The cache
+    must be shared with the app (like the Redis backend in production), the
+    in-memory backends are filled only in the process of the command.
+
+    Args:
+        top (int or None): The number of terms warmed. Default is None
+        (WARM_CACHE_TOP_TERMS).
+        terms_file (str or None): The path of the term list. Default is None
+        (the terms are read from the log of the app).
+        log_file (str or None): The path of the log of the app. Default is None
+        (WARM_CACHE_LOG_FILE).
+        workers (int or None): The number of terms warmed at a time. Default is
+        None (WARM_CACHE_WORKERS).
+
+    Returns:
+        None
+    """
+    if terms_file:
+        terms = read_term_list(terms_file)
+    else:
+        terms = read_search_log_terms(
+            log_file or current_app.config["WARM_CACHE_LOG_FILE"]
+        )
+
+    top_terms = get_top_search_terms(
+        terms, top or current_app.config["WARM_CACHE_TOP_TERMS"]
+    )
+    if not top_terms:
+        raise click.UsageError(message="no searched terms found to warm the cache.")
+
+    report = warm_search_cache(
+        current_app._get_current_object(),
+        top_terms,
+        workers=workers or current_app.config["WARM_CACHE_WORKERS"],
     )
 
-    print(f"database {name} created in {database_folder}")
+    print(format_warming_report(report))
 
 
 @cli_database_bp.cli.command("remove")
@@ -5,7 +5,24 @@ functions that read data from CSV files.
 """
 
 import csv
+import os
 import sqlite3
+import statistics
+import time
+import uuid
+
+from application.page_text_compression import (
+    PAGE_TEXT_DICTIONARY_TABLE,
+    PAGE_TEXT_VIEW,
+    compress_page_text,
+    decompress_page_text,
+    train_compression_dictionary,
+)
+from application.search_page.previews import (
+    convert_diacritics_to_basic_latin_characters,
+    fold_text,
+    replace_multiple_extra_white_spaces_with_just_one,
+)
 
 
 def create_database(database_path):
@@ -225,12 +242,159 @@ def create_magazine_details_table(database_path):
         )
 
 
-def create_fts_table(database_path, accepted_special_characters=""):
+def create_search_hits_table(database_path):
+    """
+    Create and populate search_hits table in a SQLite database.
+
+    The search_hits table holds, for every magazine page, all the details that
+    are displayed for a search result, so a search only has to join the fts
+    table with this table instead of joining magazines, magazine_year,
+    magazine_number and magazine_number_content. The table is keyed by the
+    magazine_number_content id (the rowid of the fts table) and the
+    display_order column holds the position of the page when all pages are
+    ordered by year, magazine number and page, so the results can be ordered
+    by a single integer column.
+
+    Notes:
+        - this function assumes that 'database_path' points to an existing SQLite
+    database already created with write_data_to_database() function.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+    Returns:
+        None
+    """
+    conn = sqlite3.connect(database_path)
+    conn.execute("PRAGMA foreign_keys = 1")  # to enable foreign keys
+    c = conn.cursor()
+
+    with conn:
+        c.executescript(
+            """
+            DROP TABLE IF EXISTS search_hits
+            ;
+
+            CREATE TABLE IF NOT EXISTS search_hits(
+            id integer PRIMARY KEY,
+            display_order integer UNIQUE,
+            name text,
+            year text,
+            magazine_number text,
+            magazine_page integer,
+            magazine_number_link text
+            )
+            ;
+
+            INSERT INTO search_hits(
+                id,
+                display_order,
+                name,
+                year,
+                magazine_number,
+                magazine_page,
+                magazine_number_link
+                )
+            SELECT
+                mnc.id,
+                ROW_NUMBER() OVER (
+                    ORDER BY my.year, mn.magazine_number, mnc.magazine_page, mnc.id
+                ),
+                m.name,
+                my.year,
+                mn.magazine_number,
+                mnc.magazine_page,
+                mn.magazine_number_link
+            FROM magazines m
+            INNER JOIN magazine_year my ON m.id = my.magazine_id
+            INNER JOIN magazine_number mn ON my.id = mn.magazine_year_id
+            INNER JOIN magazine_number_content mnc ON mn.id = mnc.magazine_number_id
+            ORDER BY mnc.id
+            ;
+            """
+        )
+
+
+def create_folded_content_table(database_path):
+    """
+    Create and populate magazine_number_content_folded table in a SQLite
+    database.
+
+    Creates and populates a 'magazine_number_content_folded' table with, for
+    every page, its content with the extra white spaces removed (the
+    normalized content the previews are built from) and the normalized
+    content with the diacritics converted to basic Latin characters and the
+    letters in lowercase (see fold_text()). The folded content has the same
+    length as the normalized content, so the previews can find the searched
+    term in it and use the same indexes in the normalized content, without
+    converting the content of the page when it is displayed.
+
+    Notes:
+        - this function assumes that 'database_path' points to an existing SQLite
+    database already created with write_data_to_database() function.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+    Returns:
+        None
+    """
+    conn = sqlite3.connect(database_path)
+    conn.execute("PRAGMA foreign_keys = 1")  # to enable foreign keys
+    conn.create_function(
+        "normalize_content",
+        1,
+        lambda content: replace_multiple_extra_white_spaces_with_just_one(
+            content or ""
+        ),
+        deterministic=True,
+    )
+    conn.create_function("fold_content", 1, fold_text, deterministic=True)
+    c = conn.cursor()
+
+    with conn:
+        # create the magazine_number_content_folded table
+        c.execute(
+            """
+            CREATE TABLE magazine_number_content_folded(
+            id integer PRIMARY KEY,
+            magazine_content_normalized text,
+            magazine_content_folded text,
+            FOREIGN KEY(id) REFERENCES magazine_number_content(id))
+            """
+        )
+
+        # populate the magazine_number_content_folded table
+        c.execute(
+            """
+            INSERT INTO magazine_number_content_folded(
+            id, magazine_content_normalized, magazine_content_folded)
+            SELECT id, normalized_content, fold_content(normalized_content)
+            FROM (
+                SELECT id, normalize_content(magazine_content) AS normalized_content
+                FROM magazine_number_content
+            )
+            """
+        )
+
+
+def create_fts_table(
+    database_path,
+    accepted_special_characters="",
+    prefix_index_lengths=(),
+    table_name="magazine_number_content_fts",
+    magazine_ids=None,
+    content_table="magazine_number_content",
+):
     """
     Create and populate magazine_number_content_fts table in a SQLite database.
 
-    Creates and populates a contentless 'magazine_number_content_fts' table
-    using the SQLite fts5 extension with the 'Unicode61' tokenizer.
+    Creates and populates an external content 'magazine_number_content_fts'
+    table using the SQLite fts5 extension with the 'Unicode61' tokenizer. The
+    text is not copied into the table, it is read from the
+    magazine_number_content table when needed, so the fts5 snippet() and
+    highlight() functions can be used on the results. For every
+    length in prefix_index_lengths fts5 also indexes the prefixes of that many
+    characters, so a prefix query ("term"*) with a term of that length reads a
+    single entry of the index instead of all the terms that start with it.
 
     Notes:
         - this function assumes that 'database_path' points to an existing SQLite
@@ -240,20 +404,52 @@ def create_fts_table(database_path, accepted_special_characters=""):
         database_path (Path): The path to the SQLite database file.
         accepted_special_characters (str): A string containing unicode characters
         that should be considered token characters by the tokenizer.
+        prefix_index_lengths (iterable of int): The lengths (in characters) of
+        the prefixes to index. Default is () (no prefix index).
+        table_name (str): The name of the fts table. Default is
+        "magazine_number_content_fts".
+        magazine_ids (iterable of int or None): If given, only the pages of
+        these magazines are indexed (see create_fts_shard_tables()). Default
+        is None (all the pages are indexed).
+        content_table (str): The table (or view) the text of the pages is read
+        from by the fts5 auxiliary functions. Default is
+        "magazine_number_content" (PAGE_TEXT_VIEW if the pages are compressed
+        afterwards, see compress_page_texts()).
     Returns:
         None
     """
+    prefix_option = ""
+    if prefix_index_lengths:
+        prefix_option = (
+            "prefix = '"
+            + " ".join(str(int(length)) for length in prefix_index_lengths)
+            + "',"
+        )
+
+    magazine_filter = ""
+    if magazine_ids is not None:
+        magazine_filter = f"""
+            WHERE magazine_number_id IN (
+                SELECT mn.id
+                FROM magazine_number mn
+                INNER JOIN magazine_year my ON my.id = mn.magazine_year_id
+                WHERE my.magazine_id IN ({", ".join(str(int(magazine_id)) for magazine_id in magazine_ids)})
+            )
+            """
+
     conn = sqlite3.connect(database_path)
     conn.execute("PRAGMA foreign_keys = 1")  # to enable foreign keys
     c = conn.cursor()
 
     with conn:
-        # create the magazine_number_content_fts fts5 contentless table
+        # create the magazine_number_content_fts fts5 external content table
         c.execute(
             f"""
-            CREATE VIRTUAL TABLE magazine_number_content_fts USING fts5(
+            CREATE VIRTUAL TABLE {table_name} USING fts5(
                 magazine_content,
-                content='',
+                content='{content_table}',
+                content_rowid='id',
+                {prefix_option}
                 tokenize = "unicode61 remove_diacritics 2 tokenchars '{accepted_special_characters}'"
                 )
             """
@@ -261,8 +457,425 @@ def create_fts_table(database_path, accepted_special_characters=""):
 
         # populate the fts table
         c.execute(
-            """
-            INSERT INTO magazine_number_content_fts(rowid, magazine_content)
+            f"""
+            INSERT INTO {table_name}(rowid, magazine_content)
             SELECT id, magazine_content FROM magazine_number_content
+            {magazine_filter}
+            """
+        )
+
+
+def get_magazine_ids_by_shard(database_path, shards):
+    """
+    Split the magazines into shards with about the same number of pages.
+
+    The magazines are assigned, from the one with the most pages to the one
+    with the fewest, to the shard with the fewest pages so far. All the pages
+    of a magazine are in the same shard.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+        shards (int): The number of shards.
+    Returns:
+        magazine_ids_by_shard (list of list): The ids of the magazines of each
+        shard.
+    """
+    conn = sqlite3.connect(database_path)
+    c = conn.cursor()
+    pages_by_magazine = c.execute(
+        """
+        SELECT m.id, COUNT(mnc.id) AS pages
+        FROM magazines m
+        LEFT JOIN magazine_year my ON m.id = my.magazine_id
+        LEFT JOIN magazine_number mn ON my.id = mn.magazine_year_id
+        LEFT JOIN magazine_number_content mnc ON mn.id = mnc.magazine_number_id
+        GROUP BY m.id
+        ORDER BY pages DESC, m.id
+        """
+    ).fetchall()
+    conn.close()
+
+    magazine_ids_by_shard = [[] for _ in range(shards)]
+    pages_by_shard = [0] * shards
+    for magazine_id, pages in pages_by_magazine:
+        shard = pages_by_shard.index(min(pages_by_shard))
+        magazine_ids_by_shard[shard].append(magazine_id)
+        pages_by_shard[shard] += pages
+
+    return magazine_ids_by_shard
+
+
+def create_fts_shard_tables(
+    database_path,
+    shards,
+    accepted_special_characters="",
+    prefix_index_lengths=(),
+    content_table="magazine_number_content",
+):
+    """
+    Create and populate the magazine_number_content_fts_shard_<n> tables in a
+    SQLite database.
+
+    The pages are split by magazine into 'shards' fts5 tables created like the
+    magazine_number_content_fts table (see create_fts_table()), so a search
+    can query them concurrently, one thread for each shard.
+
+    Notes:
+        - this function assumes that 'database_path' points to an existing SQLite
+    database already created with write_data_to_database() function.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+        shards (int): The number of shard tables.
+        accepted_special_characters (str): A string containing unicode characters
+        that should be considered token characters by the tokenizer.
+        prefix_index_lengths (iterable of int): The lengths (in characters) of
+        the prefixes to index. Default is () (no prefix index).
+        content_table (str): The table (or view) the text of the pages is read
+        from by the fts5 auxiliary functions. Default is
+        "magazine_number_content".
+    Returns:
+        None
+    """
+    magazine_ids_by_shard = get_magazine_ids_by_shard(database_path, shards)
+
+    for shard, magazine_ids in enumerate(magazine_ids_by_shard):
+        create_fts_table(
+            database_path,
+            accepted_special_characters=accepted_special_characters,
+            prefix_index_lengths=prefix_index_lengths,
+            table_name=f"magazine_number_content_fts_shard_{shard}",
+            magazine_ids=magazine_ids,
+            content_table=content_table,
+        )
+
+
+def create_trigram_fts_table(database_path):
+    """
+    Create and populate magazine_number_content_trigram_fts table in a SQLite
+    database.
+
+    Creates and populates a contentless 'magazine_number_content_trigram_fts'
+    table using the SQLite fts5 extension with the 'trigram' tokenizer. The
+    table indexes every sequence of three characters of the content, so a
+    MATCH query can find a term anywhere inside a word (not only at its start)
+    without scanning the content. The trigram tokenizer of this SQLite version
+    can't remove diacritics, so they are converted to basic Latin characters
+    before the content is indexed (and the searched term has to be converted
+    the same way).
+
+    Notes:
+        - this function assumes that 'database_path' points to an existing SQLite
+    database already created with write_data_to_database() function.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+    Returns:
+        build_time, index_size (tuple): The time in seconds it took to build
+        the table and the number of bytes it added to the database file.
+    """
+    conn = sqlite3.connect(database_path)
+    conn.execute("PRAGMA foreign_keys = 1")  # to enable foreign keys
+    conn.create_function(
+        "convert_diacritics",
+        1,
+        convert_diacritics_to_basic_latin_characters,
+        deterministic=True,
+    )
+    c = conn.cursor()
+
+    page_size = c.execute("PRAGMA page_size").fetchone()[0]
+    page_count_before = c.execute("PRAGMA page_count").fetchone()[0]
+    start = time.perf_counter()
+
+    with conn:
+        # create the magazine_number_content_trigram_fts fts5 contentless table
+        c.execute(
+            """
+            CREATE VIRTUAL TABLE magazine_number_content_trigram_fts USING fts5(
+                magazine_content,
+                content='',
+                tokenize = "trigram case_sensitive 0"
+                )
+            """
+        )
+
+        # populate the fts table
+        c.execute(
+            """
+            INSERT INTO magazine_number_content_trigram_fts(rowid, magazine_content)
+            SELECT id, convert_diacritics(magazine_content)
+            FROM magazine_number_content
+            """
+        )
+
+    build_time = time.perf_counter() - start
+    page_count_after = c.execute("PRAGMA page_count").fetchone()[0]
+    conn.close()
+
+    return build_time, (page_count_after - page_count_before) * page_size
+
+
+def create_fts_vocab_table(database_path, fts_table_name):
+    """
+    Create an fts5vocab table for a fts5 table in a SQLite database.
+
+    Creates a '<fts_table_name>_vocab' table of the 'row' type, with one row
+    for each term of the fts5 table: the term, the number of rows that contain
+    it (doc) and the number of its occurrences (cnt). The table reads the
+    index of the fts5 table, so it doesn't need to be populated, and it is used
+    to estimate the number of results of a search before running it.
+
+    Notes:
+        - this function assumes that 'database_path' points to an existing SQLite
+    database with a fts5 table named 'fts_table_name'.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+        fts_table_name (str): The name of the fts5 table.
+    Returns:
+        None
+    """
+    conn = sqlite3.connect(database_path)
+    c = conn.cursor()
+
+    with conn:
+        c.execute(
+            f"""
+            CREATE VIRTUAL TABLE {fts_table_name}_vocab
+            USING fts5vocab({fts_table_name}, row)
+            """
+        )
+
+
+def stamp_database_build_id(database_path):
+    """
+    Create the database_build table in a SQLite database and store in it a new
+    build id.
+
+    The build id is unique to each database that is created. The keys of the
+    cached search data are namespaced by it (see search_cache.py), so the data
+    cached for a previous build of the database is not read after the database
+    is created again.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+    Returns:
+        build_id (str): The build id stored in the database.
+    """
+    build_id = uuid.uuid4().hex
+
+    conn = sqlite3.connect(database_path)
+    c = conn.cursor()
+
+    with conn:
+        c.executescript(
+            """
+            DROP TABLE IF EXISTS database_build
+            ;
+
+            CREATE TABLE database_build(
+            id integer PRIMARY KEY,
+            build_id text,
+            created_at text)
+            ;
+            """
+        )
+        c.execute(
+            "INSERT INTO database_build(build_id, created_at)"
+            " VALUES(?, datetime('now'))",
+            (build_id,),
+        )
+    conn.close()
+
+    return build_id
+
+
+def compress_page_texts(
+    database_path,
+    use_dictionary=True,
+    level=9,
+    dictionary_size=32 * 1024,
+    sample_pages=1_000,
+):
+    """
+    Compress the text of the pages stored in a SQLite database.
+
+    The magazine_content column of the magazine_number_content table (and the
+    magazine_content_normalized and magazine_content_folded columns of the
+    magazine_number_content_folded table, if the database has it) is replaced with the zlib compressed text (see
+    compress_page_text()). If use_dictionary is True, a preset dictionary is
+    trained on a sample of the pages and stored in the page_text_dictionary
+    table. The PAGE_TEXT_VIEW view returns the pages with their text
+    decompressed by the decompress_page_text() SQL function, registered on the
+    connections of the app (see set_page_text_decompression()), and it is the
+    external content of the fts5 tables. The database is vacuumed afterwards,
+    so the file shrinks.
+
+    Notes:
+        - this function assumes that 'database_path' points to an existing SQLite
+    database whose tables that are built from the text of the pages (like the
+    fts tables) are already created, with PAGE_TEXT_VIEW as the external
+    content of the fts5 tables.
+
+    Args:
+        database_path (Path): The path to the SQLite database file.
+        use_dictionary (bool): Whether to compress the pages with a preset
+        dictionary. Default is True.
+        level (int): The zlib compression level, from 1 to 9. Default is 9.
+        dictionary_size (int): The maximum size of the dictionary in bytes.
+        Default is 32 KiB.
+        sample_pages (int): The number of pages the dictionary is trained on,
+        and the decompression of the previews is timed on. Default is 1 000.
+    Returns:
+        report (dict): The size of the text of the pages before (text_size) and
+        after (compressed_size) the compression, the size of the dictionary
+        (dictionary_size), the size of the database file before
+        (database_size_before) and after (database_size_after) the
+        compression, and the mean (decompression_time_mean) and 95th
+        percentile (decompression_time_p95) of the time in seconds to
+        decompress the text needed by the preview of a page.
+    """
+    conn = sqlite3.connect(database_path)
+    conn.execute("PRAGMA foreign_keys = 1")  # to enable foreign keys
+    c = conn.cursor()
+
+    has_folded_table = (
+        c.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'magazine_number_content_folded'"
+        ).fetchone()
+        is not None
+    )
+    columns = [("magazine_number_content", "magazine_content")]
+    if has_folded_table:
+        columns.extend(
+            [
+                ("magazine_number_content_folded", "magazine_content_normalized"),
+                ("magazine_number_content_folded", "magazine_content_folded"),
+            ]
+        )
+
+    database_size_before = os.path.getsize(database_path)
+    text_size = sum(
+        c.execute(
+            f"SELECT TOTAL(LENGTH(CAST({name} AS BLOB))) FROM {table}"
+        ).fetchone()[0]
+        for table, name in columns
+    )
+
+    # the sample is spread over all the pages
+    pages_count = c.execute("SELECT COUNT(*) FROM magazine_number_content").fetchone()[
+        0
+    ]
+    step = max(1, pages_count // max(1, sample_pages))
+    sample_ids = [
+        row[0]
+        for row in c.execute(
+            "SELECT id FROM magazine_number_content ORDER BY id"
+        ).fetchall()[::step][:sample_pages]
+    ]
+
+    dictionary = b""
+    if use_dictionary:
+        dictionary = train_compression_dictionary(
+            (
+                row[0]
+                for row in c.execute(
+                    f"""
+                    SELECT magazine_content FROM magazine_number_content
+                    WHERE id IN ({", ".join(str(int(page_id)) for page_id in sample_ids)})
+                    """
+                )
+            ),
+            dictionary_size,
+        )
+
+    conn.create_function(
+        "compress_page_text",
+        1,
+        lambda text: compress_page_text(text, dictionary, level),
+        deterministic=True,
+    )
+    conn.create_function(
+        "decompress_page_text",
+        1,
+        lambda value: decompress_page_text(value, dictionary),
+        deterministic=True,
+    )
+
+    with conn:
+        if dictionary:
+            c.execute(
+                f"""
+                CREATE TABLE {PAGE_TEXT_DICTIONARY_TABLE}(
+                id integer PRIMARY KEY,
+                dictionary blob)
+                """
+            )
+            c.execute(
+                f"INSERT INTO {PAGE_TEXT_DICTIONARY_TABLE}(dictionary) VALUES(?)",
+                (dictionary,),
+            )
+
+        # compress the text of the pages
+        for table, name in columns:
+            c.execute(f"UPDATE {table} SET {name} = compress_page_text({name})")
+
+        # create the view read by the fts5 tables
+        c.execute(
+            f"""
+            CREATE VIEW IF NOT EXISTS {PAGE_TEXT_VIEW} AS
+            SELECT id, magazine_number_id,
+            decompress_page_text(magazine_content) AS magazine_content,
+            magazine_page
+            FROM magazine_number_content
             """
         )
+
+    compressed_size = sum(
+        c.execute(f"SELECT TOTAL(LENGTH({name})) FROM {table}").fetchone()[0]
+        for table, name in columns
+    )
+
+    # time the decompression of the text a preview reads: the content of the
+    # page, or its normalized and folded content
+    preview_texts = (
+        """
+        SELECT magazine_content_normalized, magazine_content_folded
+        FROM magazine_number_content_folded
+        """
+        if has_folded_table
+        else "SELECT magazine_content FROM magazine_number_content"
+    )
+    decompression_times = []
+    for stored_texts in c.execute(
+        f"""
+        {preview_texts}
+        WHERE id IN ({", ".join(str(int(page_id)) for page_id in sample_ids)})
+        """
+    ):
+        start = time.perf_counter()
+        for stored_text in stored_texts:
+            decompress_page_text(stored_text, dictionary)
+        decompression_times.append(time.perf_counter() - start)
+
+    conn.execute("VACUUM")
+    conn.close()
+
+    decompression_times.sort()
+
+    return {
+        "text_size": int(text_size),
+        "compressed_size": int(compressed_size),
+        "dictionary_size": len(dictionary),
+        "database_size_before": database_size_before,
+        "database_size_after": os.path.getsize(database_path),
+        "decompression_time_mean": (
+            statistics.fmean(decompression_times) if decompression_times else 0.0
+        ),
+        "decompression_time_p95": (
+            decompression_times[int(len(decompression_times) * 0.95)]
+            if decompression_times
+            else 0.0
+        ),
+    }
@@ -0,0 +1,170 @@
+"""database_events module
+
+This module contains the SQLAlchemy event listeners registered on the engine
+of the app to configure the SQLite connections, and the engine profiles used
+to open the database.
+"""
+
+import sqlite3
+import time
+from urllib.parse import quote
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from application.page_text_compression import (
+    PAGE_TEXT_DICTIONARY_TABLE,
+    decompress_page_text,
+)
+
+# The accepted values for the SQLITE_ENGINE_PROFILE config: the database is
+# opened read-only (and immutable) and the connections are tuned with the
+# SQLITE_READ_ONLY_PRAGMAS config
+ENGINE_PROFILE_READ_ONLY = "read_only"
+
+# The number of SQLite virtual machine instructions between two calls of the
+# progress handler
+PROGRESS_HANDLER_INSTRUCTIONS = 1000
+
+
+def set_query_time_budget(engine, time_budget):
+    """
+    Interrupt the queries that run longer than a time budget.
+
+    A SQLite progress handler is installed on every new connection of the
+    engine. Before each statement is executed the deadline of the connection is
+    set to the current time plus the time budget, and the progress handler
+    interrupts the statement (sqlite3.OperationalError: interrupted) once the
+    deadline has passed, while the statement is executed or its rows are
+    fetched.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine of the app.
+        time_budget (float or None): The time budget of a query in seconds. If
+        None no progress handler is installed.
+
+    Returns:
+        None
+    """
+
+    if time_budget is None:
+        return
+
+    @event.listens_for(engine, "connect")
+    def install_progress_handler(dbapi_connection, connection_record):
+        deadline = {"value": None}
+        connection_record.info["query_deadline"] = deadline
+
+        def progress_handler():
+            # a non-zero return value interrupts the statement
+            return (
+                deadline["value"] is not None and time.monotonic() > deadline["value"]
+            )
+
+        dbapi_connection.set_progress_handler(
+            progress_handler, PROGRESS_HANDLER_INSTRUCTIONS
+        )
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def set_query_deadline(conn, cursor, statement, parameters, context, executemany):
+        deadline = conn.connection.info.get("query_deadline")
+        if deadline is not None:
+            deadline["value"] = time.monotonic() + time_budget
+
+
+def get_read_only_database_uri(database_uri):
+    """
+    Get the URI that opens a SQLite database file read-only and immutable.
+
+    With mode=ro SQLite refuses every write, and with immutable=1 it assumes
+    the file can't change, so it doesn't lock the file or check whether
+    another process changed it. The database must not be written while the
+    app is running.
+
+    Args:
+        database_uri (str): A SQLAlchemy URI of a SQLite database file
+        ("sqlite:///<path>").
+
+    Returns:
+        read_only_database_uri (str): The SQLAlchemy URI with the SQLite URI
+        filename ("sqlite:///file:<path>?mode=ro&immutable=1&uri=true", with
+        the path percent-encoded). The
+        URI is returned unchanged if it doesn't point to a SQLite database
+        file or if it is already a SQLite URI filename.
+    """
+
+    url = make_url(database_uri)
+    if (
+        url.get_backend_name() != "sqlite"
+        or url.database in (None, "", ":memory:")
+        or url.query.get("uri")
+    ):
+        return database_uri
+
+    # the path is percent-encoded for the SQLite URI filename (so a "#", a "?"
+    # or a "%" in it isn't read as a delimiter or an escape), then once more
+    # for the SQLAlchemy URI, whose database part is percent-decoded
+    database_path = quote(quote(url.database))
+
+    return f"sqlite:///file:{database_path}?mode=ro&immutable=1&uri=true"
+
+
+def set_pragmas(engine, pragmas):
+    """
+    Set PRAGMA statements on every new connection of the engine.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine of the app.
+        pragmas (dict): The pragma names mapped to their values (for example
+        {"cache_size": -65536, "temp_store": "MEMORY"}).
+
+    Returns:
+        None
+    """
+
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def execute_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def set_page_text_decompression(engine):
+    """
+    Register the decompress_page_text() SQL function on every new connection
+    of the engine.
+
+    The function returns the text of a page stored compressed (see
+    compress_page_texts()) and the text stored uncompressed unchanged, so the
+    queries that read the text of the pages work with both kinds of
+    databases. The preset dictionary the pages were compressed with is read
+    from the database when the connection is opened.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine of the app.
+
+    Returns:
+        None
+    """
+
+    @event.listens_for(engine, "connect")
+    def create_decompress_function(dbapi_connection, connection_record):
+        try:
+            row = dbapi_connection.execute(
+                f"SELECT dictionary FROM {PAGE_TEXT_DICTIONARY_TABLE}"
+            ).fetchone()
+        except sqlite3.Error:
+            # the pages of the database aren't compressed with a dictionary
+            row = None
+        dictionary = row[0] if row else None
+
+        dbapi_connection.create_function(
+            "decompress_page_text",
+            1,
+            lambda value: decompress_page_text(value, dictionary),
+            deterministic=True,
+        )
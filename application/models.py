@@ -50,6 +50,19 @@ class MagazineNumberContent(db.Model):
         return f"MagazineNumberContent(id={self.id},magazine_number_id={self.magazine_number_id},magazine_content={self.magazine_content},magazine_page={self.magazine_page})"
 
 
+class MagazineNumberContentFolded(db.Model):
+    __tablename__ = "magazine_number_content_folded"
+
+    id = db.Column(
+        db.Integer, db.ForeignKey("magazine_number_content.id"), primary_key=True
+    )
+    magazine_content_normalized = db.Column(db.Text)
+    magazine_content_folded = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"MagazineNumberContentFolded(id={self.id},magazine_content_normalized={self.magazine_content_normalized},magazine_content_folded={self.magazine_content_folded})"
+
+
 class MagazineNumberContentFTS(db.Model):
     __tablename__ = "magazine_number_content_fts"
 
@@ -60,6 +73,38 @@ class MagazineNumberContentFTS(db.Model):
         return f"MagazineNumberContentFTS(rowid={self.rowid},magazine_content={self.magazine_content})"
 
 
+class MagazineNumberContentTrigramFTS(db.Model):
+    __tablename__ = "magazine_number_content_trigram_fts"
+
+    rowid = db.Column(db.Integer, primary_key=True)
+    magazine_content = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"MagazineNumberContentTrigramFTS(rowid={self.rowid},magazine_content={self.magazine_content})"
+
+
+class MagazineNumberContentFTSVocab(db.Model):
+    __tablename__ = "magazine_number_content_fts_vocab"
+
+    term = db.Column(db.Text, primary_key=True)
+    doc = db.Column(db.Integer)
+    cnt = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"MagazineNumberContentFTSVocab(term={self.term},doc={self.doc},cnt={self.cnt})"
+
+
+class MagazineNumberContentTrigramFTSVocab(db.Model):
+    __tablename__ = "magazine_number_content_trigram_fts_vocab"
+
+    term = db.Column(db.Text, primary_key=True)
+    doc = db.Column(db.Integer)
+    cnt = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"MagazineNumberContentTrigramFTSVocab(term={self.term},doc={self.doc},cnt={self.cnt})"
+
+
 class MagazineDetails(db.Model):
     __tablename__ = "magazine_details"
 
@@ -71,3 +116,29 @@ class MagazineDetails(db.Model):
 
     def __repr__(self):
         return f"MagazineDetails(id={self.id},magazine_id={self.magazine_id},year={self.year},distinct_magazine_numbers_count={self.distinct_magazine_numbers_count},distinct_pages_count={self.distinct_pages_count})"
+
+
+class SearchHits(db.Model):
+    __tablename__ = "search_hits"
+
+    id = db.Column(db.Integer, primary_key=True)
+    display_order = db.Column(db.Integer, unique=True)
+    name = db.Column(db.Text)
+    year = db.Column(db.Text)
+    magazine_number = db.Column(db.Text)
+    magazine_page = db.Column(db.Integer)
+    magazine_number_link = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"SearchHits(id={self.id},display_order={self.display_order},name={self.name},year={self.year},magazine_number={self.magazine_number},magazine_page={self.magazine_page},magazine_number_link={self.magazine_number_link})"
+
+
+class DatabaseBuild(db.Model):
+    __tablename__ = "database_build"
+
+    id = db.Column(db.Integer, primary_key=True)
+    build_id = db.Column(db.Text)
+    created_at = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"DatabaseBuild(id={self.id},build_id={self.build_id},created_at={self.created_at})"
@@ -0,0 +1,117 @@
+"""page_text_compression module
+
+This module compresses the text of the magazine pages stored in the database
+and decompresses it when it is read. The text is compressed with zlib,
+optionally with a preset dictionary trained on the pages, so the short pages
+(that have little repeated text of their own) are compressed too.
+"""
+
+import re
+import zlib
+from collections import Counter
+
+# The table that holds the preset dictionary the pages were compressed with
+PAGE_TEXT_DICTIONARY_TABLE = "page_text_dictionary"
+
+# The view that returns the magazine_number_content table with the text of the
+# pages decompressed. It is the external content of the fts5 tables of a
+# database whose pages are compressed
+PAGE_TEXT_VIEW = "magazine_number_content_text"
+
+# The zlib window is 32 KiB, so a longer preset dictionary isn't used
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+
+def compress_page_text(text, dictionary=None, level=9):
+    """
+    Compress the text of a page.
+
+    Args:
+        text (str or None): The text to compress.
+        dictionary (bytes or None): The preset dictionary (see
+        train_compression_dictionary()). Default is None (no dictionary).
+        level (int): The zlib compression level, from 1 to 9. Default is 9.
+
+    Returns:
+        compressed_text (bytes or None): The UTF-8 encoded text compressed with
+        zlib, or None if the text is None.
+    """
+
+    if text is None:
+        return None
+
+    if isinstance(text, bytes):
+        # already compressed
+        return text
+
+    if dictionary:
+        compressor = zlib.compressobj(level, zdict=dictionary)
+        return compressor.compress(text.encode("utf-8")) + compressor.flush()
+
+    return zlib.compress(text.encode("utf-8"), level)
+
+
+def decompress_page_text(value, dictionary=None):
+    """
+    Decompress the text of a page stored by compress_page_text().
+
+    The text of the pages of a database that isn't compressed is stored as
+    text, and it is returned unchanged.
+
+    Args:
+        value (bytes, str or None): The stored text of the page.
+        dictionary (bytes or None): The preset dictionary the text was
+        compressed with. Default is None (no dictionary).
+
+    Returns:
+        text (str or None): The text of the page.
+    """
+
+    if not isinstance(value, bytes):
+        return value
+
+    if dictionary:
+        return zlib.decompressobj(zdict=dictionary).decompress(value).decode("utf-8")
+
+    return zlib.decompress(value).decode("utf-8")
+
+
+def train_compression_dictionary(texts, dictionary_size=MAX_DICTIONARY_SIZE):
+    """
+    Build a zlib preset dictionary from a sample of the pages.
+
+    zlib can refer to any string of the dictionary as if it had been found
+    just before the text, so the dictionary holds the words that save the most
+    bytes in the sample (their number of occurrences multiplied by their
+    length). The words that save the most are put at the end of the
+    dictionary, where the references to them are the shortest.
+
+    Args:
+        texts (iterable of str): The sample of the pages.
+        dictionary_size (int): The maximum size of the dictionary in bytes (at
+        most MAX_DICTIONARY_SIZE). Default is MAX_DICTIONARY_SIZE.
+
+    Returns:
+        dictionary (bytes): The dictionary, empty if the sample has no words.
+    """
+
+    dictionary_size = min(dictionary_size, MAX_DICTIONARY_SIZE)
+
+    word_counts = Counter()
+    for text in texts:
+        word_counts.update(re.findall(r"\S+\s", text or ""))
+
+    words = []
+    size = 0
+    for word, count in sorted(
+        word_counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True
+    ):
+        if count < 2:
+            break
+        encoded_word = word.encode("utf-8")
+        if size + len(encoded_word) > dictionary_size:
+            continue
+        words.append(encoded_word)
+        size += len(encoded_word)
+
+    return b"".join(reversed(words))
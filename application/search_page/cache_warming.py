@@ -0,0 +1,233 @@
+"""cache_warming module
+
+This module fills the search cache with the most frequent searches, so the
+first searches after a restart of the app or a flush of the cache don't all
+scan the FTS5 table. The terms are read from the log of the app (the line
+logged by search_for_term() for each search) or from a list of terms, and for
+each term the counts and the ids of its results (see get_search_results())
+and the previews of its first results page are computed and cached.
+"""
+
+import glob
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+
+from application.search_page.helpers import format_search_word
+from application.search_page.search_cache import normalize_search_term, search_cache
+from application.search_page.search_executor import (
+    get_ids_for_magazine_filter,
+    get_page_ids,
+)
+from application.search_page.search_page_routes import (
+    get_previews_for_results,
+    get_search_results,
+)
+
+# The line logged by search_for_term() with the term of each search
+SEARCH_LOG_PATTERN = re.compile(
+    r"Formatted search_box parameter to: (.*?)(?: \[in \S+\])?$"
+)
+
+
+def read_search_log_terms(log_file):
+    """
+    Read the searched terms from the log of the app.
+
+    The rotated log files (log_file followed by a date suffix) are read too.
+
+    Args:
+        log_file (str): The path of the log file.
+
+    Returns:
+        terms (list of str): The searched terms, one for each search.
+    """
+
+    terms = []
+    for log_path in sorted(glob.glob(glob.escape(log_file) + "*")):
+        with open(log_path, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                match = SEARCH_LOG_PATTERN.search(line.rstrip("\n"))
+                if match:
+                    terms.append(match.group(1))
+
+    return terms
+
+
+def read_term_list(terms_file):
+    """
+    Read the terms of a term list, one term on each line.
+
+    Args:
+        terms_file (str): The path of the term list.
+
+    Returns:
+        terms (list of str): The terms, without the empty lines.
+    """
+
+    with open(terms_file, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def get_top_search_terms(terms, top):
+    """
+    Get the most frequent searched terms.
+
+    The terms are counted by normalized term (see normalize_search_term()),
+    because their searches share the cached counts and ids. Each one is
+    returned with its most frequent spelling, and the terms that
+    search_for_term() doesn't search (shorter than 4 or longer than 200
+    characters) are left out.
+
+    Args:
+        terms (iterable of str): The searched terms, one for each search.
+        top (int): The number of terms returned.
+
+    Returns:
+        top_terms (list of str): The most frequent terms, the most frequent
+        first (in the order they were first read for the same frequency).
+    """
+
+    counts = Counter()
+    spellings = defaultdict(Counter)
+    for term in terms:
+        if len(term) < 4 or len(term) > 200:
+            continue
+        normalized_term = normalize_search_term(term)
+        counts[normalized_term] += 1
+        spellings[normalized_term][term] += 1
+
+    return [
+        spellings[normalized_term].most_common(1)[0][0]
+        for normalized_term, _ in counts.most_common(top)
+    ]
+
+
+def warm_search_term(s_word):
+    """
+    Cache the counts and the ids of the results of a term, and the previews
+    of its first results page (unless the term has too many results to cache
+    their ids).
+
+    Args:
+        s_word (str): The searched term.
+
+    Returns:
+        key (str): The search cache key of the results of the term.
+    """
+
+    formatted_s_word = format_search_word(
+        s_word,
+        separator="+",
+        accepted_special_characters=current_app.config[
+            "ACCEPTED_FTS5_SPECIAL_CHARACTERS"
+        ],
+    )
+
+    search_results = get_search_results(formatted_s_word, None, None)
+
+    ids = get_ids_for_magazine_filter(search_results, None)
+    if ids:
+        page_ids = get_page_ids(ids, 1, current_app.config["RESULTS_PER_PAGE"])
+        get_previews_for_results(
+            [(page_id,) for page_id in page_ids], s_word, formatted_s_word, None
+        )
+
+    return search_cache.make_key("results", formatted_s_word, None, None)
+
+
+def warm_search_cache(app, terms, workers=4):
+    """
+    Cache the searches of several terms, in parallel.
+
+    Args:
+        app (flask.Flask): The app whose cache is filled.
+        terms (list of str): The searched terms.
+        workers (int): The number of terms warmed at the same time. Default is
+        4.
+
+    Returns:
+        report (dict): The number of terms, the time the warming took in
+        seconds and the number of terms whose results were found in the cache
+        afterwards: "terms", "warming_time", "hits" and "hit_rate".
+    """
+
+    def warm(s_word):
+        # each thread has its own app context, so its own database session
+        with app.app_context():
+            return warm_search_term(s_word)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=max(workers, 1), thread_name_prefix="cache_warming"
+    ) as executor:
+        keys = list(executor.map(warm, terms))
+    warming_time = time.perf_counter() - start
+
+    with app.app_context():
+        hits = len(search_cache.get_many(keys))
+
+    return {
+        "terms": len(terms),
+        "warming_time": warming_time,
+        "hits": hits,
+        "hit_rate": hits / len(terms) if terms else 0.0,
+    }
+
+
+def format_warming_report(report):
+    """
+    Format the report of warm_search_cache().
+
+    Args:
+        report (dict): The report.
+
+    Returns:
+        formatted_report (str): The report, for example "search cache warmed
+        with 50 terms in 2.31 s, hit rate afterwards: 50/50 (100.0%)".
+    """
+
+    return (
+        f"search cache warmed with {report['terms']} terms in"
+        f" {report['warming_time']:.2f} s, hit rate afterwards:"
+        f" {report['hits']}/{report['terms']} ({report['hit_rate'] * 100:.1f}%)"
+    )
+
+
+def start_search_cache_warming(app):
+    """
+    Warm the search cache with the most frequent terms of the search log, in a
+    background thread, so the app starts right away.
+
+    Args:
+        app (flask.Flask): The app whose cache is filled.
+
+    Returns:
+        thread (threading.Thread): The thread that warms the cache.
+    """
+
+    def warm():
+        terms = get_top_search_terms(
+            read_search_log_terms(app.config["WARM_CACHE_LOG_FILE"]),
+            app.config["WARM_CACHE_TOP_TERMS"],
+        )
+        try:
+            report = warm_search_cache(app, terms, app.config["WARM_CACHE_WORKERS"])
+        except OperationalError as err:
+            app.logger.error(
+                "search cache not warmed in start_search_cache_warming() because"
+                f" of OperationalError: {err}"
+            )
+            return
+
+        app.logger.info(format_warming_report(report))
+
+    thread = threading.Thread(target=warm, name="cache_warming", daemon=True)
+    thread.start()
+
+    return thread
@@ -1,11 +1,22 @@
 """helpers module
 
-This module contains helper functions for formatting text and storing data in
-flask.session.
+This module contains helper functions for formatting text, storing data in
+flask.session, encoding pagination cursors and packing lists of ids.
 """
 
+import base64
+import binascii
+import json
+import zlib
+from array import array
+
 from flask import session
 
+# The range of the SQLite INTEGER values, a cursor key outside of it can't be
+# bound to a query
+SQLITE_INTEGER_MIN = -(2**63)
+SQLITE_INTEGER_MAX = 2**63 - 1
+
 
 def format_search_word(s_word, separator=" ", accepted_special_characters=""):
     """
@@ -70,3 +81,124 @@ def store_s_word_in_session(session_s_word, request_s_word):
         session["s_word"] = request_s_word
 
     return session.get("s_word")
+
+
+def encode_cursor(direction, key=None):
+    """
+    Encode a keyset pagination cursor into an opaque URL safe string.
+
+    Args:
+        direction (str): The direction of the pagination: "next" or "prev".
+        key (int or None): The id of the row the page starts after ("next") or
+        ends before ("prev"). None means the page is taken from the end of the
+        result set. Default is None.
+
+    Returns:
+        cursor (str): The URL safe base64 encoded cursor.
+    """
+
+    cursor_json = json.dumps({"d": direction, "k": key}, separators=(",", ":"))
+    cursor = base64.urlsafe_b64encode(cursor_json.encode("utf-8")).decode("ascii")
+
+    return cursor.rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a keyset pagination cursor created with encode_cursor().
+
+    Args:
+        cursor (str): The opaque cursor string.
+
+    Returns:
+        tuple or None: A (direction, key) tuple, or None if the cursor is
+        malformed.
+    """
+
+    if not isinstance(cursor, str) or not cursor:
+        return None
+
+    padding = "=" * (-len(cursor) % 4)
+
+    try:
+        cursor_json = base64.urlsafe_b64decode(cursor + padding).decode("utf-8")
+        decoded_cursor = json.loads(cursor_json)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+    if not isinstance(decoded_cursor, dict):
+        return None
+
+    direction = decoded_cursor.get("d")
+    key = decoded_cursor.get("k")
+
+    if direction not in ("next", "prev"):
+        return None
+    if key is not None and not is_valid_cursor_key(key):
+        return None
+
+    return direction, key
+
+
+def is_valid_cursor_key(key):
+    """
+    Check that the key of a cursor is an id that can be bound to a query.
+
+    Args:
+        key: The key of the decoded cursor.
+
+    Returns:
+        bool: True if the key is an int (not a bool) in the range of the
+        SQLite INTEGER values.
+    """
+
+    return (
+        isinstance(key, int)
+        and not isinstance(key, bool)
+        and SQLITE_INTEGER_MIN <= key <= SQLITE_INTEGER_MAX
+    )
+
+
+def pack_ids(ids, compress=False):
+    """
+    Pack a list of ids into a compact byte string.
+
+    The ids are stored as an array of unsigned 32 bit integers (4 bytes per
+    id, instead of a pickled list of Python ints), optionally compressed with
+    zlib. The first byte marks the format so that unpack_ids() can read both.
+
+    Args:
+        ids (iterable of int): The ids to pack.
+        compress (bool): Compress the array with zlib. Default is False.
+
+    Returns:
+        packed_ids (bytes): The packed ids.
+    """
+
+    ids_bytes = array("I", ids).tobytes()
+
+    if compress:
+        return b"z" + zlib.compress(ids_bytes)
+
+    return b"a" + ids_bytes
+
+
+def unpack_ids(packed_ids):
+    """
+    Unpack a byte string created with pack_ids().
+
+    Args:
+        packed_ids (bytes): The packed ids.
+
+    Returns:
+        ids (array.array): The ids, in the order they were packed.
+    """
+
+    ids_bytes = packed_ids[1:]
+    if packed_ids[:1] == b"z":
+        ids_bytes = zlib.decompress(ids_bytes)
+
+    ids = array("I")
+    ids.frombytes(ids_bytes)
+
+    return ids
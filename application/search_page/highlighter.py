@@ -0,0 +1,93 @@
+"""highlighter module
+
+This module highlights the searched term in the previews of the search
+results. All the forms of the term (the whole term and, for a term with
+several words, each of its words) are searched for at once, in a single pass
+over the folded preview, by one compiled regular expression.
+"""
+
+import re
+
+from markupsafe import escape
+
+# The words of a term with several words that are shorter than this are only
+# highlighted as part of the whole term
+MIN_HIGHLIGHTED_WORD_LENGTH = 3
+
+
+class Highlighter:
+    """
+    A single pattern that matches all the folded forms of a searched term.
+
+    The pattern is an alternation of the forms, longest first, so at each
+    index of the text the longest form is matched and the whole term is
+    preferred to its words. The whole term is found anywhere in the text,
+    like the previews do, and its words are only found at the start of a
+    word of the text. The text has to be folded with fold_text(), so the
+    variants of the term that differ by case or diacritics are matched by the
+    same form.
+
+    Args:
+        folded_s_word (str): The searched term, folded with fold_text().
+    """
+
+    def __init__(self, folded_s_word):
+        forms = [re.escape(folded_s_word)]
+
+        words = folded_s_word.split()
+        if len(words) > 1:
+            forms.extend(
+                # a word is matched only if it isn't preceded by a letter or
+                # a digit
+                r"(?<![^\W_])" + re.escape(word)
+                for word in sorted(set(words), key=len, reverse=True)
+                if len(word) >= MIN_HIGHLIGHTED_WORD_LENGTH
+            )
+
+        self._pattern = re.compile("|".join(forms)) if folded_s_word else None
+
+    def find_spans(self, folded_content):
+        """
+        Find the occurrences of the forms of the term in a folded text.
+
+        Args:
+            folded_content (str): The text, folded with fold_text().
+
+        Returns:
+            spans (list of tuple): The (start, end) indexes of the occurrences,
+            ordered and without overlaps.
+        """
+
+        if self._pattern is None:
+            return []
+
+        return [match.span() for match in self._pattern.finditer(folded_content)]
+
+    def add_html_mark_tags(self, content, folded_content):
+        """
+        Add HTML 'mark' tags around every occurrence of the term in the content.
+
+        The text of the content is HTML-escaped, so only the 'mark' tags are
+        rendered as HTML.
+
+        Args:
+            content (str): The content string to modify.
+            folded_content (str): The content folded with fold_text() (it has
+            the same length as the content).
+
+        Returns:
+            content (str): The escaped content with HTML 'mark' tags around
+            each occurrence of the term.
+        """
+
+        # the text is escaped piece by piece, after the occurrences are found,
+        # because escaping changes the length of the text
+        pieces = []
+        last_end = 0
+        for start, end in self.find_spans(folded_content):
+            pieces.append(str(escape(content[last_end:start])))
+            pieces.append("<mark>" + str(escape(content[start:end])) + "</mark>")
+            last_end = end
+        pieces.append(str(escape(content[last_end:])))
+
+        return "".join(pieces)
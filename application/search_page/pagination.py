@@ -0,0 +1,207 @@
+"""pagination module
+
+This module contains the pagination classes used to split the search results
+into pages.
+"""
+
+from flask import abort
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import select, tuple_
+
+from application.search_page.helpers import encode_cursor, is_valid_cursor_key
+
+
+class KeysetPagination(Pagination):
+    """
+    Paginate a Query object using keyset (seek) pagination.
+
+    Instead of skipping the rows of the previous pages with OFFSET, the page is
+    selected with a WHERE clause on the keyset columns, so the cost of a page
+    does not depend on its position in the result set. The keyset columns must
+    be unique together and must belong to the table of id_column.
+
+    The cursors hold the id of the first or last row of a page. The keyset
+    values of that row are read back with a primary key lookup inside the page
+    query, so the keyset columns don't need to be selected by the Query.
+
+    A page requested without a cursor falls back to OFFSET so that the numbered
+    page links keep working. The total number of results is not queried, it
+    has to be passed in (it is cached by the caller).
+
+    Args (passed as keyword arguments):
+        query (flask_sqlalchemy.query.Query): The Query object to paginate.
+        keyset_columns (tuple): The columns the results are ordered by.
+        id_column (sqlalchemy.orm.InstrumentedAttribute): The primary key
+        column, selected by the Query.
+        direction (str or None): "next", "prev" or None for an OFFSET page.
+        key (int or None): The id from the decoded cursor.
+        total (int): The total number of results.
+    """
+
+    def _query_items(self):
+        query = self._query_args["query"].order_by(None)
+        keyset_columns = self._query_args["keyset_columns"]
+        direction = self._query_args.get("direction")
+        key = self._query_args.get("key")
+
+        if direction is None:
+            return (
+                query.order_by(*keyset_columns)
+                .limit(self.per_page)
+                .offset(self._query_offset)
+                .all()
+            )
+
+        if key is not None and not is_valid_cursor_key(key):
+            abort(404)
+
+        if direction == "next":
+            if key is not None:
+                query = query.filter(self._get_keyset() > self._get_keyset_for(key))
+            return query.order_by(*keyset_columns).limit(self.per_page).all()
+
+        # direction == "prev": read backwards from the key (or from the end of
+        # the result set) and restore the ascending order
+        limit = self.per_page
+        if key is None:
+            limit = self._query_args["total"] - self._query_offset
+        else:
+            query = query.filter(self._get_keyset() < self._get_keyset_for(key))
+
+        if limit < 1:
+            return []
+
+        items = (
+            query.order_by(*[column.desc() for column in keyset_columns])
+            .limit(min(limit, self.per_page))
+            .all()
+        )
+        items.reverse()
+
+        return items
+
+    def _query_count(self):
+        return self._query_args["total"]
+
+    def _get_keyset(self):
+        return tuple_(*self._query_args["keyset_columns"])
+
+    def _get_keyset_for(self, key):
+        keyset_columns = self._query_args["keyset_columns"]
+        id_column = self._query_args["id_column"]
+
+        if keyset_columns == (id_column,):
+            return tuple_(key)
+
+        return tuple_(
+            *[
+                select(column).where(id_column == key).scalar_subquery()
+                for column in keyset_columns
+            ]
+        )
+
+    def _get_key(self, item):
+        return item._mapping[self._query_args["id_column"]]
+
+    @property
+    def next_cursor(self):
+        """The cursor of the next page, or None if this is the last page."""
+        if not self._query_args["keyset_columns"]:
+            return None
+        if not self.has_next or not self.items:
+            return None
+
+        return encode_cursor("next", self._get_key(self.items[-1]))
+
+    @property
+    def prev_cursor(self):
+        """The cursor of the previous page, or None if this is the first page."""
+        if not self._query_args["keyset_columns"]:
+            return None
+        if not self.has_prev or not self.items:
+            return None
+
+        return encode_cursor("prev", self._get_key(self.items[0]))
+
+    @property
+    def last_cursor(self):
+        """The cursor of the last page, read backwards from the end."""
+        if not self._query_args["keyset_columns"]:
+            return None
+
+        return encode_cursor("prev")
+
+
+class IdListPagination(KeysetPagination):
+    """
+    Paginate an ordered list of result ids that was already retrieved.
+
+    The ids of the page are sliced from the list and only the rows of these ids
+    are queried, by primary key, so the FTS5 table is not scanned again and the
+    cost of a page does not depend on its position. The cursors are the same as
+    the ones of KeysetPagination, so a page reached with a cursor can be served
+    from a list and the other way around. If keyset_columns is None (the list
+    is not ordered by a keyset) no cursors are generated.
+
+    Args (passed as keyword arguments):
+        query (flask_sqlalchemy.query.Query): The Query object that selects the
+        details of the results, without any filter.
+        ids (array.array): The ids of all the results, in display order.
+        keyset_columns (tuple or None): The columns the ids are ordered by.
+        id_column (sqlalchemy.orm.InstrumentedAttribute): The primary key
+        column, selected by the Query.
+    """
+
+    def _query_items(self):
+        ids = self._query_args["ids"]
+        page_ids = ids[self._query_offset : self._query_offset + self.per_page].tolist()
+
+        if not page_ids:
+            return []
+
+        rows = (
+            self._query_args["query"]
+            .filter(self._query_args["id_column"].in_(page_ids))
+            .all()
+        )
+        rows_by_id = {self._get_key(row): row for row in rows}
+
+        return [rows_by_id[page_id] for page_id in page_ids if page_id in rows_by_id]
+
+    def _query_count(self):
+        return len(self._query_args["ids"])
+
+
+class RankedPagination(Pagination):
+    """
+    Paginate a Query object ordered by the FTS5 rank of the results.
+
+    The ORDER BY rank is consumed by the FTS5 table, so with the LIMIT only the
+    rows of the requested page are joined with the other tables. The rank is
+    not unique, so the pages are retrieved using OFFSET and no cursors are
+    generated.
+
+    Args (passed as keyword arguments):
+        query (flask_sqlalchemy.query.Query): The Query object to paginate,
+        joined with the FTS5 table.
+        rank_column (sqlalchemy.sql.elements.ColumnElement): The FTS5 rank
+        column.
+        total (int): The total number of results.
+    """
+
+    next_cursor = None
+    prev_cursor = None
+    last_cursor = None
+
+    def _query_items(self):
+        return (
+            self._query_args["query"]
+            .order_by(None)
+            .order_by(self._query_args["rank_column"])
+            .limit(self.per_page)
+            .offset(self._query_offset)
+            .all()
+        )
+
+    def _query_count(self):
+        return self._query_args["total"]
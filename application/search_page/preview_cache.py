@@ -0,0 +1,235 @@
+"""preview_cache module
+
+This module caches the previews of the search results, so the previews of the
+pages of a popular search are not built again on every page view. The
+previews are kept either in a bounded LRU dictionary in the memory of each
+process or in the Flask-Caching backend of the app (the two tier backend in
+production, whose in-process tier is in front of Redis).
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+from application.search_page.search_cache import (
+    UNVERSIONED_BUILD_ID,
+    make_search_cache_key,
+)
+
+
+class PreviewCache:
+    """
+    A cache of the previews of the search results.
+
+    The previews are read for a whole results page at once: get_many() reads
+    them from the in-process LRU dictionary or, with a backend, from the
+    backend with a single get_many() call. With a backend the previews are
+    not kept in the LRU dictionary too, so their memory in the process is
+    bounded (and their keys invalidated) only by the backend, like by the
+    in-process tier of TwoTierCache.
+
+    Args:
+        max_entries (int): The maximum number of previews kept in the memory
+        of the process without a backend. Default is 0 (no previews kept).
+        backend (flask_caching.Cache or None): The Flask-Caching cache the
+        previews are stored in. Default is None (the in-process LRU
+        dictionary).
+        timeout (int or None): The timeout of the previews stored in the
+        backend. Default is None (the CACHE_DEFAULT_TIMEOUT of the backend).
+    """
+
+    def __init__(self, max_entries=0, backend=None, timeout=None):
+        self.max_entries = max_entries
+        self.backend = backend
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory = 0
+        self._hits = 0
+        self._backend_hits = 0
+        self._misses = 0
+
+    def init_app(self, app, backend=None):
+        """Configure the cache from the PREVIEW_CACHE_* settings of the app."""
+        self.max_entries = app.config["PREVIEW_CACHE_MAX_ENTRIES"]
+        self.backend = backend if app.config["PREVIEW_CACHE_BACKEND"] else None
+        self.timeout = app.config["PREVIEW_CACHE_TIMEOUT"]
+        self.clear()
+
+    def get_many(self, keys):
+        """
+        Get the cached previews of several keys.
+
+        Args:
+            keys (list of str): The keys of the previews.
+
+        Returns:
+            previews (dict): The previews found, by key. The keys that were not
+            found are missing from the dictionary.
+        """
+
+        previews = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    previews[key] = self._entries[key]
+            self._hits += len(previews)
+
+        missing_keys = [key for key in keys if key not in previews]
+        if missing_keys and self.backend is not None:
+            backend_previews = {
+                key: preview
+                for key, preview in zip(
+                    missing_keys, self.backend.get_many(*missing_keys)
+                )
+                if preview is not None
+            }
+            previews.update(backend_previews)
+            with self._lock:
+                self._backend_hits += len(backend_previews)
+
+        with self._lock:
+            self._misses += len(keys) - len(previews)
+
+        return previews
+
+    def set_many(self, previews):
+        """
+        Store several previews in the backend, or in the in-process LRU
+        dictionary without a backend.
+
+        Args:
+            previews (dict): The previews to store, by key.
+
+        Returns:
+            None
+        """
+
+        if not previews:
+            return
+
+        if self.backend is not None:
+            self.backend.set_many(previews, timeout=self.timeout)
+        else:
+            self._store_locally(previews)
+
+    def clear(self):
+        """
+        Remove the previews of the in-process LRU dictionary and reset the
+        stats.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+            self._hits = 0
+            self._backend_hits = 0
+            self._misses = 0
+
+    @property
+    def stats(self):
+        """
+        The statistics used to size the cache: the number of previews found in
+        the in-process LRU dictionary (hits), in the backend (backend_hits)
+        and not found (misses), the hit ratio, and the number and approximate
+        size in bytes of the previews kept in the LRU dictionary.
+        """
+        with self._lock:
+            lookups = self._hits + self._backend_hits + self._misses
+            return {
+                "hits": self._hits,
+                "backend_hits": self._backend_hits,
+                "misses": self._misses,
+                "hit_ratio": (
+                    (self._hits + self._backend_hits) / lookups if lookups else 0.0
+                ),
+                "entries": len(self._entries),
+                "memory_bytes": self._memory,
+            }
+
+    def _store_locally(self, previews):
+        if self.max_entries < 1:
+            return
+
+        with self._lock:
+            for key, preview in previews.items():
+                if key in self._entries:
+                    self._memory -= self._get_size(key, self._entries.pop(key))
+                self._entries[key] = preview
+                self._memory += self._get_size(key, preview)
+
+            while len(self._entries) > self.max_entries:
+                key, preview = self._entries.popitem(last=False)
+                self._memory -= self._get_size(key, preview)
+
+    @staticmethod
+    def _get_size(key, preview):
+        return sys.getsizeof(key) + sys.getsizeof(preview)
+
+
+# The preview cache of the app, configured by init_app()
+preview_cache = PreviewCache()
+
+
+def get_preview_cache_key_prefix(
+    preview_engine, s_word, preview_option, build_id=UNVERSIONED_BUILD_ID
+):
+    """
+    Get the prefix of the preview cache keys of a search.
+
+    The searched term is normalized (see normalize_search_term()), because the
+    previews don't depend on the case or the diacritics of the term.
+
+    Args:
+        preview_engine (str): The PREVIEW_ENGINE the previews are built with.
+        s_word (str): The searched term.
+        preview_option (int): The length (PREVIEW_SUBSTRING_LENGTH) or the
+        number of tokens (PREVIEW_SNIPPET_TOKENS) of the previews.
+        build_id (str): The build id of the database (see SearchCache).
+        Default is UNVERSIONED_BUILD_ID.
+
+    Returns:
+        key_prefix (str): The prefix of the keys, completed with the page id
+        by get_cached_previews().
+    """
+
+    return make_search_cache_key(
+        build_id, "preview", s_word, preview_engine, preview_option
+    )
+
+
+def get_cached_previews(
+    cache, paginated_details_for_searched_term, key_prefix, get_previews
+):
+    """
+    Get the previews of a results page from the cache and build the missing
+    ones.
+
+    Args:
+        cache (PreviewCache): The preview cache.
+        paginated_details_for_searched_term (iterable): The results of the
+        page, with the page id as their last column.
+        key_prefix (str): The prefix returned by get_preview_cache_key_prefix().
+        get_previews (callable): The function that builds the previews of a
+        list of results, like get_previews_for_page_id().
+
+    Returns:
+        previews_for_page_id (list): A list containing pairs of page IDs (int)
+        and their corresponding preview texts (str), in the order of the
+        results.
+    """
+
+    results = list(paginated_details_for_searched_term)
+    keys = {result[-1]: f"{key_prefix}_{result[-1]}" for result in results}
+
+    previews = cache.get_many(list(keys.values()))
+
+    missing_results = [result for result in results if keys[result[-1]] not in previews]
+    if missing_results:
+        new_previews = {
+            keys[page_id]: preview for page_id, preview in get_previews(missing_results)
+        }
+        cache.set_many(new_previews)
+        previews.update(new_previews)
+
+    return [[page_id, previews[key]] for page_id, key in keys.items()]
@@ -6,15 +6,89 @@ that are displayed for the search results.
 
 import re
 
-from markupsafe import Markup
+from markupsafe import Markup, escape
 
+from application.search_page.highlighter import Highlighter
 from application.search_page.search_page_data_repository import (
-    get_magazine_content_details,
+    get_magazine_contents,
+    get_magazine_contents_and_folded_contents,
+    get_snippets,
+)
+
+# The accepted values for the PREVIEW_ENGINE config
+PREVIEW_ENGINE_PYTHON = "python"
+PREVIEW_ENGINE_FTS5 = "fts5"
+
+# The marks FTS5 inserts around the matches of a snippet. They are control
+# characters, so they can't be found in the text, and they are replaced by
+# HTML 'mark' tags after the text of the snippet is escaped
+SNIPPET_START_MARK = "\x02"
+SNIPPET_END_MARK = "\x03"
+SNIPPET_ELLIPSIS = " [...] "
+
+# The translation table used by convert_diacritics_to_basic_latin_characters():
+# the Unicode code points of the Romanian and Hungarian diacritics mapped to
+# the code points of their basic Latin characters
+DIACRITICS_TO_BASIC_LATIN_CHARACTERS = {
+    192: 65,  # À -> A
+    193: 65,  # Á -> A
+    194: 65,  # Â -> A
+    195: 65,  # Ã -> A
+    196: 65,  # Ä -> A
+    197: 65,  # Å -> A
+    258: 65,  # Ă -> A
+    224: 97,  # à -> a
+    225: 97,  # á -> a
+    226: 97,  # â -> a
+    227: 97,  # ã -> a
+    228: 97,  # ä -> a
+    259: 97,  # ă -> a
+    200: 69,  # È -> E
+    201: 69,  # É -> E
+    202: 69,  # Ê -> E
+    233: 101,  # é -> e
+    234: 101,  # ê -> e
+    232: 101,  # è -> e
+    205: 73,  # Í -> I
+    206: 73,  # Î -> I
+    237: 105,  # í -> i
+    238: 105,  # î -> i
+    211: 79,  # Ó -> O
+    213: 79,  # Õ -> O
+    214: 79,  # Ö -> O
+    336: 79,  # Ő -> O
+    243: 111,  # ó -> o
+    245: 111,  # õ -> o
+    246: 111,  # ö -> o
+    337: 111,  # ő -> o
+    218: 85,  # Ú -> U
+    220: 85,  # Ü -> U
+    368: 85,  # Ű -> U
+    250: 117,  # ú -> u
+    252: 117,  # ü -> u
+    369: 117,  # ű -> u
+    350: 83,  # Ş -> S
+    536: 83,  # Ș -> S
+    351: 115,  # ş -> s
+    537: 115,  # ș -> s
+    538: 84,  # Ț -> T
+    354: 84,  # Ţ -> T
+    539: 116,  # ț -> t
+    355: 116,  # ţ -> t
+}
+# The same table as a string indexed by code point, which str.translate() reads
+# faster than a dict (the characters after its end are left unchanged)
+DIACRITICS_TRANSLATION_TABLE = "".join(
+    chr(DIACRITICS_TO_BASIC_LATIN_CHARACTERS.get(code_point, code_point))
+    for code_point in range(max(DIACRITICS_TO_BASIC_LATIN_CHARACTERS) + 1)
 )
 
 
 def get_previews_for_page_id(
-    paginated_details_for_searched_term, s_word, preview_length
+    paginated_details_for_searched_term,
+    s_word,
+    preview_length,
+    use_folded_content=False,
 ):
     """
     Generate preview texts for page IDs based on provided search term.
@@ -29,11 +103,14 @@ def get_previews_for_page_id(
 
     Args:
         paginated_details_for_searched_term
-        (flask_sqlalchemy.pagination.QueryPagination): A flask_sqlalchemy
+        (flask_sqlalchemy.pagination.Pagination): A flask_sqlalchemy
         Pagination object containing search results.
         s_word (str): The term to generate preview text around.
         preview_length (int) : The length of the preview before and after the
         search term.
+        use_folded_content (bool): Build the previews from the normalized and
+        folded content stored by create_folded_content_table() instead of
+        converting the content of every page. Default is False.
 
     Returns:
         previews_for_page_id (list): A list containing pairs of
@@ -42,19 +119,33 @@ def get_previews_for_page_id(
 
     previews_for_page_id = []
 
-    for result in paginated_details_for_searched_term:
-        page_id = result[-1]
-
-        content = get_magazine_content_details(page_id)
-        content = replace_multiple_extra_white_spaces_with_just_one(content)
+    # the content of all the pages is retrieved with a single query
+    page_ids = [result[-1] for result in paginated_details_for_searched_term]
+    if use_folded_content:
+        magazine_contents = get_magazine_contents_and_folded_contents(page_ids)
+    else:
+        magazine_contents = {
+            page_id: (content, None)
+            for page_id, content in get_magazine_contents(page_ids).items()
+        }
+
+    # all the forms of the term are highlighted in a single pass over each
+    # preview
+    highlighter = Highlighter(fold_text(s_word))
+
+    for page_id in page_ids:
+        content, folded_content = magazine_contents.get(page_id, ("", None))
+
+        # the stored content is already normalized and folded
+        if folded_content is None:
+            content = replace_multiple_extra_white_spaces_with_just_one(content)
+        if folded_content is None or len(folded_content) != len(content):
+            folded_content = fold_text(content)
 
         s_word_string_length = len(s_word)
 
         indexes_for_highlighting_s_word = get_indexes_for_highlighting_s_word(
-            s_word, content
-        )
-        distinct_s_word_variants = get_distinct_s_word_variants(
-            indexes_for_highlighting_s_word, content, s_word_string_length
+            s_word, content, folded_content
         )
 
         preview_substrings_start_end_indexes = (
@@ -69,12 +160,16 @@ def get_previews_for_page_id(
             preview_substrings_start_end_indexes
         )
         preview_string = get_preview_string(preview_substring_indexes, content)
+        # the same indexes in the folded content give the folded preview
+        folded_preview_string = get_preview_string(
+            preview_substring_indexes, folded_content
+        )
 
         preview_string_with_highlighted_s_word = Markup(
             (
                 add_html_tags_around_preview_string_parantheses(
-                    add_html_mark_tags_to_the_searched_term(
-                        distinct_s_word_variants, preview_string
+                    highlighter.add_html_mark_tags(
+                        preview_string, folded_preview_string
                     )
                 )
             )
@@ -85,6 +180,60 @@ def get_previews_for_page_id(
     return previews_for_page_id
 
 
+def get_snippet_previews_for_page_id(
+    paginated_details_for_searched_term, formatted_s_word, snippet_tokens
+):
+    """
+    Generate preview texts for page IDs with the FTS5 snippet() function.
+
+    This function is an alternative to get_previews_for_page_id(): the preview
+    of each page is the snippet returned by SQLite for the search term, so the
+    text of the pages is not retrieved and searched in Python. A snippet is a
+    single fragment of the page (the one with the most matches of the term).
+
+    Args:
+        paginated_details_for_searched_term
+        (flask_sqlalchemy.pagination.Pagination): A flask_sqlalchemy
+        Pagination object containing search results.
+        formatted_s_word (str): The search term the results were found with,
+        with its words separated by "+".
+        snippet_tokens (int): The maximum number of tokens of a preview
+        (between 1 and 64).
+
+    Returns:
+        previews_for_page_id (list): A list containing pairs of
+        page IDs (int) and their corresponding preview texts (str).
+    """
+
+    page_ids = [result[-1] for result in paginated_details_for_searched_term]
+    snippets = get_snippets(
+        formatted_s_word,
+        page_ids,
+        snippet_tokens,
+        SNIPPET_START_MARK,
+        SNIPPET_END_MARK,
+        SNIPPET_ELLIPSIS,
+    )
+
+    previews_for_page_id = []
+
+    for page_id in page_ids:
+        snippet = replace_multiple_extra_white_spaces_with_just_one(
+            snippets.get(page_id, "")
+        ).strip()
+        snippet = (
+            str(escape(snippet))
+            .replace(SNIPPET_START_MARK, "<mark>")
+            .replace(SNIPPET_END_MARK, "</mark>")
+        )
+
+        previews_for_page_id.append(
+            [page_id, Markup(add_html_tags_around_preview_string_parantheses(snippet))]
+        )
+
+    return previews_for_page_id
+
+
 def replace_multiple_extra_white_spaces_with_just_one(text=""):
     """
     Replace multiple consecutive whitespace characters with a single space.
@@ -120,146 +269,81 @@ def convert_diacritics_to_basic_latin_characters(string_to_convert=""):
     if not isinstance(string_to_convert, str):
         return ""
 
-    convert_diacritics_to_basic_latin_characters_dict = {
-        192: 65,  # À -> A
-        193: 65,  # Á -> A
-        194: 65,  # Â -> A
-        195: 65,  # Ã -> A
-        196: 65,  # Ä -> A
-        197: 65,  # Å -> A
-        258: 65,  # Ă -> A
-        224: 97,  # à -> a
-        225: 97,  # á -> a
-        226: 97,  # â -> a
-        227: 97,  # ã -> a
-        228: 97,  # ä -> a
-        259: 97,  # ă -> a
-        200: 69,  # È -> E
-        201: 69,  # É -> E
-        202: 69,  # Ê -> E
-        233: 101,  # é -> e
-        234: 101,  # ê -> e
-        232: 101,  # è -> e
-        205: 73,  # Í -> I
-        206: 73,  # Î -> I
-        237: 105,  # í -> i
-        238: 105,  # î -> i
-        211: 79,  # Ó -> O
-        213: 79,  # Õ -> O
-        214: 79,  # Ö -> O
-        336: 79,  # Ő -> O
-        243: 111,  # ó -> o
-        245: 111,  # õ -> o
-        246: 111,  # ö -> o
-        337: 111,  # ő -> o
-        218: 85,  # Ú -> U
-        220: 85,  # Ü -> U
-        368: 85,  # Ű -> U
-        250: 117,  # ú -> u
-        252: 117,  # ü -> u
-        369: 117,  # ű -> u
-        350: 83,  # Ş -> S
-        536: 83,  # Ș -> S
-        351: 115,  # ş -> s
-        537: 115,  # ș -> s
-        538: 84,  # Ț -> T
-        354: 84,  # Ţ -> T
-        539: 116,  # ț -> t
-        355: 116,  # ţ -> t
-    }
-
-    converted_string = string_to_convert.translate(
-        convert_diacritics_to_basic_latin_characters_dict
-    )
+    converted_string = string_to_convert.translate(DIACRITICS_TRANSLATION_TABLE)
 
     return converted_string
 
 
-def get_indexes_for_highlighting_s_word(s_word, content):
+def fold_text(text=""):
     """
-    Find all starting indices of a specified term in the given content.
+    Convert the diacritics of a text to basic Latin characters and its letters
+    to lowercase, keeping the length of the text.
+
+    The few characters whose lowercase has a different length (for example
+    "İ") are kept as they are, so an index in the folded text is the same
+    index in the text.
 
     Args:
-        s_word (str): The term to search for.
-        content (str): The text to search within.
+        text (str): The text to fold. Default is empty string: "".
 
     Returns:
-        indexes_for_highlighting_s_word (list): A list of integers representing
-        the starting indexes of each occurrence of the searched term.
+        folded_text (str): The folded text, with the same length as text.
     """
 
-    formatted_content_string = convert_diacritics_to_basic_latin_characters(
-        content
-    ).lower()
-    formatted_s_word = convert_diacritics_to_basic_latin_characters(s_word).lower()
-    s_word_string_length = len(s_word)
+    folded_text = convert_diacritics_to_basic_latin_characters(text).lower()
+    if len(folded_text) == len(text):
+        return folded_text
 
-    indexes_for_highlighting_s_word = []
-    find_s_word = formatted_content_string.find(formatted_s_word)
-
-    while find_s_word > -1:
-        indexes_for_highlighting_s_word.append(find_s_word)
-        current_last_index = indexes_for_highlighting_s_word[-1]
-        index_content_string = formatted_content_string[
-            current_last_index + s_word_string_length :
-        ]
-
-        find_s_word = index_content_string.find(formatted_s_word)
-        if find_s_word > -1:
-            find_s_word = current_last_index + s_word_string_length + find_s_word
-
-    return indexes_for_highlighting_s_word
+    return "".join(
+        character if len(character) == 1 else original_character
+        for character, original_character in zip(
+            (
+                character.lower()
+                for character in convert_diacritics_to_basic_latin_characters(text)
+            ),
+            text,
+        )
+    )
 
 
-def get_distinct_s_word_variants(
-    indexes_for_highlighting_s_word, content, s_word_string_length
-):
+def get_indexes_for_highlighting_s_word(s_word, content, folded_content=None):
     """
-    Find distinct versions of the searched term in the given content.
-
-    The function returns variations caused by different case letters or the use
-    of diacritics for a term (i, e.: "Darwin", "darwin" or "Babeș","Babes").
+    Find all starting indices of a specified term in the given content.
 
     Args:
-        indexes_for_highlighting_s_word (list of int): A list of integers
-        representing string indexes.
-        content (str): The string in which to search for the term.
-        s_word_string_length (int): The length of the searched term.
+        s_word (str): The term to search for.
+        content (str): The text to search within.
+        folded_content (str or None): The content already folded with
+        fold_text(), used instead of folding the content if it has the same
+        length. Default is None.
 
     Returns:
-        distinct_s_words_variants (list of str): A list of distinct variants of
-        the searched term.
+        indexes_for_highlighting_s_word (list): A list of integers representing
+        the starting indexes of each occurrence of the searched term.
     """
 
-    distinct_s_word_variants = []
-
-    for index in indexes_for_highlighting_s_word:
-        string_to_search = content[index : index + s_word_string_length]
-        if string_to_search not in distinct_s_word_variants:
-            distinct_s_word_variants.append(string_to_search)
-
-    return distinct_s_word_variants
-
-
-def add_html_mark_tags_to_the_searched_term(distinct_s_word_variants, content):
-    """
-    Add HTML 'mark' tags around every variant of a term in the content.
+    if folded_content is not None and len(folded_content) == len(content):
+        formatted_content_string = folded_content
+    else:
+        formatted_content_string = fold_text(content)
+    formatted_s_word = fold_text(s_word)
+    s_word_string_length = len(s_word)
 
-    Args:
-        distinct_s_word_variants (list of str): A list of distinct variants for
-        a term.
-        content (str): The content string to modify.
+    if not formatted_s_word:
+        return []
 
-    Returns:
-        content (str): The modified content with HTML 'mark' tags around each
-        variant of the term.
-    """
+    # the search for the next occurrence starts after the end of the previous
+    # one, without copying the rest of the content
+    indexes_for_highlighting_s_word = []
+    find_s_word = formatted_content_string.find(formatted_s_word)
 
-    while len(distinct_s_word_variants) > 0:
-        word = distinct_s_word_variants.pop()
-        content = content.replace(word, "<mark>" + word + "</mark>")
+    while find_s_word > -1:
+        indexes_for_highlighting_s_word.append(find_s_word)
+        find_s_word = formatted_content_string.find(
+            formatted_s_word, find_s_word + s_word_string_length
+        )
 
-    return content
+    return indexes_for_highlighting_s_word
 
 
 def add_html_tags_around_preview_string_parantheses(content):
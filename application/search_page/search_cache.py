@@ -0,0 +1,360 @@
+"""search_cache module
+
+This module builds the keys of the cached search data (the results of a
+search and the previews of its results) and reads and writes the data in the
+Flask-Caching backend of the app. The searched term of a key is normalized,
+so the searches that differ only by case, diacritics or white spaces share
+their cached data, and every key is namespaced by the build id of the
+database (see stamp_database_build_id()): once the database is created again
+the data cached for the previous build is no longer read, and it expires on
+its own, so nothing has to be flushed.
+
+The data that is expensive to compute (like the counts and the ids of the
+results of a term) is read with get_or_compute(), so it is computed by a
+single worker at a time when it isn't cached, instead of by every worker that
+gets the term at the same moment.
+"""
+
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from application.cache_backends import get_cache_lock
+from application.search_page.previews import fold_text
+from application.search_page.search_page_data_repository import (
+    get_database_build_id,
+)
+
+# The build id used for a database created before the build ids were stored
+UNVERSIONED_BUILD_ID = "unversioned"
+
+
+class SearchCache:
+    """
+    The cache of the search data, stored in a Flask-Caching backend.
+
+    Each read is a single call to the backend (a single round trip to Redis):
+    get() returns None for a missing key instead of checking first that the
+    key exists, and get_many() reads several keys at once.
+
+    Args:
+        backend (flask_caching.Cache or None): The Flask-Caching cache the data
+        is stored in. Default is None (set by init_app()).
+        build_id (str or None): The build id of the database. Default is None
+        (it is read from the database).
+        default_timeout (int): The timeout of the data stored by
+        get_or_compute(), in seconds (0 for no timeout). Default is 300.
+        lock_timeout (int): The number of seconds after which the lock of a
+        worker that computes some data expires. Default is 30.
+        lock_wait (float): The number of seconds a worker waits for the data
+        computed by another worker. Default is 10.
+        stale_timeout (int): The number of seconds the data is kept after it
+        expires, to be returned while it is computed again. Default is 60.
+        early_refresh_beta (float): How early the data is computed again
+        before it expires (0 to compute it only once it expires). Default is
+        1.0.
+        lock_folder (str or None): The folder of the lock files. Default is
+        None (a folder in the temporary folder of the system).
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        build_id=None,
+        default_timeout=300,
+        lock_timeout=30,
+        lock_wait=10,
+        stale_timeout=60,
+        early_refresh_beta=1.0,
+        lock_folder=None,
+    ):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.stale_timeout = stale_timeout
+        self.early_refresh_beta = early_refresh_beta
+        self.lock_folder = lock_folder or os.path.join(
+            tempfile.gettempdir(), "darwin_app_cache_locks"
+        )
+        self._build_id = build_id
+        self._lock = threading.Lock()
+        # the lock of each key computed in the process and the number of
+        # workers that use it, removed once no worker uses it
+        self._process_locks = {}
+        self._process_locks_lock = threading.Lock()
+
+    def init_app(self, app, backend):
+        """
+        Store the search data in the Flask-Caching backend of the app,
+        configured from the SEARCH_CACHE_* settings of the app.
+        """
+        self.backend = backend
+        self.default_timeout = app.config["CACHE_DEFAULT_TIMEOUT"]
+        self.lock_timeout = app.config["SEARCH_CACHE_LOCK_TIMEOUT"]
+        self.lock_wait = app.config["SEARCH_CACHE_LOCK_WAIT"]
+        self.stale_timeout = app.config["SEARCH_CACHE_STALE_TIMEOUT"]
+        self.early_refresh_beta = app.config["SEARCH_CACHE_EARLY_REFRESH_BETA"]
+        self.lock_folder = app.config["SEARCH_CACHE_LOCK_FOLDER"]
+        with self._lock:
+            self._build_id = None
+
+    @property
+    def build_id(self):
+        """
+        The build id of the database, read from the database the first time
+        it is needed.
+        """
+        with self._lock:
+            if self._build_id is None:
+                self._build_id = get_database_build_id() or UNVERSIONED_BUILD_ID
+            return self._build_id
+
+    def make_key(self, namespace, s_word, *options, fold_term=True):
+        """
+        Build the key of some search data.
+
+        Args:
+            namespace (str): The kind of data, like "results" or "preview".
+            s_word (str): The searched term.
+            options: The other parameters the data depends on (like the sort
+            order or the match mode of the search).
+            fold_term (bool): Whether the term is folded, see
+            make_search_cache_key(). Default is True.
+
+        Returns:
+            key (str): The key, namespaced by the build id of the database.
+        """
+
+        return make_search_cache_key(
+            self.build_id, namespace, s_word, *options, fold_term=fold_term
+        )
+
+    def get(self, key):
+        """Get the data of a key, or None if it isn't cached."""
+        return self.backend.get(key)
+
+    def get_many(self, keys):
+        """
+        Get the data of several keys with a single call to the backend.
+
+        Args:
+            keys (list of str): The keys.
+
+        Returns:
+            data (dict): The data found, by key. The keys that were not found
+            are missing from the dictionary.
+        """
+
+        if not keys:
+            return {}
+
+        return {
+            key: value
+            for key, value in zip(keys, self.backend.get_many(*keys))
+            if value is not None
+        }
+
+    def add(self, key, value, timeout=None):
+        """Store the data of a key, unless the key is already cached."""
+        return self.backend.add(key, value, timeout=timeout)
+
+    def set_many(self, mapping, timeout=None):
+        """Store the data of several keys with a single call to the backend."""
+        return self.backend.set_many(mapping, timeout=timeout)
+
+    def get_or_compute(self, key, compute, timeout=None):
+        """
+        Get the data of a key, computed by a single worker when it isn't
+        cached (single-flight).
+
+        The worker that computes the data holds the lock of the key in its
+        process and, if the processes share the backend, the lock of the key
+        shared by the processes (see get_cache_lock()). The other workers wait up to lock_wait seconds for
+        the data it stores, or return the stale data right away if there is
+        some. The data is stored with the time it took to compute, and it is
+        computed again a little before it expires, at a random time that is
+        earlier for the data that takes longer to compute (the XFetch
+        algorithm), so the popular keys rarely expire at all.
+
+        Args:
+            key (str): The key of the data.
+            compute (callable): The function called without arguments that
+            computes the data.
+            timeout (int or None): The timeout of the data in seconds. Default
+            is None (default_timeout).
+
+        Returns:
+            data: The cached or computed data.
+        """
+
+        entry = self.backend.get(key)
+        if entry is not None and not self._should_refresh(entry):
+            return entry[0]
+
+        # a worker with stale data doesn't wait for the worker that computes
+        # the data again
+        wait = self.lock_wait if entry is None else 0
+        with self._single_flight(key, wait) as acquired:
+            if acquired:
+                cached_entry = self.backend.get(key)
+                if cached_entry is not None and cached_entry != entry:
+                    # computed by another worker while this one waited
+                    return cached_entry[0]
+
+                return self._compute_and_store(key, compute, timeout)
+
+        if entry is not None:
+            return entry[0]
+
+        entry = self.backend.get(key)
+        if entry is not None:
+            return entry[0]
+
+        # the worker that holds the lock took longer than lock_wait
+        return self._compute_and_store(key, compute, timeout)
+
+    def _compute_and_store(self, key, compute, timeout):
+        start = time.time()
+        data = compute()
+        end = time.time()
+
+        if timeout is None:
+            timeout = self.default_timeout
+
+        # an entry is (data, time to compute it, time it expires at)
+        if timeout:
+            self.backend.set(
+                key,
+                (data, end - start, end + timeout),
+                timeout=timeout + self.stale_timeout,
+            )
+        else:
+            self.backend.set(key, (data, end - start, None), timeout=0)
+
+        return data
+
+    def _should_refresh(self, entry):
+        _, compute_time, expires_at = entry
+        if expires_at is None:
+            return False
+
+        # 1 - random() is in (0, 1], so its logarithm is finite
+        return (
+            time.time()
+            - compute_time * self.early_refresh_beta * math.log(1 - random.random())
+            >= expires_at
+        )
+
+    @contextmanager
+    def _process_lock(self, key):
+        with self._process_locks_lock:
+            entry = self._process_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            yield entry[0]
+        finally:
+            with self._process_locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._process_locks[key]
+
+    @contextmanager
+    def _single_flight(self, key, wait):
+        with self._process_lock(key) as process_lock:
+            with self._acquire_locks(key, process_lock, wait) as acquired:
+                yield acquired
+
+    @contextmanager
+    def _acquire_locks(self, key, process_lock, wait):
+        start = time.monotonic()
+        if wait > 0:
+            acquired = process_lock.acquire(timeout=wait)
+        else:
+            acquired = process_lock.acquire(blocking=False)
+
+        if not acquired:
+            yield False
+            return
+
+        try:
+            lock = get_cache_lock(
+                getattr(self.backend, "cache", self.backend),
+                key,
+                self.lock_timeout,
+                self.lock_folder,
+            )
+            if lock is None:
+                yield True
+                return
+
+            remaining_wait = max(wait - (time.monotonic() - start), 0)
+            if not lock.acquire(
+                blocking=remaining_wait > 0, blocking_timeout=remaining_wait
+            ):
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                lock.release()
+        finally:
+            process_lock.release()
+
+
+# The search cache of the app, configured by init_app()
+search_cache = SearchCache()
+
+
+def normalize_search_term(s_word):
+    """
+    Normalize a searched term for the cache keys.
+
+    The term is folded (see fold_text()) and its white spaces and "+"
+    separators are replaced by single spaces, because the results and the
+    previews of a search don't depend on the case or the diacritics of the
+    term.
+
+    Args:
+        s_word (str): The searched term.
+
+    Returns:
+        normalized_s_word (str): The normalized term.
+    """
+
+    return " ".join(fold_text(s_word).replace("+", " ").split())
+
+
+def make_search_cache_key(build_id, namespace, s_word, *options, fold_term=True):
+    """
+    Build the key of some search data for a build of the database.
+
+    Args:
+        build_id (str): The build id of the database.
+        namespace (str): The kind of data, like "results" or "preview".
+        s_word (str): The searched term.
+        options: The other parameters the data depends on.
+        fold_term (bool): Whether the term is normalized with
+        normalize_search_term(). If False only its white spaces are
+        normalized, for the data that displays the term as it was searched.
+        Default is True.
+
+    Returns:
+        key (str): The key: "search_<build id>_<namespace>_<options>_<term>".
+    """
+
+    return "_".join(
+        [
+            "search",
+            build_id,
+            namespace,
+            *(str(option) for option in options),
+            normalize_search_term(s_word) if fold_term else " ".join(s_word.split()),
+        ]
+    )
@@ -0,0 +1,391 @@
+"""search_executor module
+
+This module runs a search with a single scan of the FTS5 table and builds,
+from the same scan, the number of results for each magazine and the ordered
+lists of result ids used for pagination. It also packs these lists into
+compact byte strings so they can be cached, and estimates the cost of a
+search before running it.
+"""
+
+import heapq
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from application import db
+from application.search_page.helpers import pack_ids, unpack_ids
+from application.search_page.previews import (
+    convert_diacritics_to_basic_latin_characters,
+)
+from application.search_page.search_page_data_repository import (
+    KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+    MATCH_SUBSTRING,
+    SORT_BY_RELEVANCE,
+    get_document_frequency,
+    get_fts_table,
+    get_ids_and_names_for_searched_term,
+    get_ids_and_names_for_searched_term_in_shard,
+    get_rank_column,
+)
+
+# The thread pool the FTS5 shard tables are queried from, created by the first
+# sharded search
+shard_executor = None
+shard_executor_lock = threading.Lock()
+
+
+def scan_searched_term(
+    formatted_s_word,
+    sort=None,
+    match=None,
+    cost_threshold=None,
+    max_results=None,
+    shards=0,
+):
+    """
+    Search for a term and build the data needed for all its results pages.
+
+    The FTS5 MATCH is executed only once. The results are grouped by magazine
+    name in Python, instead of running separate count and group by queries,
+    and the ids of the results are kept in the order they are displayed in,
+    so any page (with or without a magazine filter) is a slice of a list.
+
+    If the number of results estimated by estimate_results_count() is above
+    cost_threshold, only the first max_results results are retrieved (the
+    FTS5 table stops after them when the results are ordered by id) and the
+    estimate is returned as the approximate number of results.
+
+    Args:
+        formatted_s_word (str): The search term used for retrieval.
+        sort (str or None): SORT_BY_RELEVANCE to order the results by their
+        FTS5 rank. Default is None (the results are ordered by id, or
+        chronologically for a specific magazine).
+        match (str or None): The match mode, see join_fts_table(). Default is
+        None.
+        cost_threshold (int or None): The estimated number of results above
+        which the search is limited to max_results. Default is None (the
+        number of results is not estimated).
+        max_results (int or None): The number of results retrieved for an
+        expensive search. Default is None.
+        shards (int): The number of FTS5 shard tables of the database. If it is
+        above 1 the shards are queried concurrently (except for a substring
+        search), see get_ids_and_names_from_shards(). Default is 0.
+
+    Returns:
+        search_results (dict): A dictionary with the following keys:
+        - "distinct_magazines_and_count": the list returned by
+        count_hits_by_magazine_name().
+        - "ids": an array of the ids of all results, in display order.
+        - "ids_by_magazine_name": a dictionary mapping each magazine name to an
+        array of the ids of its results, in display order.
+        - "approximate_results_count": the estimated number of results if only
+        the first results were retrieved, otherwise None.
+    """
+
+    limit = None
+    estimated_results_count = None
+    if cost_threshold is not None and max_results is not None:
+        estimated_results_count = estimate_results_count(formatted_s_word, match)
+        if (
+            estimated_results_count is not None
+            and estimated_results_count > cost_threshold
+        ):
+            limit = max_results
+
+    if sort == SORT_BY_RELEVANCE:
+        order_by_columns = (get_rank_column(match),)
+    elif limit is not None:
+        order_by_columns = (get_fts_table(match).rowid,)
+    else:
+        order_by_columns = KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE
+
+    if shards > 1 and match != MATCH_SUBSTRING:
+        hits = get_ids_and_names_from_shards(formatted_s_word, shards, sort, limit)
+    else:
+        hits = get_ids_and_names_for_searched_term(
+            formatted_s_word, order_by_columns, match, limit
+        )
+    if limit is not None and sort != SORT_BY_RELEVANCE:
+        # the results of each magazine are displayed chronologically
+        hits = sorted(hits, key=lambda hit: hit.display_order)
+
+    ids_by_magazine_name = {}
+    for hit in hits:
+        ids_by_magazine_name.setdefault(hit.name, []).append(hit.id)
+
+    ids = [hit.id for hit in hits]
+    if sort != SORT_BY_RELEVANCE:
+        # without a magazine filter the results are ordered by id
+        ids.sort()
+
+    approximate_results_count = None
+    if limit is not None and len(hits) == limit:
+        approximate_results_count = max(estimated_results_count, len(hits))
+
+    search_results = {
+        "distinct_magazines_and_count": count_hits_by_magazine_name(hits),
+        "ids": array("I", ids),
+        "ids_by_magazine_name": {
+            magazine_name: array("I", magazine_ids)
+            for magazine_name, magazine_ids in ids_by_magazine_name.items()
+        },
+        "approximate_results_count": approximate_results_count,
+    }
+
+    return search_results
+
+
+def get_ids_and_names_from_shards(formatted_s_word, shards, sort=None, limit=None):
+    """
+    Query the FTS5 shard tables concurrently and merge their results.
+
+    Each shard is queried on its own connection from a thread pool (sqlite3
+    releases the GIL while a query runs), so a search uses up to one core for
+    each shard. The results of each shard are ordered, so they are merged in
+    the order of the unsharded query: by display order, by id when the number
+    of results is limited, or by rank. The bm25 rank is computed from the
+    statistics of each shard, so the order by relevance can differ slightly
+    from the one of the unsharded table.
+
+    Args:
+        formatted_s_word (str): The search term used for retrieval.
+        shards (int): The number of FTS5 shard tables.
+        sort (str or None): SORT_BY_RELEVANCE to order the results by their
+        FTS5 rank. Default is None.
+        limit (int or None): The maximum number of results to retrieve. Default
+        is None.
+
+    Returns:
+        hits (list): The rows returned by
+        get_ids_and_names_for_searched_term_in_shard() for all the shards.
+    """
+
+    global shard_executor
+    with shard_executor_lock:
+        if shard_executor is None:
+            shard_executor = ThreadPoolExecutor(
+                max_workers=shards, thread_name_prefix="fts_shard"
+            )
+
+    engine = db.engine
+    futures = [
+        shard_executor.submit(
+            get_ids_and_names_for_searched_term_in_shard,
+            engine,
+            shard,
+            formatted_s_word,
+            sort,
+            limit,
+        )
+        for shard in range(shards)
+    ]
+    hits_by_shard = [future.result() for future in futures]
+
+    if sort == SORT_BY_RELEVANCE:
+        hits = heapq.merge(*hits_by_shard, key=lambda hit: hit.rank)
+    elif limit is not None:
+        hits = heapq.merge(*hits_by_shard, key=lambda hit: hit.id)
+    else:
+        hits = heapq.merge(*hits_by_shard, key=lambda hit: hit.display_order)
+
+    return list(hits)[:limit]
+
+
+def estimate_results_count(formatted_s_word, match=None):
+    """
+    Estimate the number of results of a search from the fts5vocab tables,
+    without running the search.
+
+    For the default search the estimate is the smallest number of pages that
+    contain one of the words of the term, where the pages of the last word are
+    the pages of all the words that start with it (the search is a prefix
+    query). For a substring search it is the smallest number of pages that
+    contain one of the trigrams of the term. It is an upper bound of the
+    number of results, computed with a few lookups in the FTS5 index.
+
+    Args:
+        formatted_s_word (str): The search term, with its words separated by
+        "+".
+        match (str or None): The match mode, see join_fts_table(). Default is
+        None.
+
+    Returns:
+        estimated_results_count (int or None): The estimated number of results,
+        or None if the fts5vocab tables don't exist.
+    """
+
+    term = convert_diacritics_to_basic_latin_characters(formatted_s_word).lower()
+
+    if match == MATCH_SUBSTRING:
+        term = term.replace("+", " ")
+        trigrams = {term[index : index + 3] for index in range(len(term) - 2)}
+        document_frequencies = [
+            get_document_frequency(trigram, match=match) for trigram in trigrams
+        ]
+    else:
+        words = term.split("+")
+        document_frequencies = [
+            get_document_frequency(word, prefix=index == len(words) - 1)
+            for index, word in enumerate(words)
+        ]
+
+    if not document_frequencies or None in document_frequencies:
+        return None
+
+    return min(document_frequencies)
+
+
+def count_hits_by_magazine_name(hits):
+    """
+    Count the search results for each magazine name.
+
+    Args:
+        hits (list): Rows returned by get_ids_and_names_for_searched_term().
+
+    Returns:
+        distinct_magazines_and_count (list of tuple): A list of
+        (magazine name, count) tuples ordered by magazine name.
+    """
+
+    count_by_magazine_name = {}
+    for hit in hits:
+        count_by_magazine_name[hit.name] = count_by_magazine_name.get(hit.name, 0) + 1
+
+    return sorted(count_by_magazine_name.items())
+
+
+def get_results_count(distinct_magazines_and_count, magazine_filter=None):
+    """
+    Get the number of results from the number of results of each magazine.
+
+    Args:
+        distinct_magazines_and_count (list of tuple): A list of
+        (magazine name, count) tuples.
+        magazine_filter (str or None): If given, only the results of this
+        magazine are counted. Default is None.
+
+    Returns:
+        int: The number of results.
+    """
+
+    if magazine_filter:
+        return sum(
+            count
+            for magazine_name, count in distinct_magazines_and_count
+            if magazine_name == magazine_filter
+        )
+
+    return sum(count for _, count in distinct_magazines_and_count)
+
+
+def get_ids_for_magazine_filter(search_results, magazine_filter=None):
+    """
+    Get the ordered ids of the results for a magazine filter.
+
+    Args:
+        search_results (dict): The dictionary returned by scan_searched_term()
+        or unpack_search_results().
+        magazine_filter (str or None): The magazine name to filter the results
+        by. Default is None.
+
+    Returns:
+        array.array or None: The ids of the results in display order, or None
+        if the ids were not kept (see pack_search_results()).
+    """
+
+    if search_results["ids"] is None:
+        return None
+
+    if magazine_filter:
+        return search_results["ids_by_magazine_name"].get(magazine_filter, array("I"))
+
+    return search_results["ids"]
+
+
+def get_page_ids(ids, page, per_page):
+    """
+    Get the ids of the results of a page from the ordered ids of all the
+    results, like paginate_ids() does.
+
+    Args:
+        ids (array.array): The ids of all the results, in display order.
+        page (int): The number of the page.
+        per_page (int): The number of results displayed on a page.
+
+    Returns:
+        page_ids (list of int): The ids of the results of the page, empty if the
+        page is out of range.
+    """
+
+    offset = (max(page, 1) - 1) * per_page
+
+    return ids[offset : offset + per_page].tolist()
+
+
+def pack_search_results(search_results, max_ids=None, compress=False):
+    """
+    Pack the dictionary returned by scan_searched_term() for caching.
+
+    Args:
+        search_results (dict): The dictionary returned by scan_searched_term().
+        max_ids (int or None): If the term has more results than max_ids, the
+        ids are not packed and the pages have to be queried from the database.
+        Default is None (no limit).
+        compress (bool): Compress the packed ids with zlib. Default is False.
+
+    Returns:
+        packed_search_results (dict): The same dictionary with the arrays of
+        ids packed into bytes, or set to None if there are more than max_ids
+        results.
+    """
+
+    packed_search_results = {
+        "distinct_magazines_and_count": search_results["distinct_magazines_and_count"],
+        "ids": None,
+        "ids_by_magazine_name": None,
+        "approximate_results_count": search_results["approximate_results_count"],
+    }
+
+    if max_ids is not None and len(search_results["ids"]) > max_ids:
+        return packed_search_results
+
+    packed_search_results["ids"] = pack_ids(search_results["ids"], compress)
+    packed_search_results["ids_by_magazine_name"] = {
+        magazine_name: pack_ids(magazine_ids, compress)
+        for magazine_name, magazine_ids in search_results[
+            "ids_by_magazine_name"
+        ].items()
+    }
+
+    return packed_search_results
+
+
+def unpack_search_results(packed_search_results):
+    """
+    Unpack a dictionary packed with pack_search_results().
+
+    Args:
+        packed_search_results (dict): The dictionary returned by
+        pack_search_results().
+
+    Returns:
+        search_results (dict): The dictionary with the ids unpacked into
+        arrays (or None if they were not packed).
+    """
+
+    if packed_search_results["ids"] is None:
+        return dict(packed_search_results)
+
+    return {
+        "distinct_magazines_and_count": packed_search_results[
+            "distinct_magazines_and_count"
+        ],
+        "ids": unpack_ids(packed_search_results["ids"]),
+        "ids_by_magazine_name": {
+            magazine_name: unpack_ids(magazine_ids)
+            for magazine_name, magazine_ids in packed_search_results[
+                "ids_by_magazine_name"
+            ].items()
+        },
+        "approximate_results_count": packed_search_results["approximate_results_count"],
+    }
@@ -3,65 +3,340 @@
 This module contains functions that extract data from database.
 """
 
-from sqlalchemy import func
+from sqlalchemy import column, func, literal_column, select, table
+from sqlalchemy.exc import OperationalError
 
 from application.models import (
-    MagazineNumber,
+    DatabaseBuild,
     MagazineNumberContent,
+    MagazineNumberContentFolded,
     MagazineNumberContentFTS,
-    Magazines,
-    MagazineYear,
+    MagazineNumberContentFTSVocab,
+    MagazineNumberContentTrigramFTS,
+    MagazineNumberContentTrigramFTSVocab,
+    SearchHits,
     db,
 )
+from application.search_page.pagination import (
+    IdListPagination,
+    KeysetPagination,
+    RankedPagination,
+)
+
+# Columns the search results are ordered by. They are used as the keyset for
+# the keyset pagination, so they have to be unique together. The
+# search_hits.display_order column is precomputed when the database is created
+# and orders the results by year, magazine number and page.
+KEYSET_COLUMNS = (SearchHits.id,)
+KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE = (SearchHits.display_order,)
+
+# The FTS5 rank columns. Ordering by them returns the best matches first (bm25).
+RANK_COLUMN = literal_column("magazine_number_content_fts.rank")
+TRIGRAM_RANK_COLUMN = literal_column("magazine_number_content_trigram_fts.rank")
+
+# The accepted values for the sort parameter of the search
+SORT_BY_RELEVANCE = "relevance"
+
+# The accepted values for the match parameter of the search: the default
+# search matches the words that start with the term, a substring search uses
+# the trigram FTS5 table to match the term anywhere inside the words
+MATCH_SUBSTRING = "substring"
+
+
+def is_missing_table_error(err):
+    """
+    Check whether a query failed because a table it reads doesn't exist in the
+    database (for example a table of an optional feature the database was
+    created without).
+
+    Args:
+        err (sqlalchemy.exc.OperationalError): The error raised by the query.
+
+    Returns:
+        bool: True if the table doesn't exist, False for any other error (like
+        a query interrupted because it exceeded SEARCH_QUERY_TIME_BUDGET).
+    """
+
+    return "no such table" in str(err.orig)
+
+
+def get_fts_table(match=None):
+    """
+    Get the FTS5 table searched for the match mode.
+
+    Args:
+        match (str or None): MATCH_SUBSTRING or None. Default is None.
+
+    Returns:
+        The MagazineNumberContentTrigramFTS model for a substring search, the
+        MagazineNumberContentFTS model otherwise.
+    """
+
+    if match == MATCH_SUBSTRING:
+        return MagazineNumberContentTrigramFTS
+
+    return MagazineNumberContentFTS
+
+
+def get_rank_column(match=None):
+    """
+    Get the FTS5 rank column of the table searched for the match mode.
+
+    Args:
+        match (str or None): MATCH_SUBSTRING or None. Default is None.
+
+    Returns:
+        sqlalchemy.sql.elements.ColumnElement: RANK_COLUMN or
+        TRIGRAM_RANK_COLUMN.
+    """
+
+    if match == MATCH_SUBSTRING:
+        return TRIGRAM_RANK_COLUMN
+
+    return RANK_COLUMN
+
+
+def join_fts_table(query, formatted_s_word, match=None):
+    """
+    Join a Query that selects from SearchHits with the FTS5 table that searches
+    for the provided term.
+
+    Args:
+        query (flask_sqlalchemy.query.Query): The Query object to filter.
+        formatted_s_word (str): The search term, with its words separated by
+        "+". For a substring search its diacritics have to be converted to
+        basic Latin characters, as they are in the trigram FTS5 table.
+        match (str or None): MATCH_SUBSTRING to search the trigram FTS5 table
+        for the term anywhere inside the words. Default is None (the words
+        that start with the term are searched in the FTS5 table).
+
+    Returns:
+        flask_sqlalchemy.query.Query: The Query object with only the rows that
+        contain the term.
+    """
+
+    fts_table = get_fts_table(match)
+    if match == MATCH_SUBSTRING:
+        expression_to_search = '"' + formatted_s_word.replace("+", " ") + '"'
+    else:
+        expression_to_search = '"' + formatted_s_word + '"' + "*"
+
+    return query.join(fts_table, SearchHits.id == fts_table.rowid).filter(
+        fts_table.magazine_content.match(expression_to_search)
+    )
 
 
-def get_details_for_searched_term(formatted_s_word):
+def get_details_for_searched_term(formatted_s_word, match=None):
     """
     Retrieve specific columns from multiple tables based on a provided search
     term.
 
     Args:
         formatted_s_word (str): The search term used for retrieval.
+        match (str or None): The match mode, see join_fts_table(). Default is
+        None.
 
     Returns:
         all_details_for_searched_term (flask_sqlalchemy.query.Query): A Query
         object containing the retrieved results.
 
     This function returns a SQLAlchemy Query object that retrieves specific
-    columns (Magazines.name, MagazineYear.year, MagazineNumber.magazine_number,
-    MagazineNumberContent.magazine_page, MagazineNumber.magazine_number_link,
-    and MagazineNumberContent.id) from multiple tables based on a provided
-    search term.
+    columns (SearchHits.name, SearchHits.year, SearchHits.magazine_number,
+    SearchHits.magazine_page, SearchHits.magazine_number_link and
+    SearchHits.id) based on a provided search term.
     The search is performed on an FTS5 table, which enables fast text search
-    capabilities.
+    capabilities. The search_hits table already holds the details from the
+    magazines, magazine_year, magazine_number and magazine_number_content
+    tables, so each result needs a single primary key lookup.
     The Query object can be iterated to access the results.
     """
 
-    expression_to_search = '"' + formatted_s_word + '"' + "*"
-
-    all_details_for_searched_term = (
+    all_details_for_searched_term = join_fts_table(
         db.session.query(
-            Magazines.name,
-            MagazineYear.year,
-            MagazineNumber.magazine_number,
-            MagazineNumberContent.magazine_page,
-            MagazineNumber.magazine_number_link,
-            MagazineNumberContent.id,
-        )
-        .join(MagazineYear, Magazines.id == MagazineYear.magazine_id)
-        .join(MagazineNumber, MagazineYear.id == MagazineNumber.magazine_year_id)
-        .join(
-            MagazineNumberContent,
-            MagazineNumber.id == MagazineNumberContent.magazine_number_id,
+            SearchHits.name,
+            SearchHits.year,
+            SearchHits.magazine_number,
+            SearchHits.magazine_page,
+            SearchHits.magazine_number_link,
+            SearchHits.id,
+        ),
+        formatted_s_word,
+        match,
+    )
+
+    return all_details_for_searched_term
+
+
+def get_ids_and_names_for_searched_term(
+    formatted_s_word, order_by_columns, match=None, limit=None
+):
+    """
+    Retrieve the id, magazine name and display order of all the results for a
+    provided search term in a single scan.
+
+    Args:
+        formatted_s_word (str): The search term used for retrieval.
+        order_by_columns (tuple): The columns the results are ordered by
+        (KEYSET_COLUMNS, KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE or the rank
+        column returned by get_rank_column()).
+        match (str or None): The match mode, see join_fts_table(). Default is
+        None.
+        limit (int or None): The maximum number of results to retrieve. Default
+        is None (all the results).
+
+    Returns:
+        ids_and_names (list): A list of (SearchHits.id, SearchHits.name,
+        SearchHits.display_order) rows ordered by order_by_columns.
+    """
+
+    ids_and_names = (
+        join_fts_table(
+            db.session.query(SearchHits.id, SearchHits.name, SearchHits.display_order),
+            formatted_s_word,
+            match,
         )
-        .join(
-            MagazineNumberContentFTS,
-            MagazineNumberContent.id == MagazineNumberContentFTS.rowid,
+        .order_by(*order_by_columns)
+        .limit(limit)
+        .all()
+    )
+
+    return ids_and_names
+
+
+def get_fts_shard_table(shard):
+    """
+    Get a table object for an FTS5 shard table.
+
+    Args:
+        shard (int): The number of the shard.
+
+    Returns:
+        sqlalchemy.sql.expression.TableClause: The
+        magazine_number_content_fts_shard_<shard> table, with its rowid,
+        magazine_content and rank columns.
+    """
+
+    return table(
+        f"magazine_number_content_fts_shard_{shard}",
+        column("rowid"),
+        column("magazine_content"),
+        column("rank"),
+    )
+
+
+def get_ids_and_names_for_searched_term_in_shard(
+    engine, shard, formatted_s_word, sort=None, limit=None
+):
+    """
+    Retrieve the id, magazine name and display order of the results for a
+    provided search term from a single FTS5 shard table.
+
+    The query runs on its own connection of the engine, so the shards can be
+    queried concurrently from different threads.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine of the app.
+        shard (int): The number of the shard.
+        formatted_s_word (str): The search term used for retrieval.
+        sort (str or None): SORT_BY_RELEVANCE to order the results by their
+        FTS5 rank, which is also selected. Default is None.
+        limit (int or None): The maximum number of results to retrieve, ordered
+        by id. Default is None (all the results, ordered by display order).
+
+    Returns:
+        ids_and_names (list): A list of (SearchHits.id, SearchHits.name,
+        SearchHits.display_order) rows, followed by the rank when the results
+        are ordered by relevance.
+    """
+
+    fts_shard = get_fts_shard_table(shard)
+    expression_to_search = '"' + formatted_s_word + '"' + "*"
+
+    columns = [SearchHits.id, SearchHits.name, SearchHits.display_order]
+    if sort == SORT_BY_RELEVANCE:
+        columns.append(fts_shard.c.rank)
+        order_by_column = fts_shard.c.rank
+    elif limit is not None:
+        order_by_column = fts_shard.c.rowid
+    else:
+        order_by_column = SearchHits.display_order
+
+    query = (
+        select(*columns)
+        .join(fts_shard, SearchHits.id == fts_shard.c.rowid)
+        .where(fts_shard.c.magazine_content.match(expression_to_search))
+        .order_by(order_by_column)
+        .limit(limit)
+    )
+
+    with engine.connect() as conn:
+        ids_and_names = conn.execute(query).all()
+
+    return ids_and_names
+
+
+def get_document_frequency(term, prefix=False, match=None):
+    """
+    Retrieve from the fts5vocab table the number of pages that contain a term.
+
+    Args:
+        term (str): The term, as it is stored in the FTS5 table (lower case and
+        without diacritics).
+        prefix (bool): If True, the pages of all the terms that start with the
+        term are counted (a page that contains more of these terms is counted
+        once for each of them). Default is False.
+        match (str or None): The match mode, see join_fts_table(). For a
+        substring search the terms are trigrams. Default is None.
+
+    Returns:
+        document_frequency (int or None): The number of pages, or None if the
+        fts5vocab table doesn't exist.
+    """
+
+    vocab_table = MagazineNumberContentFTSVocab
+    if match == MATCH_SUBSTRING:
+        vocab_table = MagazineNumberContentTrigramFTSVocab
+
+    document_frequency = db.session.query(func.sum(vocab_table.doc))
+    if prefix and term:
+        # the range of the terms that start with the term
+        next_term = term[:-1] + chr(ord(term[-1]) + 1)
+        document_frequency = document_frequency.filter(
+            vocab_table.term >= term, vocab_table.term < next_term
         )
-        .filter(MagazineNumberContentFTS.magazine_content.match(expression_to_search))
+    else:
+        document_frequency = document_frequency.filter(vocab_table.term == term)
+
+    try:
+        return document_frequency.scalar() or 0
+    except OperationalError as err:
+        db.session.rollback()
+        if not is_missing_table_error(err):
+            raise
+        return None
+
+
+def get_details_for_ids():
+    """
+    Retrieve the same columns as get_details_for_searched_term(), without
+    searching the FTS5 table.
+
+    Returns:
+        details_for_ids (flask_sqlalchemy.query.Query): A Query object that is
+        filtered by the ids of the results when a page is retrieved by
+        paginate_ids().
+    """
+
+    details_for_ids = db.session.query(
+        SearchHits.name,
+        SearchHits.year,
+        SearchHits.magazine_number,
+        SearchHits.magazine_page,
+        SearchHits.magazine_number_link,
+        SearchHits.id,
     )
 
-    return all_details_for_searched_term
+    return details_for_ids
 
 
 def get_details_for_searched_term_for_specific_magazine(
@@ -73,7 +348,7 @@ def get_details_for_searched_term_for_specific_magazine(
     Args:
         details_for_searched_term (flask_sqlalchemy.query.Query): The Query
         object returned by the get_details_for_searched_term function.
-        magazine_filter (str): The filter term representing Magazines.name.
+        magazine_filter (str): The filter term representing SearchHits.name.
 
     Returns:
         details_for_specific_magazine (flask_sqlalchemy.query.Query): A new
@@ -81,86 +356,284 @@ def get_details_for_searched_term_for_specific_magazine(
     """
 
     details_for_specific_magazine = details_for_searched_term.filter(
-        Magazines.name == magazine_filter
-    ).order_by(
-        MagazineYear.year,
-        MagazineNumber.magazine_number,
-        MagazineNumberContent.magazine_page,
-    )
+        SearchHits.name == magazine_filter
+    ).order_by(*KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE)
 
     return details_for_specific_magazine
 
 
-def paginate_results(details_for_searched_term, page, per_page, error_out):
+def paginate_results_with_keyset(
+    details_for_searched_term,
+    keyset_columns,
+    page,
+    per_page,
+    error_out,
+    total,
+    cursor=None,
+):
     """
-    Generate a SQLAlchemy Pagination object for the provided Query.
+    Generate a KeysetPagination object for the provided Query.
 
     Args:
         details_for_searched_term (flask_sqlalchemy.query.Query): The SQLAlchemy
         Query object to paginate.
-        page (int): The page number to retrieve.
+        keyset_columns (tuple): The columns the results are ordered by
+        (KEYSET_COLUMNS or KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE).
+        page (int): The number of the page to retrieve. When a cursor is given
+        it is only used for displaying the page number.
+        per_page (int): The number of results to be displayed on a page.
+        error_out (bool): The error flag for the error_out argument for the
+        pagination object.
+        total (int): The total number of results of the Query.
+        cursor (tuple or None): A (direction, key) tuple returned by
+        decode_cursor(). If None, the page is retrieved using OFFSET. Default is
+        None.
+
+    Returns:
+        application.search_page.pagination.KeysetPagination: A Pagination object
+        representing the subset of query results for the requested page.
+    """
+
+    direction, key = cursor if cursor else (None, None)
+
+    return KeysetPagination(
+        page=page,
+        per_page=per_page,
+        error_out=error_out,
+        query=details_for_searched_term,
+        keyset_columns=keyset_columns,
+        id_column=SearchHits.id,
+        direction=direction,
+        key=key,
+        total=total,
+    )
+
+
+def paginate_ids(ids, keyset_columns, page, per_page, error_out):
+    """
+    Generate an IdListPagination object for an ordered list of result ids.
+
+    Args:
+        ids (array.array): The ids of all the results, in display order.
+        keyset_columns (tuple or None): The columns the ids are ordered by
+        (KEYSET_COLUMNS or KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE), or None if
+        they are ordered by relevance.
+        page (int): The number of the page to retrieve.
+        per_page (int): The number of results to be displayed on a page.
+        error_out (bool): The error flag for the error_out argument for the
+        pagination object.
+
+    Returns:
+        application.search_page.pagination.IdListPagination: A Pagination
+        object representing the subset of results for the requested page.
+    """
+
+    return IdListPagination(
+        page=page,
+        per_page=per_page,
+        error_out=error_out,
+        query=get_details_for_ids(),
+        ids=ids,
+        keyset_columns=keyset_columns,
+        id_column=SearchHits.id,
+    )
+
+
+def paginate_results_by_relevance(
+    details_for_searched_term, page, per_page, error_out, total, match=None
+):
+    """
+    Generate a RankedPagination object for the provided Query.
+
+    The results are ordered by their FTS5 rank, best matches first.
+
+    Args:
+        details_for_searched_term (flask_sqlalchemy.query.Query): The SQLAlchemy
+        Query object to paginate, returned by get_details_for_searched_term()
+        or get_details_for_searched_term_for_specific_magazine().
+        page (int): The number of the page to retrieve.
         per_page (int): The number of results to be displayed on a page.
         error_out (bool): The error flag for the error_out argument for the
         pagination object.
+        total (int): The total number of results of the Query.
+        match (str or None): The match mode the Query was created with, see
+        join_fts_table(). Default is None.
 
     Returns:
-        flask_sqlalchemy.pagination.QueryPagination: A Pagination object
+        application.search_page.pagination.RankedPagination: A Pagination object
         representing the subset of query results for the requested page.
     """
-    return details_for_searched_term.paginate(
-        page=page, per_page=per_page, error_out=error_out
+
+    return RankedPagination(
+        page=page,
+        per_page=per_page,
+        error_out=error_out,
+        query=details_for_searched_term,
+        rank_column=get_rank_column(match),
+        total=total,
     )
 
 
-def get_distinct_magazine_names_and_count_for_searched_term(details_for_searched_term):
+def get_magazine_contents(page_ids):
     """
-    Retrieve distinct magazine names and search term counts.
+    Retrieve the content of several magazine pages from the
+    MagazineNumberContent table with a single query.
+
+    Only the content of these pages is decompressed, if the database was
+    created with PAGE_TEXT_COMPRESSION (see compress_page_texts()).
 
     Args:
-        details_for_searched_term (flask_sqlalchemy.query.Query): A Query object
-        containing all search results for a specific term.
+        page_ids (iterable of int): The rowids of the pages to retrieve the
+        content for.
 
     Returns:
-        distinct_magazine_names_and_count_for_searched_term
-        (flask_sqlalchemy.query.Query): A Query object containing tuples of
-        magazine names and search term counts.
+        magazine_contents (dict): The content of each page found, by page id.
+        The pages that were not found are missing from the dictionary.
+    """
+
+    page_ids = list(page_ids)
+    if not page_ids:
+        return {}
 
-    The Query object can be iterated to access the magazine names and their
-    respective search term counts.
+    magazine_contents = dict(
+        db.session.query(
+            MagazineNumberContent.id,
+            func.decompress_page_text(MagazineNumberContent.magazine_content),
+        ).filter(MagazineNumberContent.id.in_(page_ids))
+    )
+
+    return magazine_contents
+
+
+def get_magazine_contents_and_folded_contents(page_ids):
+    """
+    Retrieve the normalized content and the folded content (see
+    create_folded_content_table()) of several magazine pages with a single
+    query.
+
+    Args:
+        page_ids (iterable of int): The rowids of the pages to retrieve the
+        content for.
+
+    Returns:
+        magazine_contents (dict): A (content, folded content) tuple for each
+        page found, by page id. The folded content is None if it is missing (or
+        if the database has no magazine_number_content_folded table), and the
+        content is then the content of the page, not normalized. The pages
+        that were not found are missing from the dictionary.
     """
 
-    subq = details_for_searched_term.subquery()
-    distinct_magazine_names_and_count_for_searched_term = (
-        db.session.query(Magazines.name, func.count(Magazines.name))
-        .join(subq, Magazines.name == subq.c.name)
-        .group_by(Magazines.id)
-        .order_by(Magazines.name)
+    page_ids = list(page_ids)
+    if not page_ids:
+        return {}
+
+    query = (
+        db.session.query(
+            MagazineNumberContent.id,
+            # the content of the page is only read if the page has no
+            # normalized content
+            func.coalesce(
+                func.decompress_page_text(
+                    MagazineNumberContentFolded.magazine_content_normalized
+                ),
+                func.decompress_page_text(MagazineNumberContent.magazine_content),
+            ),
+            func.decompress_page_text(
+                MagazineNumberContentFolded.magazine_content_folded
+            ),
+        )
+        .outerjoin(
+            MagazineNumberContentFolded,
+            MagazineNumberContentFolded.id == MagazineNumberContent.id,
+        )
+        .filter(MagazineNumberContent.id.in_(page_ids))
     )
 
-    return distinct_magazine_names_and_count_for_searched_term
+    try:
+        rows = query.all()
+    except OperationalError as err:
+        db.session.rollback()
+        if not is_missing_table_error(err):
+            raise
+        return {
+            page_id: (content, None)
+            for page_id, content in get_magazine_contents(page_ids).items()
+        }
+
+    magazine_contents = {
+        page_id: (content, folded_content) for page_id, content, folded_content in rows
+    }
 
+    return magazine_contents
 
-def get_magazine_content_details(page_id=0):
+
+def get_snippets(
+    formatted_s_word, page_ids, snippet_tokens, start_mark, end_mark, ellipsis
+):
     """
-    Retrieve the content of a magazine page from the MagazineNumberContent table
-    based on the provided page_id.
+    Retrieve, with a single query, the FTS5 snippet of several magazine pages
+    for a provided search term.
+
+    The snippet is the fragment of the page with the most matches of the term,
+    built by SQLite from the match positions it already knows, so only the
+    fragment is returned instead of the text of the page.
 
     Args:
-        page_id (int): The rowid of the page to retrieve the content for.
-        Defaults to 0.
+        formatted_s_word (str): The search term the pages were found with.
+        page_ids (iterable of int): The rowids of the pages.
+        snippet_tokens (int): The maximum number of tokens of a snippet
+        (between 1 and 64).
+        start_mark (str): The text inserted before each match of the term.
+        end_mark (str): The text inserted after each match of the term.
+        ellipsis (str): The text added where the snippet doesn't start at the
+        beginning or end at the end of the page.
 
     Returns:
-        magazine_content_details (str): The content of the magazine page if
-        found. If not found or if the parameter is of an invalid data type the
-        string will be empty.
+        snippets (dict): The snippet of each page found, by page id.
+    """
+
+    page_ids = list(page_ids)
+    if not page_ids:
+        return {}
+
+    expression_to_search = '"' + formatted_s_word + '"' + "*"
+
+    snippets = dict(
+        db.session.query(
+            MagazineNumberContentFTS.rowid,
+            func.snippet(
+                literal_column("magazine_number_content_fts"),
+                0,
+                start_mark,
+                end_mark,
+                ellipsis,
+                snippet_tokens,
+            ),
+        ).filter(
+            MagazineNumberContentFTS.magazine_content.match(expression_to_search),
+            MagazineNumberContentFTS.rowid.in_(page_ids),
+        )
+    )
+
+    return snippets
+
+
+def get_database_build_id():
     """
+    Retrieve the build id stored in the database when it was created (see
+    stamp_database_build_id()).
 
-    magazine_content_details = db.session.query(
-        MagazineNumberContent.magazine_content
-    ).filter(MagazineNumberContent.id == page_id)
+    Returns:
+        build_id (str or None): The build id, or None if the database has no
+        database_build table (it was created before the build ids were stored).
+    """
 
-    # Check that the Query object is not empty
-    if magazine_content_details.first():
-        return magazine_content_details[0][0]
+    try:
+        build_id = db.session.query(DatabaseBuild.build_id).scalar()
+    except OperationalError as err:
+        db.session.rollback()
+        if not is_missing_table_error(err):
+            raise
+        return None
 
-    return ""
+    return build_id
@@ -1,13 +1,57 @@
-from flask import Blueprint, current_app, render_template, request, session
+import hashlib
 
-from application import cache
-from application.search_page.helpers import format_search_word, store_s_word_in_session
-from application.search_page.previews import get_previews_for_page_id
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    jsonify,
+    make_response,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+
+from application.search_page.helpers import (
+    decode_cursor,
+    format_search_word,
+    store_s_word_in_session,
+)
+from application.search_page.preview_cache import (
+    get_cached_previews,
+    get_preview_cache_key_prefix,
+    preview_cache,
+)
+from application.search_page.previews import (
+    PREVIEW_ENGINE_FTS5,
+    PREVIEW_ENGINE_PYTHON,
+    convert_diacritics_to_basic_latin_characters,
+    get_previews_for_page_id,
+    get_snippet_previews_for_page_id,
+)
+from application.search_page.search_cache import search_cache
+from application.search_page.search_executor import (
+    get_ids_for_magazine_filter,
+    get_page_ids,
+    get_results_count,
+    pack_search_results,
+    scan_searched_term,
+    unpack_search_results,
+)
 from application.search_page.search_page_data_repository import (
+    KEYSET_COLUMNS,
+    KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+    MATCH_SUBSTRING,
+    SORT_BY_RELEVANCE,
     get_details_for_searched_term,
     get_details_for_searched_term_for_specific_magazine,
-    get_distinct_magazine_names_and_count_for_searched_term,
-    paginate_results,
+    paginate_ids,
+    paginate_results_by_relevance,
+    paginate_results_with_keyset,
+)
+from application.search_page.search_pipeline import (
+    format_stage_timings,
+    run_search_stages,
 )
 
 # Blueprint configuration
@@ -50,9 +94,20 @@ def search_for_term():
         )
         return render_template("no_results_found.html", not_minimum_s_word_length=True)
 
-    preview_length = current_app.config["PREVIEW_SUBSTRING_LENGTH"]
     page = request.args.get("page", 1, type=int)
 
+    # the cursor is set by the First/Previous/Next/Last links; the numbered
+    # page links don't have one and fall back to OFFSET pagination
+    cursor = None
+    if request.args.get("cursor"):
+        cursor = decode_cursor(request.args.get("cursor"))
+        if cursor is None:
+            current_app.logger.error(
+                "Aborted search_for_term() function due to incorrect cursor"
+                f" parameter: {request.args.get('cursor')}"
+            )
+            abort(404)
+
     current_app.logger.info(f"Displaying /search page: {page}")
 
     formatted_s_word = format_search_word(
@@ -63,70 +118,368 @@ def search_for_term():
 
     magazine_filter = request.args.get("magazine_filter")
 
-    details_for_searched_term = get_details_for_searched_term(
-        formatted_s_word=formatted_s_word
+    if magazine_filter:
+        current_app.logger.info(f"magazine_filter set to: {magazine_filter}")
+
+    # the results are ordered by relevance only on request; any other value
+    # keeps the default order
+    sort = request.args.get("sort")
+    if sort != SORT_BY_RELEVANCE:
+        sort = None
+    else:
+        current_app.logger.info(f"sort set to: {sort}")
+
+    # the term is searched inside the words only on request and only if the
+    # trigram FTS5 table is built
+    match = request.args.get("match")
+    if match != MATCH_SUBSTRING or not current_app.config["FTS5_TRIGRAM_INDEX"]:
+        match = None
+    else:
+        current_app.logger.info(f"match set to: {match}")
+        # the trigram FTS5 table holds the content without diacritics
+        formatted_s_word = convert_diacritics_to_basic_latin_characters(
+            formatted_s_word
+        )
+
+    results_page_cache_key = None
+    if current_app.config["RESULTS_PAGE_CACHE"]:
+        # the page displays the term as it was searched, so it isn't folded
+        results_page_cache_key = search_cache.make_key(
+            "page",
+            s_word,
+            magazine_filter,
+            sort,
+            match,
+            page,
+            request.args.get("cursor"),
+            fold_term=False,
+        )
+        cached_results_page = search_cache.get(results_page_cache_key)
+        if cached_results_page is not None:
+            current_app.logger.info(f"Displaying the cached results page for: {s_word}")
+            return make_results_page_response(*cached_results_page)
+
+    per_page = current_app.config["RESULTS_PER_PAGE"]
+    error_out = current_app.config["ERROR_OUT"]
+
+    # the counts of the results (by magazine and in total) and the ordered ids
+    # come from the same scan
+    results, stage_timings = run_search_stages(
+        {"search_results": lambda: get_search_results(formatted_s_word, sort, match)}
     )
+    search_results = results["search_results"]
+
+    distinct_magazines_and_count = search_results["distinct_magazines_and_count"]
+    approximate_results_count = search_results["approximate_results_count"]
 
-    distinct_magazines_and_count_cache_key = (
-        f"{formatted_s_word}_distinct_magazines_count"
+    details_for_searched_term_length = get_results_count(
+        distinct_magazines_and_count, magazine_filter
     )
-    if cache.has(distinct_magazines_and_count_cache_key):
-        distinct_magazines_and_count = cache.get(distinct_magazines_and_count_cache_key)
-    else:
-        # cast Query object to list to make possible to add to cache
-        distinct_magazines_and_count = list(
-            get_distinct_magazine_names_and_count_for_searched_term(
-                details_for_searched_term=details_for_searched_term
+
+    if not magazine_filter and details_for_searched_term_length == 0:
+        current_app.logger.info(
+            "Displaying no_results_found page because s_word"
+            f" was not found: {s_word}"
+        )
+        return render_template("no_results_found.html", searched_term=s_word)
+
+    keyset_columns = KEYSET_COLUMNS
+    if magazine_filter:
+        keyset_columns = KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE
+
+    ids = get_ids_for_magazine_filter(search_results, magazine_filter)
+
+    def get_page():
+        if ids is not None:
+            # the page is a slice of the ordered ids, only its rows are queried
+            return paginate_ids(
+                ids,
+                keyset_columns if sort != SORT_BY_RELEVANCE else None,
+                page,
+                per_page=per_page,
+                error_out=error_out,
             )
+
+        # too many results to keep their ids, the page is queried with the
+        # FTS5 table
+        details_for_searched_term = get_details_for_searched_term(
+            formatted_s_word=formatted_s_word, match=match
         )
-        cache.add(distinct_magazines_and_count_cache_key, distinct_magazines_and_count)
-
-    # count the lenght of the entire result set only if a magazine_filter
-    # doesn't exists
-    if not magazine_filter:
-        if cache.has(formatted_s_word):
-            details_for_searched_term_length = cache.get(formatted_s_word)
-        else:
-            details_for_searched_term_length = details_for_searched_term.count()
-            cache.add(formatted_s_word, details_for_searched_term_length)
-
-        if details_for_searched_term_length == 0:
-            current_app.logger.info(
-                "Displaying no_results_found page because s_word"
-                f" was not found: {s_word}"
+        if magazine_filter:
+            details_for_searched_term = (
+                get_details_for_searched_term_for_specific_magazine(
+                    details_for_searched_term, magazine_filter
+                )
             )
-            return render_template("no_results_found.html", searched_term=s_word)
 
-    else:
-        current_app.logger.info(f"magazine_filter set to: {magazine_filter}")
-        details_for_searched_term = get_details_for_searched_term_for_specific_magazine(
-            details_for_searched_term, magazine_filter
+        if sort == SORT_BY_RELEVANCE:
+            return paginate_results_by_relevance(
+                details_for_searched_term,
+                page,
+                per_page=per_page,
+                error_out=error_out,
+                total=details_for_searched_term_length,
+                match=match,
+            )
+
+        return paginate_results_with_keyset(
+            details_for_searched_term,
+            keyset_columns,
+            page,
+            per_page=per_page,
+            error_out=error_out,
+            total=details_for_searched_term_length,
+            cursor=cursor,
         )
 
-        magazine_filter_cache_key = f"{magazine_filter}_{request_s_word}"
-        if cache.has(magazine_filter_cache_key):
-            details_for_searched_term_length = cache.get(magazine_filter_cache_key)
-        else:
-            details_for_searched_term_length = details_for_searched_term.count()
-            cache.add(magazine_filter_cache_key, details_for_searched_term_length)
+    # with deferred loading the page is rendered without the previews, they
+    # are requested by the browser from get_previews()
+    deferred_previews = current_app.config["PREVIEW_DEFERRED_LOADING"]
 
-    details_for_searched_term = paginate_results(
-        details_for_searched_term,
-        page,
-        per_page=current_app.config["RESULTS_PER_PAGE"],
-        error_out=current_app.config["ERROR_OUT"],
-    )
+    stages = {"page": get_page}
+    if ids is not None and not deferred_previews:
+        # the ids of the page are known, so its previews are built while its
+        # rows are queried
+        page_ids = get_page_ids(ids, page, per_page)
+        stages["previews"] = lambda: get_previews_for_results(
+            [(page_id,) for page_id in page_ids], s_word, formatted_s_word, match
+        )
+    results, timings = run_search_stages(stages, concurrent=True)
+    stage_timings.update(timings)
+    details_for_searched_term = results["page"]
+
+    previews = results.get("previews", [])
+    previews_url = None
+    if deferred_previews:
+        previews_url = url_for(
+            "search_page_bp.get_previews",
+            ids=",".join(str(result[-1]) for result in details_for_searched_term),
+            term=s_word,
+            match=match,
+        )
+    elif "previews" not in results:
+        # the ids of the page are known only once the page is queried
+        results, timings = run_search_stages(
+            {
+                "previews": lambda: get_previews_for_results(
+                    details_for_searched_term, s_word, formatted_s_word, match
+                )
+            }
+        )
+        stage_timings.update(timings)
+        previews = results["previews"]
 
-    previews = get_previews_for_page_id(
-        details_for_searched_term, s_word, preview_length
+    current_app.logger.info(
+        f"Search stages timings for {formatted_s_word}:"
+        f" {format_stage_timings(stage_timings)}"
     )
 
-    return render_template(
+    results_page = render_template(
         "search_page.html",
         details_for_searched_term=details_for_searched_term,
         details_for_searched_term_length=details_for_searched_term_length,
         searched_term=s_word,
         distinct_magazines_and_count=distinct_magazines_and_count,
         magazine_filter=magazine_filter,
+        sort=sort,
+        match=match,
+        approximate_results_count=approximate_results_count,
         previews=previews,
+        previews_url=previews_url,
+        shared_page=results_page_cache_key is not None,
+    )
+
+    if results_page_cache_key is None:
+        return results_page
+
+    results_page = results_page.encode("utf-8")
+    etag = hashlib.sha256(results_page).hexdigest()
+    search_cache.add(
+        results_page_cache_key,
+        (etag, results_page),
+        timeout=current_app.config["RESULTS_PAGE_CACHE_TIMEOUT"],
     )
+
+    return make_results_page_response(etag, results_page)
+
+
+def make_results_page_response(etag, results_page):
+    """
+    Make the response of a cached results page.
+
+    The response has a strong ETag and must be revalidated before it is
+    reused, so a browser or a proxy that sends the ETag back in an
+    If-None-Match header gets a 304 response without a body.
+
+    Args:
+        etag (str): The ETag of the page (the SHA-256 digest of its content).
+        results_page (bytes): The rendered page, encoded with UTF-8.
+
+    Returns:
+        response (flask.Response): The response, with a 304 status if the page
+        requested is the same as the page the client has.
+    """
+    response = make_response(results_page)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+
+    return response.make_conditional(request)
+
+
+@search_page_bp.route("/previews", methods=["GET"])
+def get_previews():
+    """
+    Return the previews of several results as JSON.
+
+    The previews of a results page rendered with PREVIEW_DEFERRED_LOADING are
+    requested with a single call: /results/previews?ids=<id>,<id>&term=<term>
+    (and &match=substring for a substring search). The response doesn't
+    depend on the session, so it can be cached by the browser and by a proxy
+    for PREVIEW_RESPONSE_MAX_AGE seconds.
+    """
+    accepted_special_characters = current_app.config["ACCEPTED_FTS5_SPECIAL_CHARACTERS"]
+    s_word = format_search_word(
+        request.args.get("term", ""),
+        accepted_special_characters=accepted_special_characters,
+    )
+    if len(s_word) < 4 or len(s_word) > 200:
+        abort(404)
+
+    try:
+        page_ids = [int(page_id) for page_id in request.args.get("ids", "").split(",")]
+    except ValueError:
+        abort(404)
+    if len(page_ids) > current_app.config["RESULTS_PER_PAGE"]:
+        abort(404)
+
+    current_app.logger.info(
+        f"Calling the get_previews() function for {len(page_ids)} results with"
+        f" term parameter: {s_word}"
+    )
+
+    formatted_s_word = format_search_word(
+        s_word, separator="+", accepted_special_characters=accepted_special_characters
+    )
+
+    match = request.args.get("match")
+    if match != MATCH_SUBSTRING or not current_app.config["FTS5_TRIGRAM_INDEX"]:
+        match = None
+
+    previews = get_previews_for_results(
+        [(page_id,) for page_id in page_ids], s_word, formatted_s_word, match
+    )
+
+    response = jsonify(
+        previews={str(page_id): str(preview) for page_id, preview in previews}
+    )
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["PREVIEW_RESPONSE_MAX_AGE"]
+
+    return response
+
+
+def get_search_results(formatted_s_word, sort, match):
+    """
+    Get the results of a search (the counts of the results by magazine and the
+    ordered ids) from the search cache.
+
+    When the search isn't cached, the FTS5 table is scanned once for the
+    counts and the ids, by a single worker at a time (see
+    SearchCache.get_or_compute()), and the results are cached.
+
+    Args:
+        formatted_s_word (str): The searched term with its words separated by
+        "+".
+        sort (str or None): The sort order of the results.
+        match (str or None): The match mode of the search.
+
+    Returns:
+        search_results (dict): The results of the search, see
+        scan_searched_term().
+    """
+    search_results_cache_key = search_cache.make_key(
+        "results", formatted_s_word, sort, match
+    )
+
+    def scan_search_results():
+        # scan the FTS5 table once for the counts and the ordered ids
+        search_results = scan_searched_term(
+            formatted_s_word,
+            sort,
+            match,
+            cost_threshold=current_app.config["SEARCH_COST_THRESHOLD"],
+            max_results=current_app.config["SEARCH_EXPENSIVE_MAX_RESULTS"],
+            shards=current_app.config["FTS5_SHARDS"],
+        )
+        if search_results["approximate_results_count"] is not None:
+            current_app.logger.info(
+                "Limited the search to the first"
+                f" {len(search_results['ids'])} results because about"
+                f" {search_results['approximate_results_count']} results are"
+                f" estimated for: {formatted_s_word}"
+            )
+
+        return pack_search_results(
+            search_results,
+            max_ids=current_app.config["SEARCH_RESULTS_MAX_CACHED_IDS"],
+            compress=current_app.config["SEARCH_RESULTS_CACHE_COMPRESSION"],
+        )
+
+    # when the search isn't cached a single worker scans the FTS5 table, the
+    # others wait for its results
+    return unpack_search_results(
+        search_cache.get_or_compute(search_results_cache_key, scan_search_results)
+    )
+
+
+def get_previews_for_results(results, s_word, formatted_s_word, match):
+    """
+    Get the previews of the results of a page with the configured
+    PREVIEW_ENGINE.
+
+    The previews are read from the preview cache and only the missing ones are
+    built.
+
+    Args:
+        results (iterable): The results, with the page id as their last column.
+        s_word (str): The searched term.
+        formatted_s_word (str): The searched term with its words separated by
+        "+".
+        match (str or None): The match mode of the search.
+
+    Returns:
+        previews_for_page_id (list): A list containing pairs of page IDs (int)
+        and their corresponding preview texts (str).
+    """
+    if current_app.config["PREVIEW_ENGINE"] == PREVIEW_ENGINE_FTS5 and match is None:
+        snippet_tokens = current_app.config["PREVIEW_SNIPPET_TOKENS"]
+        preview_cache_key_prefix = get_preview_cache_key_prefix(
+            PREVIEW_ENGINE_FTS5, formatted_s_word, snippet_tokens, search_cache.build_id
+        )
+
+        def get_previews(results):
+            return get_snippet_previews_for_page_id(
+                results, formatted_s_word, snippet_tokens
+            )
+
+    else:
+        preview_length = current_app.config["PREVIEW_SUBSTRING_LENGTH"]
+        preview_cache_key_prefix = get_preview_cache_key_prefix(
+            PREVIEW_ENGINE_PYTHON, s_word, preview_length, search_cache.build_id
+        )
+
+        def get_previews(results):
+            return get_previews_for_page_id(
+                results,
+                s_word,
+                preview_length,
+                use_folded_content=current_app.config["PREVIEW_FOLDED_CONTENT"],
+            )
+
+    previews = get_cached_previews(
+        preview_cache, results, preview_cache_key_prefix, get_previews
+    )
+
+    current_app.logger.debug("Preview cache stats: %s", preview_cache.stats)
+
+    return previews
@@ -0,0 +1,30 @@
+// Load the previews of a results page rendered with PREVIEW_DEFERRED_LOADING:
+// all the previews of the page are requested with a single call and each one
+// replaces the placeholder of its result
+(function () {
+    const previewsUrl = document.currentScript.dataset.previewsUrl;
+    const placeholders = document.querySelectorAll("[data-preview-id]");
+
+    if (!previewsUrl || placeholders.length === 0) {
+        return;
+    }
+
+    fetch(previewsUrl, { headers: { Accept: "application/json" } })
+        .then((response) => {
+            if (!response.ok) {
+                throw new Error(`previews request failed: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then((data) => {
+            placeholders.forEach((placeholder) => {
+                // the previews are built and escaped by the server
+                placeholder.innerHTML = data.previews[placeholder.dataset.previewId] || "";
+            });
+        })
+        .catch(() => {
+            placeholders.forEach((placeholder) => {
+                placeholder.textContent = "preview not available";
+            });
+        });
+})();
@@ -0,0 +1,181 @@
+"""fts5_prefix_index benchmark
+
+This benchmark shows the trade-off between the size of the FTS5 table and the
+time of the prefix queries ("term"*) the app issues, for different
+FTS5_PREFIX_INDEX_LENGTHS values, on a generated corpus.
+
+Run it from the root folder of the project:
+    python -m benchmarks.fts5_prefix_index [--pages 5000] [--words 300]
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from application.cli_database.cli_data_repository import create_fts_table
+from config import Config
+
+PREFIX_INDEX_CONFIGURATIONS = [
+    (),
+    (4,),
+    (5,),
+    (6,),
+    (7,),
+    (8,),
+    (4, 5, 6),
+    (4, 5, 6, 7, 8),
+]
+QUERIED_PREFIX_LENGTHS = range(4, 9)
+LETTERS = "aaaaabcdeeeeefghiiiijklmnoooprrsstttuuvzăâîșț"
+SUFFIXES = ["", "a", "e", "i", "ul", "ului", "ilor", "ele", "ea", "are", "ește"]
+SUFFIXES += ["ire", "ească", "ații", "ism", "ist", "ită", "ori", "elor", "uri"]
+
+
+def generate_vocabulary(rng, size):
+    """
+    Generate a vocabulary of inflected words: stems between 3 and 9 characters
+    long followed by common suffixes, so many words share the same prefix.
+    """
+    vocabulary = set()
+    while len(vocabulary) < size:
+        stem = "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 9)))
+        for suffix in rng.sample(SUFFIXES, rng.randint(1, 8)):
+            vocabulary.add(stem + suffix)
+
+    return sorted(vocabulary)
+
+
+def generate_pages(rng, vocabulary, pages, words_per_page):
+    """Generate the pages with a Zipf like distribution of the words."""
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    rng.shuffle(vocabulary)
+
+    return [
+        " ".join(rng.choices(vocabulary, weights=weights, k=words_per_page))
+        for _ in range(pages)
+    ]
+
+
+def create_corpus_database(database_path, pages):
+    """Create a database with the magazine_number_content table only."""
+    conn = sqlite3.connect(database_path)
+    with conn:
+        conn.execute(
+            """
+            CREATE TABLE magazine_number_content (
+                id INTEGER PRIMARY KEY,
+                magazine_content TEXT
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO magazine_number_content(magazine_content) VALUES (?)",
+            ((page,) for page in pages),
+        )
+    conn.close()
+
+
+def get_fts_size(database_path):
+    """Get the size in bytes of the shadow tables of the fts table."""
+    conn = sqlite3.connect(database_path)
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    try:
+        size = conn.execute(
+            """
+            SELECT SUM(pgsize) FROM dbstat
+            WHERE name LIKE 'magazine_number_content_fts%'
+            """
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        # dbstat is not compiled in, fall back to the page count
+        size = conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+    conn.close()
+
+    return size
+
+
+def time_prefix_queries(database_path, prefixes, repeat):
+    """Get the median time in ms of a prefix query for the given prefixes."""
+    conn = sqlite3.connect(database_path)
+    timings = []
+    for prefix in prefixes:
+        query_timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(
+                """
+                SELECT COUNT(*) FROM magazine_number_content_fts
+                WHERE magazine_number_content_fts MATCH ?
+                """,
+                (f'"{prefix}"*',),
+            ).fetchone()
+            query_timings.append(time.perf_counter() - start)
+        timings.append(min(query_timings))
+    conn.close()
+
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=300, help="words per page")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--prefixes", type=int, default=20, help="per length")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = generate_vocabulary(rng, args.vocabulary)
+    pages = generate_pages(rng, vocabulary, args.pages, args.words)
+
+    # the most frequent words are at the start of the shuffled vocabulary
+    prefixes_by_length = {
+        length: [word[:length] for word in vocabulary if len(word) >= length][
+            : args.prefixes
+        ]
+        for length in QUERIED_PREFIX_LENGTHS
+    }
+
+    print(
+        f"corpus: {args.pages} pages, {args.words} words per page,"
+        f" {args.vocabulary} distinct words"
+    )
+    header = f"{'prefix index':<16}{'fts size (KiB)':>16}" + "".join(
+        f"{f'{length} chars (ms)':>16}" for length in QUERIED_PREFIX_LENGTHS
+    )
+    print(header)
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        for prefix_index_lengths in PREFIX_INDEX_CONFIGURATIONS:
+            database_path = Path(temp_folder) / "benchmark.db"
+            create_corpus_database(database_path, pages)
+            create_fts_table(
+                database_path,
+                accepted_special_characters=Config.ACCEPTED_FTS5_SPECIAL_CHARACTERS,
+                prefix_index_lengths=prefix_index_lengths,
+            )
+
+            fts_size = get_fts_size(database_path)
+            timings = [
+                time_prefix_queries(
+                    database_path, prefixes_by_length[length], args.repeat
+                )
+                for length in QUERIED_PREFIX_LENGTHS
+            ]
+
+            name = " ".join(str(length) for length in prefix_index_lengths) or "none"
+            print(
+                f"{name:<16}{fts_size / 1024:>16.0f}"
+                + "".join(f"{timing:>16.2f}" for timing in timings)
+            )
+            database_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
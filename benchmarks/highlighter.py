@@ -0,0 +1,92 @@
+"""highlighter benchmark
+
+This benchmark compares the time to add the HTML 'mark' tags to a preview with
+the Highlighter (a single pass of one regular expression over the folded
+preview) and with the previous chain of str.replace() calls, one for each
+variant of the term found in the page. The previews are generated, with
+several variants of the term, and folded beforehand (the folded preview is
+sliced from the folded content of the page by get_previews_for_page_id()).
+
+Run it from the root folder of the project:
+    python -m benchmarks.highlighter [--preview-sizes 2000 20000]
+"""
+
+import argparse
+import random
+import timeit
+
+from application.search_page.highlighter import Highlighter
+from application.search_page.previews import fold_text
+
+SEARCHED_TERM = "Mărţişor"
+VARIANTS = ["Mărţişor", "mărțișor", "MARTISOR", "martisor", "Marţişor", "MĂRŢIŞOR"]
+DEFAULT_PREVIEW_SIZES = [2_000, 20_000, 200_000]
+
+
+def add_html_mark_tags_with_replace(distinct_s_word_variants, content):
+    """The previous highlighting: one str.replace() for each variant."""
+    for word in distinct_s_word_variants:
+        content = content.replace(word, "<mark>" + word + "</mark>")
+
+    return content
+
+
+def generate_preview(preview_size, occurrences, rng):
+    """Generate a preview of about preview_size characters with the term."""
+    words = ["cumpărând", "elaborat", "Apărării", "panglicuţă", "ocazia", "lei"]
+    preview_words = []
+    length = 0
+    while length < preview_size:
+        word = rng.choice(words)
+        preview_words.append(word)
+        length += len(word) + 1
+
+    for position in rng.sample(range(len(preview_words)), occurrences):
+        preview_words[position] = rng.choice(VARIANTS)
+
+    return " ".join(preview_words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--preview-sizes", type=int, nargs="+", default=DEFAULT_PREVIEW_SIZES
+    )
+    parser.add_argument("--occurrences", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    highlighter = Highlighter(fold_text(SEARCHED_TERM))
+
+    print(f"term: {SEARCHED_TERM}, {args.occurrences} occurrences per preview")
+    print(f"{'preview size':>14}{'replace (ms)':>16}{'highlighter (ms)':>18}")
+
+    for preview_size in args.preview_sizes:
+        preview = generate_preview(preview_size, args.occurrences, rng)
+        folded_preview = fold_text(preview)
+        variants = [variant for variant in VARIANTS if variant in preview]
+
+        times = {}
+        for name, function in (
+            (
+                "replace",
+                lambda: add_html_mark_tags_with_replace(variants, preview),
+            ),
+            (
+                "highlighter",
+                lambda: highlighter.add_html_mark_tags(preview, folded_preview),
+            ),
+        ):
+            times[name] = (
+                min(timeit.repeat(function, number=1, repeat=args.repeat)) * 1000
+            )
+
+        print(
+            f"{len(preview):>14}{times['replace']:>16.3f}{times['highlighter']:>18.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
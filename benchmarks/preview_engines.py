@@ -0,0 +1,154 @@
+"""preview_engines benchmark
+
+This benchmark compares the time to build the previews of a results page with
+the "python" PREVIEW_ENGINE (get_previews_for_page_id()) and with the "fts5"
+one (get_snippet_previews_for_page_id()). A database with long pages is
+created with `flask database create test` from generated CSV files, in a
+temporary folder.
+
+Run it from the root folder of the project:
+    python -m benchmarks.preview_engines [--page-words 10000]
+"""
+
+import argparse
+import csv
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import application
+from application import init_app
+from application.search_page.previews import (
+    get_previews_for_page_id,
+    get_snippet_previews_for_page_id,
+)
+from application.search_page.search_executor import (
+    get_ids_for_magazine_filter,
+    scan_searched_term,
+)
+from application.search_page.search_page_data_repository import (
+    KEYSET_COLUMNS,
+    paginate_ids,
+)
+from config import TestingConfig
+
+SEARCHED_TERMS = ["bucuresti", "transilvania", "scoala"]
+
+
+class PreviewEnginesConfig(TestingConfig):
+    CACHE_TYPE = "NullCache"
+    FTS5_SHARDS = 0
+    FTS5_TRIGRAM_INDEX = False
+
+
+def write_csv_files(folder, pages, page_words, seed):
+    """Write the CSV files of a database with long generated pages."""
+    rng = random.Random(seed)
+    vocabulary = SEARCHED_TERMS + [f"cuvant{index}" for index in range(5000)]
+    weights = [5] * len(SEARCHED_TERMS) + [1] * (len(vocabulary) - 3)
+
+    def write(file_name, rows):
+        with open(folder / file_name, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerows(rows)
+
+    write("magazines_test_data.csv", [(1, "Magazine (1900-1910)", "link")])
+    write("magazine_year_test_data.csv", [(1, 1, "ANUL 1900", "link")])
+    write("magazine_number_test_data.csv", [(1, 1, "Nr.1", "link")])
+    write(
+        "magazine_number_content_test_data.csv",
+        [
+            (page, 1, " ".join(rng.choices(vocabulary, weights, k=page_words)), page)
+            for page in range(1, pages + 1)
+        ],
+    )
+
+
+def create_database(folder):
+    """Create the test database in folder from the CSV files in folder."""
+    with mock.patch.object(application, "run_warm_up_queries"):
+        app = init_app()
+    app.config["DATABASE_FOLDER"] = folder
+    app.config["DATABASE_FILES"] = folder
+    result = app.test_cli_runner().invoke(args=["database", "create", "test"])
+    if result.exception is not None:
+        raise result.exception
+
+
+def time_previews(app, per_page, repeat, preview_length, snippet_tokens):
+    """Get the times in ms to build the previews of a results page."""
+    times = {"python": [], "fts5": []}
+    with app.app_context():
+        for term in SEARCHED_TERMS:
+            details = paginate_ids(
+                get_ids_for_magazine_filter(scan_searched_term(term)),
+                KEYSET_COLUMNS,
+                page=1,
+                per_page=per_page,
+                error_out=False,
+            )
+            for _ in range(repeat):
+                start = time.perf_counter()
+                get_previews_for_page_id(details, term, preview_length)
+                times["python"].append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                get_snippet_previews_for_page_id(details, term, snippet_tokens)
+                times["fts5"].append((time.perf_counter() - start) * 1000)
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--page-words", type=int, default=10_000)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--preview-length",
+        type=int,
+        default=PreviewEnginesConfig.PREVIEW_SUBSTRING_LENGTH,
+    )
+    parser.add_argument(
+        "--snippet-tokens",
+        type=int,
+        default=PreviewEnginesConfig.PREVIEW_SNIPPET_TOKENS,
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["CONFIG_TYPE"] = f"{__name__}.{PreviewEnginesConfig.__name__}"
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        PreviewEnginesConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{folder / 'test.db'}"
+        write_csv_files(folder, args.pages, args.page_words, args.seed)
+        create_database(folder)
+
+        with mock.patch.object(application, "run_warm_up_queries"):
+            app = init_app()
+        times = time_previews(
+            app, args.per_page, args.repeat, args.preview_length, args.snippet_tokens
+        )
+        with app.app_context():
+            application.db.engine.dispose()
+
+    print(
+        f"{args.pages} pages of {args.page_words} words,"
+        f" {args.per_page} previews per page, {args.repeat} runs per term"
+    )
+    print(f"{'preview engine':<16}{'p50 (ms)':>12}{'p95 (ms)':>12}{'mean (ms)':>12}")
+    for name, engine_times in times.items():
+        percentiles = statistics.quantiles(engine_times, n=20)
+        print(
+            f"{name:<16}{statistics.median(engine_times):>12.2f}"
+            f"{percentiles[18]:>12.2f}{statistics.mean(engine_times):>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""preview_matcher benchmark
+
+This benchmark compares get_indexes_for_highlighting_s_word() with its
+previous implementation, which folded the diacritics with a dict translation
+table and copied the rest of the page after every occurrence of the term, on
+generated pages of 10 KB to 1 MB with hundreds of occurrences. It checks that
+both return the same indexes.
+
+Run it from the root folder of the project:
+    python -m benchmarks.preview_matcher [--occurrences 500]
+"""
+
+import argparse
+import random
+import timeit
+
+from application.search_page.previews import (
+    DIACRITICS_TO_BASIC_LATIN_CHARACTERS,
+    get_indexes_for_highlighting_s_word,
+)
+
+SEARCHED_TERM = "Mărţişor"
+VARIANTS = ["Mărţişor", "mărțișor", "MARTISOR", "martisor", "Mărţişorul"]
+DEFAULT_PAGE_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def get_indexes_with_slicing(s_word, content):
+    """The previous implementation of get_indexes_for_highlighting_s_word()."""
+    formatted_content_string = content.translate(
+        DIACRITICS_TO_BASIC_LATIN_CHARACTERS
+    ).lower()
+    formatted_s_word = s_word.translate(DIACRITICS_TO_BASIC_LATIN_CHARACTERS).lower()
+    s_word_string_length = len(s_word)
+
+    indexes_for_highlighting_s_word = []
+    find_s_word = formatted_content_string.find(formatted_s_word)
+
+    while find_s_word > -1:
+        indexes_for_highlighting_s_word.append(find_s_word)
+        current_last_index = indexes_for_highlighting_s_word[-1]
+        index_content_string = formatted_content_string[
+            current_last_index + s_word_string_length :
+        ]
+
+        find_s_word = index_content_string.find(formatted_s_word)
+        if find_s_word > -1:
+            find_s_word = current_last_index + s_word_string_length + find_s_word
+
+    return indexes_for_highlighting_s_word
+
+
+def generate_page(page_size, occurrences, rng):
+    """Generate a page of about page_size characters with the searched term."""
+    words = ["cumpărând", "elaborat", "Apărării", "panglicuţă", "ocazia", "lei"]
+    page_words = []
+    length = 0
+    while length < page_size:
+        word = rng.choice(words)
+        page_words.append(word)
+        length += len(word) + 1
+
+    for position in rng.sample(range(len(page_words)), occurrences):
+        page_words[position] = rng.choice(VARIANTS)
+
+    return " ".join(page_words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=DEFAULT_PAGE_SIZES)
+    parser.add_argument("--occurrences", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print(f"term: {SEARCHED_TERM}, {args.occurrences} occurrences per page")
+    print(f"{'page size':>12}{'slicing (ms)':>16}{'find (ms)':>12}{'speedup':>10}")
+
+    for page_size in args.page_sizes:
+        page = generate_page(page_size, args.occurrences, rng)
+        assert get_indexes_with_slicing(
+            SEARCHED_TERM, page
+        ) == get_indexes_for_highlighting_s_word(SEARCHED_TERM, page)
+
+        times = {}
+        for name, function in (
+            ("slicing", get_indexes_with_slicing),
+            ("find", get_indexes_for_highlighting_s_word),
+        ):
+            times[name] = (
+                min(
+                    timeit.repeat(
+                        lambda function=function: function(SEARCHED_TERM, page),
+                        number=1,
+                        repeat=args.repeat,
+                    )
+                )
+                * 1000
+            )
+
+        print(
+            f"{len(page):>12}{times['slicing']:>16.2f}{times['find']:>12.2f}"
+            f"{times['slicing'] / times['find']:>10.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""sqlite_engine_profile benchmark
+
+This benchmark compares the latency of the /results/search page with the
+default SQLite engine and with the "read_only" SQLITE_ENGINE_PROFILE. The
+requests go through the app (with caching disabled), on the test database
+created with `flask database create test`.
+
+Run it from the root folder of the project:
+    python -m benchmarks.sqlite_engine_profile [--database instance/test.db]
+"""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+from unittest import mock
+
+import application
+from application import init_app
+from config import BASEDIR, TestingConfig
+
+DEFAULT_TERMS = ["bucuresti", "transilvania", "scoala", "romania", "care"]
+
+
+class DefaultProfileConfig(TestingConfig):
+    CACHE_TYPE = "NullCache"
+    SQLITE_ENGINE_PROFILE = None
+
+
+class ReadOnlyProfileConfig(DefaultProfileConfig):
+    SQLITE_ENGINE_PROFILE = "read_only"
+
+
+def time_searches(config_type, terms, repeat):
+    """Get the latencies in ms of the search requests for a config."""
+    os.environ["CONFIG_TYPE"] = config_type
+    with mock.patch.object(application, "run_warm_up_queries"):
+        app = init_app()
+
+    latencies = []
+    with app.test_client() as client:
+        for _ in range(repeat):
+            for term in terms:
+                start = time.perf_counter()
+                response = client.get(
+                    "/results/search", query_string={"search_box": term}
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200
+
+    with app.app_context():
+        application.db.engine.dispose()
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database",
+        type=Path,
+        default=Path(BASEDIR) / "instance" / "test.db",
+        help="the SQLite database file",
+    )
+    parser.add_argument("--terms", nargs="+", default=DEFAULT_TERMS)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database_uri = f"sqlite:///{args.database.resolve()}"
+    DefaultProfileConfig.SQLALCHEMY_DATABASE_URI = database_uri
+
+    print(
+        f"database: {args.database}, {len(args.terms)} terms,"
+        f" {args.repeat} requests per term"
+    )
+    print(f"{'engine profile':<16}{'p50 (ms)':>12}{'p95 (ms)':>12}{'mean (ms)':>12}")
+
+    for name, config_class in (
+        ("default", DefaultProfileConfig),
+        ("read_only", ReadOnlyProfileConfig),
+    ):
+        latencies = time_searches(
+            f"{__name__}.{config_class.__name__}", args.terms, args.repeat
+        )
+        percentiles = statistics.quantiles(latencies, n=20)
+        print(
+            f"{name:<16}{statistics.median(latencies):>12.2f}"
+            f"{percentiles[18]:>12.2f}{statistics.mean(latencies):>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """Flask configuration"""
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -20,6 +21,18 @@ class Config(object):
     SQLALCHEMY_ECHO = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite engine profile: None opens the database with the default settings,
+    # "read_only" opens it read-only and immutable (it must not be written
+    # while the app runs) and sets SQLITE_READ_ONLY_PRAGMAS on every connection
+    # (see benchmarks/sqlite_engine_profile.py)
+    SQLITE_ENGINE_PROFILE = None
+    SQLITE_READ_ONLY_PRAGMAS = {
+        "mmap_size": 268_435_456,  # 256 MiB
+        "cache_size": -65_536,  # 64 MiB
+        "temp_store": "MEMORY",
+        "query_only": 1,
+    }
+
     # Environment variables
     FLASK_ENV = "development"
     DEBUG = False
@@ -29,6 +42,50 @@ class Config(object):
     RESULTS_PER_PAGE = 10
     ERROR_OUT = True
 
+    # Cached search results: the ordered ids of the results of a search term
+    # are cached (4 bytes per id) so that any page is a slice of a list. Terms
+    # with more results are paginated with queries instead.
+    SEARCH_RESULTS_MAX_CACHED_IDS = 200_000
+    SEARCH_RESULTS_CACHE_COMPRESSION = False
+
+    # Single-flight: the results of a term that isn't cached are computed by
+    # a single worker, which holds a lock in its process and a lock shared by
+    # the processes (a Redis lock, or a lock file in SEARCH_CACHE_LOCK_FOLDER
+    # for the other backends) for at most SEARCH_CACHE_LOCK_TIMEOUT seconds.
+    # The other workers wait up to SEARCH_CACHE_LOCK_WAIT seconds for its
+    # results, or return the stale results, kept SEARCH_CACHE_STALE_TIMEOUT
+    # seconds after they expire. The results are computed again at a random
+    # time before they expire, earlier with a higher
+    # SEARCH_CACHE_EARLY_REFRESH_BETA (0 disables it)
+    SEARCH_CACHE_LOCK_TIMEOUT = 30
+    SEARCH_CACHE_LOCK_WAIT = 10
+    SEARCH_CACHE_STALE_TIMEOUT = 60
+    SEARCH_CACHE_EARLY_REFRESH_BETA = 1.0
+    SEARCH_CACHE_LOCK_FOLDER = os.path.join(
+        tempfile.gettempdir(), "darwin_app_cache_locks"
+    )
+
+    # Cache warming: the searches of the WARM_CACHE_TOP_TERMS most frequent
+    # terms of the log of the app (WARM_CACHE_LOG_FILE and its rotated files)
+    # are cached by 'flask database warm-cache', WARM_CACHE_WORKERS terms at a
+    # time, and also in the background when the app starts with
+    # WARM_CACHE_ON_STARTUP
+    WARM_CACHE_LOG_FILE = os.path.join(BASEDIR, "instance", "Darwin_App.log")
+    WARM_CACHE_TOP_TERMS = 100
+    WARM_CACHE_WORKERS = 4
+    WARM_CACHE_ON_STARTUP = False
+
+    # Admission control: when the number of pages a search term matches,
+    # estimated from the fts5vocab tables, is above SEARCH_COST_THRESHOLD only
+    # the first SEARCH_EXPENSIVE_MAX_RESULTS results are retrieved and the
+    # number of results is approximated (None disables the estimation)
+    SEARCH_COST_THRESHOLD = 20_000
+    SEARCH_EXPENSIVE_MAX_RESULTS = 1_000
+
+    # Time budget of a database query in seconds; longer queries are
+    # interrupted (None disables the time budget)
+    SEARCH_QUERY_TIME_BUDGET = 5
+
     # Placeholder text for search bar
     PLACEHOLDER_TEXT_FOR_SEARCH_BAR = "you can enter between 4 and 200 characters"
 
@@ -36,9 +93,82 @@ class Config(object):
     # token characters
     ACCEPTED_FTS5_SPECIAL_CHARACTERS = "-_.,„!?;:''"
 
+    # SQLITE FTS5 prefix index lengths (in characters) used when the database
+    # is created. The searches are prefix queries ("term"*), so a search term
+    # whose last word has one of these lengths reads a single index entry
+    # (see benchmarks/fts5_prefix_index.py for the size/speed trade-off)
+    FTS5_PREFIX_INDEX_LENGTHS = (4, 5, 6)
+
+    # SQLITE FTS5 trigram index used by the substring searches (match=substring)
+    # to find a term inside words. When enabled, it is built when the database
+    # is created (its build time and size are printed)
+    FTS5_TRIGRAM_INDEX = True
+
+    # SQLITE FTS5 shards: when above 1, the pages are also indexed in this many
+    # fts tables split by magazine (magazine_number_content_fts_shard_<n>) and
+    # the searches query them concurrently, one thread for each shard. It has
+    # to match the number of shards the database was created with
+    FTS5_SHARDS = 0
+
+    # Search stages: once the ids of a results page are known, the rows of the
+    # page and its previews are built concurrently on a thread pool of this
+    # many threads (created with the app), each on its own connection (below 2
+    # they are built one after another). With PREVIEW_DEFERRED_LOADING the
+    # rows of the page are the only stage, so the pool isn't created. The time
+    # of each stage is logged
+    SEARCH_STAGE_WORKERS = 0
+
     # Preview string
     PREVIEW_SUBSTRING_LENGTH = 200
 
+    # Preview engine: "python" builds the previews from the text of the pages,
+    # around every match of the term (PREVIEW_SUBSTRING_LENGTH characters on
+    # each side), "fts5" uses a single snippet of at most PREVIEW_SNIPPET_TOKENS
+    # tokens (at most 64) built by the FTS5 snippet() function (see
+    # benchmarks/preview_engines.py). Substring searches always use "python"
+    PREVIEW_ENGINE = "python"
+    PREVIEW_SNIPPET_TOKENS = 64
+
+    # Preview folded content: when the database is created the text of the
+    # pages is also stored with its extra white spaces removed, and without
+    # diacritics and in lowercase (the magazine_number_content_folded table),
+    # so the "python" previews find the term in it instead of converting the
+    # whole text of every page. It has to match the database
+    PREVIEW_FOLDED_CONTENT = False
+
+    # Page text compression: when the database is created the text of the
+    # pages (and their folded text) is stored compressed with zlib, with a
+    # preset dictionary trained on the pages if PAGE_TEXT_COMPRESSION_DICTIONARY
+    # is set, and only the pages of the previews are decompressed. The size
+    # savings and the decompression time of a preview are printed
+    PAGE_TEXT_COMPRESSION = False
+    PAGE_TEXT_COMPRESSION_DICTIONARY = True
+    PAGE_TEXT_COMPRESSION_LEVEL = 9
+
+    # Preview cache: whether the previews are stored in the Flask-Caching
+    # backend (for PREVIEW_CACHE_TIMEOUT seconds, None for the
+    # CACHE_DEFAULT_TIMEOUT) or else the number of previews kept in the memory
+    # of each process (0 to disable it), see
+    # application/search_page/preview_cache.py
+    PREVIEW_CACHE_MAX_ENTRIES = 5_000
+    PREVIEW_CACHE_BACKEND = False
+    PREVIEW_CACHE_TIMEOUT = None
+
+    # Preview deferred loading: the results page is rendered without the
+    # previews and the browser requests them from /results/previews with a
+    # single call, whose response can be cached for PREVIEW_RESPONSE_MAX_AGE
+    # seconds
+    PREVIEW_DEFERRED_LOADING = False
+    PREVIEW_RESPONSE_MAX_AGE = 3600
+
+    # Results page cache: the rendered results pages are stored in the
+    # Flask-Caching backend (for RESULTS_PAGE_CACHE_TIMEOUT seconds, None for
+    # the CACHE_DEFAULT_TIMEOUT) and sent with a strong ETag, so the browser
+    # and the proxy revalidate them and get a 304 response when they didn't
+    # change
+    RESULTS_PAGE_CACHE = False
+    RESULTS_PAGE_CACHE_TIMEOUT = None
+
     # cli_database blueprint
     ROOT_FOLDER = BASEDIR
     DATABASE_FOLDER = os.path.join(ROOT_FOLDER, "instance")
@@ -56,6 +186,20 @@ class Config(object):
     CACHE_TYPE = "SimpleCache"
     CACHE_DEFAULT_TIMEOUT = 300
 
+    # Flask-Caching two tier backend (CACHE_TYPE = TWO_TIER_CACHE_TYPE): an LRU
+    # dictionary in the memory of each process, bounded by a number of entries
+    # and by their size in bytes, whose entries expire after
+    # CACHE_TWO_TIER_LOCAL_TIMEOUT seconds, in front of the
+    # CACHE_TWO_TIER_REMOTE_TYPE backend. With CACHE_TWO_TIER_INVALIDATION (a
+    # Redis remote backend only) the keys written by a process are removed
+    # from the memory of the other processes right away
+    TWO_TIER_CACHE_TYPE = "application.cache_backends.TwoTierCache"
+    CACHE_TWO_TIER_REMOTE_TYPE = "NullCache"
+    CACHE_TWO_TIER_MAX_ENTRIES = 1_000
+    CACHE_TWO_TIER_MAX_BYTES = 16 * 1024 * 1024
+    CACHE_TWO_TIER_LOCAL_TIMEOUT = 30
+    CACHE_TWO_TIER_INVALIDATION = False
+
     # Logging
     LOG_WITH_GUNICORN = os.getenv("LOG_WITH_GUNICORN", default=False)
 
@@ -64,20 +208,37 @@ class ProductionConfig(Config):
     FLASK_ENV = "production"
     SECRET_KEY = os.getenv("SECRET_KEY")
 
-    # Flask-Caching Redis backend
-    CACHE_TYPE = "RedisCache"
+    # Database
+    SQLITE_ENGINE_PROFILE = "read_only"
+
+    # Flask-Caching Redis backend, behind the in-process tier of the two tier
+    # backend
+    CACHE_TYPE = Config.TWO_TIER_CACHE_TYPE
+    CACHE_TWO_TIER_REMOTE_TYPE = "RedisCache"
+    CACHE_TWO_TIER_INVALIDATION = True
     CACHE_REDIS_HOST = "localhost"
     CACHE_REDIS_PORT = 6379
     CACHE_REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
     CACHE_REDIS_DB = 0
     CACHE_DEFAULT_TIMEOUT = 300
     CACHE_KEY_PREFIX = "darwin_app_cache_"
+    FTS5_TRIGRAM_INDEX = False
+    SEARCH_RESULTS_CACHE_COMPRESSION = True
+    PREVIEW_CACHE_BACKEND = True
+    PREVIEW_DEFERRED_LOADING = True
+    PREVIEW_FOLDED_CONTENT = True
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SECRET_KEY = "development_secret_key"
 
+    # Flask-Caching two tier backend without a remote backend: the cache is
+    # kept only in the memory of the process, bounded in size
+    CACHE_TYPE = Config.TWO_TIER_CACHE_TYPE
+    CACHE_TWO_TIER_LOCAL_TIMEOUT = Config.CACHE_DEFAULT_TIMEOUT
+    PREVIEW_FOLDED_CONTENT = True
+
 
 class TestingConfig(Config):
     # Database
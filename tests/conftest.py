@@ -4,12 +4,19 @@ import subprocess
 import time
 
 import pytest
+from flask import current_app
 
-from application import init_app
+from application import db, init_app
+from application.cli_database.cli_data_repository import (
+    create_folded_content_table,
+    create_fts_shard_tables,
+)
+from application.page_text_compression import PAGE_TEXT_VIEW
 from application.search_page.helpers import store_s_word_in_session
 from application.search_page.search_page_data_repository import (
+    KEYSET_COLUMNS,
     get_details_for_searched_term,
-    paginate_results,
+    paginate_results_with_keyset,
 )
 
 
@@ -26,6 +33,54 @@ def test_client():
             yield testing_client
 
 
+@pytest.fixture(scope="module")
+def fts5_shards(test_client):
+    # The test database is created with FTS5_SHARDS = 0, so the shard tables
+    # of the tests of the sharded searches are created in it the first time
+    shards = 2
+    database_path = db.engine.url.database
+
+    conn = sqlite3.connect(database_path)
+    table_names = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master").fetchall()
+    }
+    conn.close()
+
+    if "magazine_number_content_fts_shard_0" not in table_names:
+        create_fts_shard_tables(
+            database_path,
+            shards,
+            accepted_special_characters=current_app.config[
+                "ACCEPTED_FTS5_SPECIAL_CHARACTERS"
+            ],
+            prefix_index_lengths=current_app.config["FTS5_PREFIX_INDEX_LENGTHS"],
+            content_table=(
+                PAGE_TEXT_VIEW
+                if PAGE_TEXT_VIEW in table_names
+                else "magazine_number_content"
+            ),
+        )
+
+    return shards
+
+
+@pytest.fixture(scope="module")
+def folded_content_table(test_client):
+    # The test database is created with PREVIEW_FOLDED_CONTENT = False, so the
+    # magazine_number_content_folded table of the tests of the folded content
+    # is created in it the first time
+    database_path = db.engine.url.database
+
+    conn = sqlite3.connect(database_path)
+    table = conn.execute(
+        "SELECT name FROM sqlite_master WHERE name = 'magazine_number_content_folded'"
+    ).fetchone()
+    conn.close()
+
+    if table is None:
+        create_folded_content_table(database_path)
+
+
 @pytest.fixture(scope="module")
 def test_cli_app():
     # Set the Testing configuration prior to creating the Flask application
@@ -76,8 +131,13 @@ def set_up_data_for_previews_for_page_id():
     formatted_s_word = "andrei+mocioni"
     details_searched_term = get_details_for_searched_term(formatted_s_word)
     # get only one result by setting per_page = 1
-    paginated_details_for_searched_term = paginate_results(
-        details_searched_term, page=1, per_page=1, error_out=False
+    paginated_details_for_searched_term = paginate_results_with_keyset(
+        details_searched_term,
+        KEYSET_COLUMNS,
+        page=1,
+        per_page=1,
+        error_out=False,
+        total=details_searched_term.count(),
     )
     page_id = list(paginated_details_for_searched_term)[0][-1]
 
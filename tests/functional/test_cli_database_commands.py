@@ -35,6 +35,7 @@ def test_cli_create_database_correct_tables_and_data(
     magazine_details_inserted_data = c.execute(
         "SELECT * FROM magazine_details"
     ).fetchall()
+    search_hits_inserted_data = c.execute("SELECT * FROM search_hits").fetchall()
     fts_table_inserted_data = c.execute(
         """
         SELECT *
@@ -62,6 +63,10 @@ def test_cli_create_database_correct_tables_and_data(
         (2, 1, "magazine_content_2", 2),
     ]
     assert magazine_details_inserted_data == [(1, 1, "year_1", 1, 2)]
+    assert search_hits_inserted_data == [
+        (1, 1, "magazine_name_1", "year_1", "number_1", 1, "number_link_1"),
+        (2, 2, "magazine_name_1", "year_1", "number_1", 2, "number_link_1"),
+    ]
     assert len(fts_table_inserted_data) == 2
 
 
@@ -81,6 +86,31 @@ def test_cli_create_database_correct_confirmation_message(
     assert f"database {database_name} created in {database_folder}" in standard_output
 
 
+def test_cli_create_database_with_page_text_compression(
+    test_cli_app, monkeypatch, tmp_path
+):
+    # Set the DATABASE_FOLDER to use tmp_path
+    monkeypatch.setitem(test_cli_app.config, "DATABASE_FOLDER", tmp_path)
+    monkeypatch.setitem(test_cli_app.config, "PAGE_TEXT_COMPRESSION", True)
+
+    runner = test_cli_app.test_cli_runner()
+    res = runner.invoke(args=["database", "create", "test"])
+
+    conn = sqlite3.connect(tmp_path / "test.db")
+    stored_content_types = conn.execute(
+        "SELECT DISTINCT typeof(magazine_content) FROM magazine_number_content"
+    ).fetchall()
+    fts_table_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'magazine_number_content_fts'"
+    ).fetchone()[0]
+    conn.close()
+
+    assert "page text compressed:" in res.stdout
+    assert "decompression per preview:" in res.stdout
+    assert stored_content_types == [("blob",)]
+    assert "content='magazine_number_content_text'" in fts_table_sql
+
+
 def test_cli_create_database_with_incorrect_database_name_argument(test_cli_app):
     database_name = "wrong_name"
 
@@ -206,3 +236,47 @@ def test_cli_remove_database_with_missing_database_name_argument(test_cli_app):
 
     assert res.exit_code == 2
     assert "Error: Missing argument 'NAME'." in res.output
+
+
+# ----------------------
+# warm_cache command tests
+# ----------------------
+
+
+def test_cli_warm_cache_with_terms_file(test_cli_app, tmp_path):
+    terms_file = tmp_path / "terms.txt"
+    terms_file.write_text("Bucuresti\nBUCUREȘTI\nVictor Babeș\n", encoding="utf-8")
+
+    runner = test_cli_app.test_cli_runner()
+    res = runner.invoke(
+        args=["database", "warm-cache", "--terms-file", str(terms_file)]
+    )
+
+    assert res.exit_code == 0
+    assert "search cache warmed with 2 terms in" in res.stdout
+    assert "hit rate afterwards: 2/2 (100.0%)" in res.stdout
+
+
+def test_cli_warm_cache_with_log_file(test_cli_app, tmp_path):
+    log_file = tmp_path / "Darwin_App.log"
+    log_file.write_text(
+        "2024-01-01 10:00:00,000 INFO: Formatted search_box parameter to:"
+        " Bucuresti [in search_page_routes.py:84]\n",
+        encoding="utf-8",
+    )
+
+    runner = test_cli_app.test_cli_runner()
+    res = runner.invoke(args=["database", "warm-cache", "--log-file", str(log_file)])
+
+    assert res.exit_code == 0
+    assert "search cache warmed with 1 terms in" in res.stdout
+
+
+def test_cli_warm_cache_without_searched_terms(test_cli_app, tmp_path):
+    runner = test_cli_app.test_cli_runner()
+    res = runner.invoke(
+        args=["database", "warm-cache", "--log-file", str(tmp_path / "missing.log")]
+    )
+
+    assert res.exit_code == 2
+    assert "Error: no searched terms found to warm the cache." in res.output
@@ -1,4 +1,10 @@
+import sqlite3
+
 import pytest
+from sqlalchemy.exc import OperationalError
+
+import application.search_page.search_page_routes
+from application import cache
 
 
 def test_404_response_in_magazine_details_page_because_magazine_id_is_not_found(
@@ -47,3 +53,24 @@ def test_no_results_found_in_search_page_due_to_not_found_term(test_client):
     assert b"No results found." in response.data
     assert b"No results were found for" in response.data
     assert term.encode() in response.data
+
+
+def test_503_response_in_search_page_because_the_query_was_interrupted(
+    test_client, monkeypatch
+):
+    def interrupted_scan(*args, **kwargs):
+        raise OperationalError("SELECT", {}, sqlite3.OperationalError("interrupted"))
+
+    monkeypatch.setattr(
+        application.search_page.search_page_routes,
+        "scan_searched_term",
+        interrupted_scan,
+    )
+    cache.clear()
+
+    response = test_client.get(
+        "/results/search", query_string={"search_box": "interrupted_term"}
+    )
+
+    assert response.status_code == 503
+    assert b"The search took too long." in response.data
@@ -6,7 +6,9 @@ import pytest
 from flask import current_app
 
 import application
+import config
 from application import init_app, run_warm_up_queries
+from application.search_page import cache_warming
 
 
 def test_run_warm_up_queries_runs(test_client, caplog):
@@ -64,3 +66,16 @@ def test_init_app_does_not_call_run_warm_up_queries(monkeypatch, configs):
     init_app()
 
     run_warm_up_queries_mock.assert_not_called()
+
+
+def test_init_app_starts_the_search_cache_warming(monkeypatch):
+    start_search_cache_warming_mock = Mock()
+    monkeypatch.setattr(
+        cache_warming, "start_search_cache_warming", start_search_cache_warming_mock
+    )
+    monkeypatch.setattr(config.TestingConfig, "WARM_CACHE_ON_STARTUP", True)
+    os.environ["CONFIG_TYPE"] = "config.TestingConfig"
+
+    app = init_app()
+
+    start_search_cache_warming_mock.assert_called_once_with(app)
@@ -1,14 +1,42 @@
+import sqlite3
+from unittest import mock
+
 import flask_sqlalchemy
 import pytest
 import werkzeug
 from flask import current_app
-
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query
+
+from application.models import SearchHits
+from application.search_page.helpers import decode_cursor
+from application.search_page.pagination import KeysetPagination, RankedPagination
+from application.search_page.previews import (
+    fold_text,
+    replace_multiple_extra_white_spaces_with_just_one,
+)
 from application.search_page.search_page_data_repository import (
+    KEYSET_COLUMNS,
+    KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+    get_database_build_id,
     get_details_for_searched_term,
     get_details_for_searched_term_for_specific_magazine,
-    get_distinct_magazine_names_and_count_for_searched_term,
-    get_magazine_content_details,
-    paginate_results,
+    get_document_frequency,
+    get_magazine_contents,
+    get_magazine_contents_and_folded_contents,
+    get_rank_column,
+    get_snippets,
+    paginate_results_by_relevance,
+    paginate_results_with_keyset,
+)
+
+# the errors raised by a query that reads a missing table and by a query
+# interrupted by the SEARCH_QUERY_TIME_BUDGET progress handler
+NO_SUCH_TABLE_ERROR = OperationalError(
+    "SELECT", {}, sqlite3.OperationalError("no such table: missing_table")
+)
+INTERRUPTED_ERROR = OperationalError(
+    "SELECT", {}, sqlite3.OperationalError("interrupted")
 )
 
 
@@ -39,6 +67,18 @@ class TestGetDetailsForSearchedTerm:
 
         assert isinstance(details_for_searched_term, flask_sqlalchemy.query.Query)
 
+    def test_get_details_for_searched_term_with_substring_match(self, test_client):
+        details_for_searched_term = get_details_for_searched_term("Bucuresti")
+        details_for_searched_substring = get_details_for_searched_term(
+            "ucuresti", match="substring"
+        )
+
+        assert {row[-1] for row in details_for_searched_term} <= {
+            row[-1] for row in details_for_searched_substring
+        }
+        for row in details_for_searched_substring:
+            assert len(row) == 6
+
     def test_response_details_of_get_details_for_searched_term(self, test_client):
         s_word = "fotbal"
         details_for_searched_term = get_details_for_searched_term(s_word)
@@ -57,45 +97,6 @@ class TestGetDetailsForSearchedTerm:
             assert isinstance(rowid, int)
 
 
-# Tests for get_distinct_magazine_names_and_count_for_searched_term
-class TestGetDistinctMagazineNamesAndCountForSearchedTerm:
-    def test_type_of_get_distinct_magazine_names_and_count_for_searched_term(
-        self, test_client
-    ):
-        s_word = "Bucuresti"
-        # get a flask_sqlalchemy.query.Query object with all details for
-        # a searched term to be grouped and counted
-        details_for_searched_term = get_details_for_searched_term(s_word)
-
-        magazine_names_and_count = (
-            get_distinct_magazine_names_and_count_for_searched_term(
-                details_for_searched_term
-            )
-        )
-
-        assert isinstance(magazine_names_and_count, flask_sqlalchemy.query.Query)
-
-    def test_get_distinct_magazine_names_and_count_for_searched_term_gets_correct_data(
-        self, test_client
-    ):
-        s_word = "Bucuresti"
-        # get a flask_sqlalchemy.query.Query object with all details for
-        # a searched term to be grouped and counted
-        details_for_searched_term = get_details_for_searched_term(s_word)
-
-        magazine_names_and_count = (
-            get_distinct_magazine_names_and_count_for_searched_term(
-                details_for_searched_term
-            )
-        )
-        expected_result = [
-            ("Albina (1866-1876)", 26),
-            ("Amicul Şcoalei (1925-1935)", 186),
-        ]
-
-        assert list(magazine_names_and_count) == expected_result
-
-
 # Tests for get_details_for_searched_term_for_specific_magazine
 class TestGetDetailsForSpecificMagazineForSearchedTerm:
     def test_instance_of_get_details_for_specific_magazinese_for_searched_term(
@@ -138,38 +139,42 @@ class TestGetDetailsForSpecificMagazineForSearchedTerm:
             assert row[0] == magazine_filter
 
 
-# Tests for paginate_results
-class TestPaginateResults:
-    def test_type_of_paginate_results(self, test_client):
+# Tests for paginate_results_with_keyset
+class TestPaginateResultsWithKeyset:
+    def test_type_of_paginate_results_with_keyset(self, test_client):
         s_word = "Bucuresti"
-        # get a flask_sqlalchemy.query.Query object to be paginated
         details_for_searched_term = get_details_for_searched_term(s_word)
-        page = 1
-        per_page = current_app.config["RESULTS_PER_PAGE"]
-        error_out = False
 
-        paginated_details_for_searched_word = paginate_results(
-            details_for_searched_term, page, per_page, error_out
+        paginated_details_for_searched_word = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS,
+            page=1,
+            per_page=10,
+            error_out=False,
+            total=details_for_searched_term.count(),
         )
 
-        assert isinstance(
-            paginated_details_for_searched_word,
-            flask_sqlalchemy.pagination.QueryPagination,
-        )
+        assert isinstance(paginated_details_for_searched_word, KeysetPagination)
 
     pages = [1, 22]
 
     @pytest.mark.parametrize("pages", pages)
-    def test_paginate_results_returns_correct_page(self, test_client, pages):
+    def test_paginate_results_with_keyset_returns_correct_page(
+        self, test_client, pages
+    ):
         s_word = "Bucuresti"
-        # get a flask_sqlalchemy.query.Query object to be paginated
         details_for_searched_term = get_details_for_searched_term(s_word)
         page = pages
         per_page = current_app.config["RESULTS_PER_PAGE"]
         error_out = False
 
-        paginated_details_for_searched_word = paginate_results(
-            details_for_searched_term, page, per_page, error_out
+        paginated_details_for_searched_word = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS,
+            page,
+            per_page,
+            error_out,
+            total=details_for_searched_term.count(),
         )
 
         assert paginated_details_for_searched_word.page == page
@@ -177,66 +182,365 @@ class TestPaginateResults:
     results_per_page = [1, 10, 11, 200]
 
     @pytest.mark.parametrize("per_page", results_per_page)
-    def test_paginate_results_returns_correct_number_of_results_per_page(
+    def test_paginate_results_with_keyset_returns_correct_number_of_results_per_page(
         self, test_client, per_page
     ):
         s_word = "Bucuresti"
-        # get a flask_sqlalchemy.query.Query object to be paginated
         details_for_searched_term = get_details_for_searched_term(s_word)
         page = 1
-        per_page = per_page
         error_out = False
 
-        paginated_details_for_searched_word = paginate_results(
-            details_for_searched_term, page, per_page, error_out
+        paginated_details_for_searched_word = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS,
+            page,
+            per_page,
+            error_out,
+            total=details_for_searched_term.count(),
         )
 
         assert len(paginated_details_for_searched_word.items) == per_page
 
-    def test_paginate_results_error_out_true_not_existing_page(self, test_client):
+    def test_paginate_results_with_keyset_error_out_true_not_existing_page(
+        self, test_client
+    ):
         s_word = "Bucuresti"
-        # get a flask_sqlalchemy.query.Query object to be paginated
         details_for_searched_term = get_details_for_searched_term(s_word)
         page = 2000
         per_page = 10
         error_out = True
 
         with pytest.raises(werkzeug.exceptions.NotFound) as err:
-            paginate_results(details_for_searched_term, page, per_page, error_out)
+            paginate_results_with_keyset(
+                details_for_searched_term,
+                KEYSET_COLUMNS,
+                page,
+                per_page,
+                error_out,
+                total=details_for_searched_term.count(),
+            )
 
         assert "404 Not Found" in str(err.value)
 
-    def test_paginate_results_error_out_false_not_existing_page(self, test_client):
+    def test_paginate_results_with_keyset_error_out_false_not_existing_page(
+        self, test_client
+    ):
         s_word = "Bucuresti"
         details_for_searched_term = get_details_for_searched_term(s_word)
         page = 2000
         per_page = 10
         error_out = False
 
-        paginate_results(details_for_searched_term, page, per_page, error_out)
+        paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS,
+            page,
+            per_page,
+            error_out,
+            total=details_for_searched_term.count(),
+        )
 
+    def test_paginate_results_with_keyset_walks_same_pages_as_offset(self, test_client):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+        total = details_for_searched_term.count()
+        per_page = 10
 
-# Tests for get_magazine_content_details
-class TestGetMagazineContentDetails:
-    def test_get_magazine_content_details_with_no_parameter_passed(self, test_client):
-        assert get_magazine_content_details() == ""
+        cursor = None
+        for page in range(1, 4):
+            keyset_page = paginate_results_with_keyset(
+                details_for_searched_term,
+                KEYSET_COLUMNS,
+                page,
+                per_page,
+                error_out=False,
+                total=total,
+                cursor=cursor,
+            )
+            offset_page = (
+                details_for_searched_term.order_by(*KEYSET_COLUMNS)
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+                .all()
+            )
 
-    invalid_parameters = ["a", False, 3.14]
+            assert keyset_page.items == offset_page
+            cursor = decode_cursor(keyset_page.next_cursor)
 
-    @pytest.mark.parametrize("invalid_parameters", invalid_parameters)
-    def test_get_magazine_content_details_with_invalid_parameters_type(
-        self,
-        test_client,
-        invalid_parameters,
+    def test_paginate_results_with_keyset_prev_cursor_for_specific_magazine(
+        self, test_client
     ):
-        assert get_magazine_content_details(invalid_parameters) == ""
+        s_word = "Bucuresti"
+        magazine_filter = "Albina (1866-1876)"
+        details_for_searched_term = get_details_for_searched_term_for_specific_magazine(
+            get_details_for_searched_term(s_word), magazine_filter
+        )
+        total = details_for_searched_term.count()
+        per_page = 10
+
+        first_page = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+            1,
+            per_page,
+            error_out=False,
+            total=total,
+        )
+        second_page = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+            2,
+            per_page,
+            error_out=False,
+            total=total,
+            cursor=decode_cursor(first_page.next_cursor),
+        )
+        back_to_first_page = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+            1,
+            per_page,
+            error_out=False,
+            total=total,
+            cursor=decode_cursor(second_page.prev_cursor),
+        )
 
-    def test_get_magazine_content_details_with_inexistent_rowid(self, test_client):
-        assert get_magazine_content_details(0) == ""
+        assert back_to_first_page.items == first_page.items
+
+    def test_paginate_results_with_keyset_last_cursor(self, test_client):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+        total = details_for_searched_term.count()
+        per_page = 10
+        pages = -(-total // per_page)
+
+        last_page = paginate_results_with_keyset(
+            details_for_searched_term,
+            KEYSET_COLUMNS,
+            pages,
+            per_page,
+            error_out=False,
+            total=total,
+            cursor=("prev", None),
+        )
+        offset_last_page = (
+            details_for_searched_term.order_by(*KEYSET_COLUMNS)
+            .offset((pages - 1) * per_page)
+            .limit(per_page)
+            .all()
+        )
+
+        assert last_page.items == offset_last_page
+
+    def test_paginate_results_with_keyset_cursor_with_invalid_key(self, test_client):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+
+        with pytest.raises(werkzeug.exceptions.NotFound):
+            paginate_results_with_keyset(
+                details_for_searched_term,
+                KEYSET_COLUMNS,
+                2,
+                10,
+                error_out=True,
+                total=details_for_searched_term.count(),
+                cursor=("next", [1, 2]),
+            )
 
-    def test_get_magazine_content_details_with_existent_rowid(self, test_client):
+    @pytest.mark.parametrize("key", [2**63, -(2**63) - 1])
+    def test_paginate_results_with_keyset_cursor_with_key_out_of_range(
+        self, test_client, key
+    ):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+
+        with pytest.raises(werkzeug.exceptions.NotFound):
+            paginate_results_with_keyset(
+                details_for_searched_term,
+                KEYSET_COLUMNS,
+                2,
+                10,
+                error_out=True,
+                total=details_for_searched_term.count(),
+                cursor=("next", key),
+            )
+
+
+# Tests for paginate_results_by_relevance
+class TestPaginateResultsByRelevance:
+    def test_type_of_paginate_results_by_relevance(self, test_client):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+
+        paginated_details_for_searched_word = paginate_results_by_relevance(
+            details_for_searched_term,
+            page=1,
+            per_page=10,
+            error_out=False,
+            total=details_for_searched_term.count(),
+        )
+
+        assert isinstance(paginated_details_for_searched_word, RankedPagination)
+        assert paginated_details_for_searched_word.next_cursor is None
+
+    def test_paginate_results_by_relevance_returns_all_results(self, test_client):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+        total = details_for_searched_term.count()
+        per_page = 10
+
+        ranked_results = []
+        for page in range(1, -(-total // per_page) + 1):
+            ranked_results.extend(
+                paginate_results_by_relevance(
+                    details_for_searched_term, page, per_page, False, total
+                ).items
+            )
+
+        ranks = dict(
+            details_for_searched_term.with_entities(
+                SearchHits.id, get_rank_column()
+            ).all()
+        )
+        results_ranks = [ranks[row.id] for row in ranked_results]
+
+        assert sorted(ranked_results, key=lambda row: row.id) == sorted(
+            details_for_searched_term, key=lambda row: row.id
+        )
+        # the best matches (the lowest bm25 rank) come first, across the pages
+        assert results_ranks == sorted(results_ranks)
+
+    def test_paginate_results_by_relevance_first_page_differs_from_display_order(
+        self, test_client
+    ):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+        total = details_for_searched_term.count()
+
+        first_page_by_relevance = paginate_results_by_relevance(
+            details_for_searched_term, 1, 10, False, total
+        ).items
+        first_page = paginate_results_with_keyset(
+            details_for_searched_term, KEYSET_COLUMNS, 1, 10, False, total
+        ).items
+
+        assert [row.id for row in first_page_by_relevance] != [
+            row.id for row in first_page
+        ]
+
+
+# Tests for get_magazine_contents
+class TestGetMagazineContents:
+    def test_get_magazine_contents_with_no_page_ids(self, test_client):
+        assert get_magazine_contents([]) == {}
+
+    def test_get_magazine_contents_with_inexistent_rowid(self, test_client):
+        assert get_magazine_contents([0]) == {}
+
+    def test_get_magazine_contents_with_existent_rowid(self, test_client):
         page_id = 1989
-        content_details = get_magazine_content_details(page_id)
+        magazine_contents = get_magazine_contents([page_id])
+
+        assert len(magazine_contents[page_id]) == 11544
+        assert " si romanii remanu espusi fatalităţilor!" in magazine_contents[page_id]
+
+    def test_get_magazine_contents_returns_only_the_pages_found(self, test_client):
+        page_ids = [
+            row[-1] for row in get_details_for_searched_term("Bucuresti").limit(10)
+        ]
+
+        magazine_contents = get_magazine_contents(page_ids + [0])
+
+        assert set(magazine_contents) == set(page_ids)
+
+
+# Tests for get_document_frequency
+class TestGetDocumentFrequency:
+    def test_get_document_frequency_without_fts5vocab_table(self, test_client):
+        with mock.patch.object(Query, "scalar", side_effect=NO_SUCH_TABLE_ERROR):
+            assert get_document_frequency("bucuresti") is None
+
+    def test_get_document_frequency_reraises_an_interrupted_query(self, test_client):
+        with mock.patch.object(Query, "scalar", side_effect=INTERRUPTED_ERROR):
+            with pytest.raises(OperationalError, match="interrupted"):
+                get_document_frequency("bucuresti")
+
+
+# Tests for get_magazine_contents_and_folded_contents
+class TestGetMagazineContentsAndFoldedContents:
+    def test_get_magazine_contents_and_folded_contents_with_no_page_ids(
+        self, test_client
+    ):
+        assert get_magazine_contents_and_folded_contents([]) == {}
+
+    def test_get_magazine_contents_and_folded_contents_returns_the_folded_content(
+        self, test_client, folded_content_table
+    ):
+        page_ids = [
+            row[-1] for row in get_details_for_searched_term("Bucuresti").limit(10)
+        ]
+
+        magazine_contents = get_magazine_contents_and_folded_contents(page_ids + [0])
+        contents = get_magazine_contents(page_ids)
+
+        assert set(magazine_contents) == set(page_ids)
+        for page_id in page_ids:
+            content, folded_content = magazine_contents[page_id]
+            assert content == replace_multiple_extra_white_spaces_with_just_one(
+                contents[page_id]
+            )
+            assert folded_content == fold_text(content)
+
+    def test_get_magazine_contents_and_folded_contents_without_folded_table(
+        self, test_client
+    ):
+        magazine_contents = get_magazine_contents([1])
+
+        with mock.patch.object(Query, "all", side_effect=NO_SUCH_TABLE_ERROR):
+            assert get_magazine_contents_and_folded_contents([1]) == {
+                page_id: (content, None)
+                for page_id, content in magazine_contents.items()
+            }
+
+    def test_get_magazine_contents_and_folded_contents_reraises_an_interrupted_query(
+        self, test_client
+    ):
+        with mock.patch.object(Query, "all", side_effect=INTERRUPTED_ERROR):
+            with pytest.raises(OperationalError, match="interrupted"):
+                get_magazine_contents_and_folded_contents([1])
+
+
+# Tests for get_snippets
+class TestGetSnippets:
+    def test_get_snippets_with_no_page_ids(self, test_client):
+        assert get_snippets("Bucuresti", [], 16, "<", ">", "...") == {}
+
+    def test_get_snippets_marks_the_searched_term(self, test_client):
+        page_ids = [
+            row[-1] for row in get_details_for_searched_term("Bucuresti").limit(5)
+        ]
+
+        snippets = get_snippets("Bucuresti", page_ids + [0], 16, "<", ">", "...")
+
+        assert set(snippets) == set(page_ids)
+        for snippet in snippets.values():
+            assert "<" in snippet and ">" in snippet
+            assert len(snippet.split()) <= 16 + 2
+
+
+# Tests for get_database_build_id
+class TestGetDatabaseBuildId:
+    def test_get_database_build_id(self, test_client):
+        build_id = get_database_build_id()
+
+        assert isinstance(build_id, str)
+        assert len(build_id) == 32
+
+    def test_get_database_build_id_without_database_build_table(self, test_client):
+        with mock.patch.object(Query, "scalar", side_effect=NO_SUCH_TABLE_ERROR):
+            assert get_database_build_id() is None
 
-        assert len(content_details) == 11544
-        assert " si romanii remanu espusi fatalităţilor!" in content_details
+    def test_get_database_build_id_reraises_an_interrupted_query(self, test_client):
+        with mock.patch.object(Query, "scalar", side_effect=INTERRUPTED_ERROR):
+            with pytest.raises(OperationalError, match="interrupted"):
+                get_database_build_id()
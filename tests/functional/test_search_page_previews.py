@@ -1,4 +1,7 @@
-from application.search_page.previews import get_previews_for_page_id
+from application.search_page.previews import (
+    get_previews_for_page_id,
+    get_snippet_previews_for_page_id,
+)
 
 
 # Tests for get_previews_for_page_id
@@ -56,3 +59,44 @@ class TestGetPreviewsForPageId:
 
         assert res[0][0] == expected_page_id
         assert res[0][1] == expected_preview_text
+
+    def test_get_previews_for_page_id_with_folded_content(
+        self, test_client, set_up_data_for_previews_for_page_id, folded_content_table
+    ):
+        s_word, paginated_details_for_searched_term = (
+            set_up_data_for_previews_for_page_id[0],
+            set_up_data_for_previews_for_page_id[2],
+        )
+
+        res = get_previews_for_page_id(
+            paginated_details_for_searched_term,
+            s_word=s_word,
+            preview_length=20,
+            use_folded_content=True,
+        )
+
+        assert res == get_previews_for_page_id(
+            paginated_details_for_searched_term, s_word=s_word, preview_length=20
+        )
+
+
+# Tests for get_snippet_previews_for_page_id
+class TestGetSnippetPreviewsForPageId:
+    def test_get_snippet_previews_for_page_id_response_content_is_correct(
+        self, test_client, set_up_data_for_previews_for_page_id
+    ):
+        (
+            s_word,
+            page_id,
+            paginated_details_for_searched_term,
+        ) = set_up_data_for_previews_for_page_id
+
+        res = get_snippet_previews_for_page_id(
+            paginated_details_for_searched_term,
+            formatted_s_word=s_word.replace(" ", "+"),
+            snippet_tokens=8,
+        )
+
+        assert len(res) == 1
+        assert res[0][0] == page_id
+        assert "<mark>Andrei</mark> <mark>Mocioni</mark>" in res[0][1]
@@ -1,4 +1,24 @@
+from unittest import mock
+
 import pytest
+from flask import current_app
+
+from application import cache
+from application.models import SearchHits
+from application.search_page.helpers import encode_cursor
+from application.search_page.preview_cache import preview_cache
+from application.search_page.search_cache import search_cache
+from application.search_page.search_executor import scan_searched_term
+from application.search_page.search_page_data_repository import (
+    get_details_for_searched_term,
+    get_rank_column,
+    paginate_ids,
+)
+from application.search_page.search_pipeline import (
+    STAGE_EXECUTOR_EXTENSION,
+    create_stage_executor,
+    run_search_stages,
+)
 
 
 # Tests for /results/
@@ -100,6 +120,285 @@ def test_get_results_page_with_magazine_filter_pagination_not_existent_page(
     assert response.status_code == 404
 
 
+@pytest.mark.parametrize("magazine_filter", [None, "Albina (1866-1876)"])
+def test_get_results_page_sorted_by_relevance(test_client, magazine_filter):
+    s_word = "Bucuresti"
+    response = test_client.get(
+        "/results/search",
+        query_string={
+            "search_box": s_word,
+            "sort": "relevance",
+            "magazine_filter": magazine_filter,
+        },
+    )
+
+    assert response.status_code == 200
+    assert b"Go back to home page" in response.data
+    assert b"Sort by magazine order" in response.data
+
+
+def test_get_results_page_sorted_by_relevance_pages_the_ids_by_rank(test_client):
+    s_word = "Bucuresti"
+    details_for_searched_term = get_details_for_searched_term(s_word)
+    ranks = dict(
+        details_for_searched_term.with_entities(SearchHits.id, get_rank_column()).all()
+    )
+    cache.clear()
+    with mock.patch(
+        "application.search_page.search_page_routes.paginate_ids", wraps=paginate_ids
+    ) as mock_paginate_ids:
+        response = test_client.get(
+            "/results/search", query_string={"search_box": s_word, "sort": "relevance"}
+        )
+    cache.clear()
+
+    ids, keyset_columns = mock_paginate_ids.call_args.args[:2]
+    ids_ranks = [ranks[page_id] for page_id in ids]
+
+    assert response.status_code == 200
+    assert keyset_columns is None
+    assert ids_ranks == sorted(ids_ranks)
+
+
+@pytest.mark.parametrize("sort", [None, "relevance"])
+def test_get_results_page_with_substring_match(test_client, sort):
+    s_word = "ucuresti"
+    response = test_client.get(
+        "/results/search",
+        query_string={"search_box": s_word, "match": "substring", "sort": sort},
+    )
+
+    assert response.status_code == 200
+    assert b"results found for" in response.data
+    assert b"Match the start of words" in response.data
+
+
+def test_get_results_page_above_cost_threshold(test_client, monkeypatch):
+    monkeypatch.setitem(current_app.config, "SEARCH_COST_THRESHOLD", 0)
+    monkeypatch.setitem(current_app.config, "SEARCH_EXPENSIVE_MAX_RESULTS", 5)
+    cache.clear()
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+    cache.clear()
+
+    assert response.status_code == 200
+    assert b"About" in response.data
+    assert b"only the first results of the search are displayed" in response.data
+
+
+def test_get_results_page_above_cost_threshold_marks_the_counts_as_approximate(
+    test_client, monkeypatch
+):
+    monkeypatch.setitem(current_app.config, "SEARCH_COST_THRESHOLD", 0)
+    monkeypatch.setitem(current_app.config, "SEARCH_EXPENSIVE_MAX_RESULTS", 5)
+    cache.clear()
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+    magazine_filter = scan_searched_term(s_word, cost_threshold=0, max_results=5)[
+        "distinct_magazines_and_count"
+    ][0][0]
+    filtered_response = test_client.get(
+        "/results/search",
+        query_string={"search_box": s_word, "magazine_filter": magazine_filter},
+    )
+    cache.clear()
+
+    assert b": at least " in response.data
+    assert b"At least" in filtered_response.data
+    assert b"only the first results of the search are displayed" in (
+        filtered_response.data
+    )
+
+
+def test_get_results_page_with_fts5_preview_engine(test_client, monkeypatch):
+    monkeypatch.setitem(current_app.config, "PREVIEW_ENGINE", "fts5")
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+
+    assert response.status_code == 200
+    assert b"<mark>" in response.data
+
+
+@pytest.mark.parametrize("search_stage_workers", [0, 2])
+def test_get_results_page_with_search_stage_workers(
+    test_client, monkeypatch, search_stage_workers
+):
+    monkeypatch.setitem(
+        current_app.extensions,
+        STAGE_EXECUTOR_EXTENSION,
+        create_stage_executor(search_stage_workers),
+    )
+    preview_cache.clear()
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+
+    assert response.status_code == 200
+    assert b"Number of results displayed by magazine name" in response.data
+
+
+def test_get_results_page_with_fts5_shards(test_client, fts5_shards, monkeypatch):
+    monkeypatch.setitem(current_app.config, "FTS5_SHARDS", fts5_shards)
+    cache.clear()
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+    cache.clear()
+
+    assert response.status_code == 200
+    assert b"Number of results displayed by magazine name" in response.data
+
+
+def test_get_results_page_runs_the_search_stages_concurrently(test_client, monkeypatch):
+    monkeypatch.setitem(
+        current_app.extensions, STAGE_EXECUTOR_EXTENSION, create_stage_executor(2)
+    )
+    preview_cache.clear()
+    s_word = "Bucuresti"
+    with mock.patch(
+        "application.search_page.search_page_routes.run_search_stages",
+        wraps=run_search_stages,
+    ) as mock_run_search_stages:
+        test_client.get("/results/search", query_string={"search_box": s_word})
+
+    stages_names = [
+        list(call.args[0]) for call in mock_run_search_stages.call_args_list
+    ]
+    assert stages_names == [["search_results"], ["page", "previews"]]
+
+
+def test_get_results_page_caches_the_search_results_with_a_normalized_key(
+    test_client,
+):
+    cache.clear()
+    test_client.get("/results/search", query_string={"search_box": "BUCUREȘTI"})
+
+    assert (
+        search_cache.get(search_cache.make_key("results", "bucuresti", None, None))
+        is not None
+    )
+
+
+def test_get_results_page_reads_the_previews_from_the_preview_cache(test_client):
+    preview_cache.clear()
+    s_word = "Bucuresti"
+    test_client.get("/results/search", query_string={"search_box": s_word})
+    misses = preview_cache.stats["misses"]
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+
+    assert response.status_code == 200
+    assert preview_cache.stats["hits"] == misses
+    assert preview_cache.stats["misses"] == misses
+
+
+def test_get_results_page_with_deferred_previews(test_client, monkeypatch):
+    monkeypatch.setitem(current_app.config, "PREVIEW_DEFERRED_LOADING", True)
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+
+    assert response.status_code == 200
+    assert b"data-preview-id" in response.data
+    assert b"/results/previews?ids=" in response.data
+    assert b"<mark>" not in response.data
+
+
+def test_get_results_page_with_results_page_cache(test_client, monkeypatch):
+    monkeypatch.setitem(current_app.config, "RESULTS_PAGE_CACHE", True)
+    cache.clear()
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+    with mock.patch(
+        "application.search_page.search_page_routes.run_search_stages"
+    ) as mock_run_search_stages:
+        cached_response = test_client.get(
+            "/results/search", query_string={"search_box": s_word}
+        )
+    cache.clear()
+
+    assert response.status_code == 200
+    assert response.get_etag() == (mock.ANY, False)
+    assert response.cache_control.no_cache
+    assert b'name="csrf-token"' not in response.data
+    assert cached_response.status_code == 200
+    assert cached_response.data == response.data
+    assert cached_response.get_etag() == response.get_etag()
+    mock_run_search_stages.assert_not_called()
+
+
+def test_get_results_page_with_results_page_cache_not_modified(
+    test_client, monkeypatch
+):
+    monkeypatch.setitem(current_app.config, "RESULTS_PAGE_CACHE", True)
+    cache.clear()
+    s_word = "Bucuresti"
+    response = test_client.get("/results/search", query_string={"search_box": s_word})
+    etag, _ = response.get_etag()
+    not_modified_response = test_client.get(
+        "/results/search",
+        query_string={"search_box": s_word},
+        headers={"If-None-Match": f'"{etag}"'},
+    )
+    cache.clear()
+
+    assert not_modified_response.status_code == 304
+    assert not_modified_response.data == b""
+
+
+def test_get_previews(test_client):
+    page_ids = [row[-1] for row in get_details_for_searched_term("Bucuresti").limit(3)]
+    response = test_client.get(
+        "/results/previews",
+        query_string={"ids": ",".join(map(str, page_ids)), "term": "Bucuresti"},
+    )
+
+    assert response.status_code == 200
+    assert response.cache_control.public
+    assert (
+        response.cache_control.max_age == current_app.config["PREVIEW_RESPONSE_MAX_AGE"]
+    )
+    assert set(response.json["previews"]) == {str(page_id) for page_id in page_ids}
+    for preview in response.json["previews"].values():
+        assert "<mark>" in preview
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        {"ids": "1,a", "term": "Bucuresti"},
+        {"ids": "", "term": "Bucuresti"},
+        {"ids": ",".join(["1"] * 100), "term": "Bucuresti"},
+        {"ids": "1", "term": "Buc"},
+        {"ids": "1"},
+    ],
+)
+def test_get_previews_with_invalid_parameters(test_client, query_string):
+    response = test_client.get("/results/previews", query_string=query_string)
+
+    assert response.status_code == 404
+
+
+def test_get_results_page_pagination_with_invalid_cursor(test_client):
+    s_word = "Bucuresti"
+    response = test_client.get(
+        "/results/search",
+        query_string={"search_box": s_word, "page": 2, "cursor": "not_a_cursor"},
+    )
+
+    assert response.status_code == 404
+
+
+def test_get_results_page_pagination_with_cursor_key_out_of_range(test_client):
+    s_word = "Bucuresti"
+    response = test_client.get(
+        "/results/search",
+        query_string={
+            "search_box": s_word,
+            "page": 2,
+            "cursor": encode_cursor("next", 10**30),
+        },
+    )
+
+    assert response.status_code == 404
+
+
 def test_get_results_page_with_accepted_special_characters(test_client):
     s_word = "-_.,„!?;:'"
     response = test_client.get("/results/search", query_string={"search_box": s_word})
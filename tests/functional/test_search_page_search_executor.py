@@ -0,0 +1,244 @@
+import pytest
+import werkzeug
+
+from application.models import SearchHits
+from application.search_page.pagination import IdListPagination
+from application.search_page.search_executor import (
+    estimate_results_count,
+    get_ids_for_magazine_filter,
+    pack_search_results,
+    scan_searched_term,
+    unpack_search_results,
+)
+from application.search_page.search_page_data_repository import (
+    KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+    get_details_for_searched_term,
+    get_details_for_searched_term_for_specific_magazine,
+    get_rank_column,
+    paginate_ids,
+    paginate_results_with_keyset,
+)
+
+
+# Tests for scan_searched_term
+class TestScanSearchedTerm:
+    def test_scan_searched_term_counts_results_by_magazine_name(self, test_client):
+        s_word = "Bucuresti"
+        details_for_searched_term = get_details_for_searched_term(s_word)
+
+        search_results = scan_searched_term(s_word)
+        expected_result = [
+            ("Albina (1866-1876)", 26),
+            ("Amicul Şcoalei (1925-1935)", 186),
+        ]
+
+        assert search_results["distinct_magazines_and_count"] == expected_result
+        assert len(search_results["ids"]) == details_for_searched_term.count()
+
+    def test_scan_searched_term_ids_are_ordered_by_id(self, test_client):
+        ids = scan_searched_term("Bucuresti")["ids"]
+
+        assert list(ids) == sorted(ids)
+
+    def test_scan_searched_term_by_relevance_has_the_same_ids(self, test_client):
+        ids = scan_searched_term("Bucuresti")["ids"]
+        ids_by_relevance = scan_searched_term("Bucuresti", sort="relevance")["ids"]
+
+        assert sorted(ids_by_relevance) == list(ids)
+
+    def test_scan_searched_term_by_relevance_ids_are_ordered_by_rank(self, test_client):
+        details_for_searched_term = get_details_for_searched_term("Bucuresti")
+        ranks = dict(
+            details_for_searched_term.with_entities(
+                SearchHits.id, get_rank_column()
+            ).all()
+        )
+
+        ids_by_relevance = scan_searched_term("Bucuresti", sort="relevance")["ids"]
+        ids_ranks = [ranks[page_id] for page_id in ids_by_relevance]
+
+        assert ids_ranks == sorted(ids_ranks)
+        assert list(ids_by_relevance) != sorted(ids_by_relevance)
+
+    def test_scan_searched_term_with_no_results(self, test_client):
+        search_results = scan_searched_term("inexistentterm")
+
+        assert search_results["distinct_magazines_and_count"] == []
+        assert len(search_results["ids"]) == 0
+        assert search_results["ids_by_magazine_name"] == {}
+
+
+# Tests for the admission control of scan_searched_term and for
+# estimate_results_count
+class TestEstimateResultsCount:
+    @pytest.mark.parametrize("match", [None, "substring"])
+    def test_estimate_results_count_is_an_upper_bound(self, test_client, match):
+        s_word = "Bucuresti"
+
+        estimated_results_count = estimate_results_count(s_word, match)
+
+        assert estimated_results_count >= len(
+            scan_searched_term(s_word, match=match)["ids"]
+        )
+
+    def test_estimate_results_count_of_inexistent_term(self, test_client):
+        assert estimate_results_count("inexistentterm") == 0
+
+    @pytest.mark.parametrize("sort", [None, "relevance"])
+    def test_scan_searched_term_above_cost_threshold(self, test_client, sort):
+        s_word = "Bucuresti"
+
+        search_results = scan_searched_term(
+            s_word, sort, cost_threshold=0, max_results=5
+        )
+
+        assert len(search_results["ids"]) == 5
+        assert search_results["approximate_results_count"] == estimate_results_count(
+            s_word
+        )
+        assert set(search_results["ids"]) <= set(scan_searched_term(s_word)["ids"])
+
+    def test_scan_searched_term_above_cost_threshold_gets_the_first_ids(
+        self, test_client
+    ):
+        s_word = "Bucuresti"
+
+        search_results = scan_searched_term(s_word, cost_threshold=0, max_results=5)
+
+        assert (
+            list(search_results["ids"]) == list(scan_searched_term(s_word)["ids"])[:5]
+        )
+
+    def test_scan_searched_term_below_cost_threshold(self, test_client):
+        search_results = scan_searched_term(
+            "Bucuresti", cost_threshold=10**9, max_results=5
+        )
+
+        assert search_results["approximate_results_count"] is None
+        assert len(search_results["ids"]) > 5
+
+
+# Tests for scanning the FTS5 shard tables
+class TestScanSearchedTermWithShards:
+    def test_scan_searched_term_with_shards_returns_the_same_results(self, fts5_shards):
+        s_word = "Bucuresti"
+
+        assert scan_searched_term(s_word, shards=fts5_shards) == scan_searched_term(
+            s_word
+        )
+
+    def test_scan_searched_term_with_shards_by_relevance_has_the_same_ids(
+        self, fts5_shards
+    ):
+        s_word = "Bucuresti"
+
+        search_results = scan_searched_term(
+            s_word, sort="relevance", shards=fts5_shards
+        )
+
+        assert sorted(search_results["ids"]) == list(scan_searched_term(s_word)["ids"])
+
+    def test_scan_searched_term_with_shards_above_cost_threshold(self, fts5_shards):
+        s_word = "Bucuresti"
+
+        search_results = scan_searched_term(
+            s_word, cost_threshold=0, max_results=5, shards=fts5_shards
+        )
+
+        assert search_results == scan_searched_term(
+            s_word, cost_threshold=0, max_results=5
+        )
+
+
+# Tests for pack_search_results and unpack_search_results
+class TestPackSearchResults:
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_unpack_search_results_returns_what_was_packed(self, test_client, compress):
+        search_results = scan_searched_term("Bucuresti")
+
+        packed_search_results = pack_search_results(search_results, compress=compress)
+
+        assert isinstance(packed_search_results["ids"], bytes)
+        assert unpack_search_results(packed_search_results) == search_results
+
+    def test_pack_search_results_with_more_ids_than_max_ids(self, test_client):
+        search_results = scan_searched_term("Bucuresti")
+        max_ids = len(search_results["ids"]) - 1
+
+        unpacked_search_results = unpack_search_results(
+            pack_search_results(search_results, max_ids=max_ids)
+        )
+
+        assert (
+            unpacked_search_results["distinct_magazines_and_count"]
+            == search_results["distinct_magazines_and_count"]
+        )
+        assert get_ids_for_magazine_filter(unpacked_search_results) is None
+
+
+# Tests for paginating the ids returned by scan_searched_term
+class TestPaginateIds:
+    def test_type_of_paginate_ids(self, test_client):
+        ids = get_ids_for_magazine_filter(scan_searched_term("Bucuresti"))
+
+        paginated_ids = paginate_ids(ids, None, 1, per_page=10, error_out=False)
+
+        assert isinstance(paginated_ids, IdListPagination)
+
+    @pytest.mark.parametrize("page", [1, 2, 3])
+    def test_paginate_ids_returns_the_same_page_as_the_query_for_specific_magazine(
+        self, test_client, page
+    ):
+        s_word = "Bucuresti"
+        magazine_filter = "Albina (1866-1876)"
+        details_for_specific_magazine = (
+            get_details_for_searched_term_for_specific_magazine(
+                get_details_for_searched_term(s_word), magazine_filter
+            )
+        )
+        ids = get_ids_for_magazine_filter(scan_searched_term(s_word), magazine_filter)
+
+        paginated_ids = paginate_ids(
+            ids,
+            KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+            page,
+            per_page=10,
+            error_out=False,
+        )
+        paginated_query = paginate_results_with_keyset(
+            details_for_specific_magazine,
+            KEYSET_COLUMNS_FOR_SPECIFIC_MAGAZINE,
+            page,
+            per_page=10,
+            error_out=False,
+            total=details_for_specific_magazine.count(),
+        )
+
+        assert paginated_ids.items == paginated_query.items
+        assert paginated_ids.total == paginated_query.total
+
+    def test_paginate_ids_by_relevance_has_no_cursors(self, test_client):
+        ids = get_ids_for_magazine_filter(
+            scan_searched_term("Bucuresti", sort="relevance")
+        )
+
+        paginated_ids = paginate_ids(ids, None, 1, per_page=10, error_out=False)
+
+        assert paginated_ids.next_cursor is None
+        assert paginated_ids.last_cursor is None
+
+    def test_paginate_ids_error_out_true_not_existing_page(self, test_client):
+        ids = get_ids_for_magazine_filter(scan_searched_term("Bucuresti"))
+
+        with pytest.raises(werkzeug.exceptions.NotFound):
+            paginate_ids(ids, None, 2000, per_page=10, error_out=True)
+
+    def test_paginate_ids_for_inexistent_magazine_filter(self, test_client):
+        ids = get_ids_for_magazine_filter(
+            scan_searched_term("Bucuresti"), "inexistent magazine"
+        )
+
+        paginated_ids = paginate_ids(ids, None, 1, per_page=10, error_out=True)
+
+        assert paginated_ids.total == 0
+        assert paginated_ids.items == []
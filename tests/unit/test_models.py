@@ -1,10 +1,16 @@
 from application.models import (
+    DatabaseBuild,
     MagazineDetails,
     MagazineNumber,
     MagazineNumberContent,
+    MagazineNumberContentFolded,
     MagazineNumberContentFTS,
+    MagazineNumberContentFTSVocab,
+    MagazineNumberContentTrigramFTS,
+    MagazineNumberContentTrigramFTSVocab,
     Magazines,
     MagazineYear,
+    SearchHits,
 )
 
 
@@ -83,6 +89,68 @@ class TestModels:
             == "MagazineNumberContentFTS(rowid=1,magazine_content=testMagazineContent)"
         )
 
+    def test_MagazineNumberContentFolded(self):
+        magazine_number_content_folded = MagazineNumberContentFolded(
+            id=1,
+            magazine_content_normalized="testMagazineContent",
+            magazine_content_folded="testmagazinecontent",
+        )
+
+        assert magazine_number_content_folded.id == 1
+        assert (
+            magazine_number_content_folded.magazine_content_normalized
+            == "testMagazineContent"
+        )
+        assert (
+            magazine_number_content_folded.magazine_content_folded
+            == "testmagazinecontent"
+        )
+        assert (
+            repr(magazine_number_content_folded)
+            == "MagazineNumberContentFolded(id=1,magazine_content_normalized=testMagazineContent,magazine_content_folded=testmagazinecontent)"
+        )
+
+    def test_MagazineNumberContentTrigramFTS(self):
+        magazine_number_content_trigram_fts = MagazineNumberContentTrigramFTS(
+            rowid=1, magazine_content="testMagazineContent"
+        )
+
+        assert magazine_number_content_trigram_fts.rowid == 1
+        assert (
+            magazine_number_content_trigram_fts.magazine_content
+            == "testMagazineContent"
+        )
+        assert (
+            repr(magazine_number_content_trigram_fts)
+            == "MagazineNumberContentTrigramFTS(rowid=1,magazine_content=testMagazineContent)"
+        )
+
+    def test_MagazineNumberContentFTSVocab(self):
+        magazine_number_content_fts_vocab = MagazineNumberContentFTSVocab(
+            term="testTerm", doc=2, cnt=3
+        )
+
+        assert magazine_number_content_fts_vocab.term == "testTerm"
+        assert magazine_number_content_fts_vocab.doc == 2
+        assert magazine_number_content_fts_vocab.cnt == 3
+        assert (
+            repr(magazine_number_content_fts_vocab)
+            == "MagazineNumberContentFTSVocab(term=testTerm,doc=2,cnt=3)"
+        )
+
+    def test_MagazineNumberContentTrigramFTSVocab(self):
+        magazine_number_content_trigram_fts_vocab = (
+            MagazineNumberContentTrigramFTSVocab(term="tes", doc=2, cnt=3)
+        )
+
+        assert magazine_number_content_trigram_fts_vocab.term == "tes"
+        assert magazine_number_content_trigram_fts_vocab.doc == 2
+        assert magazine_number_content_trigram_fts_vocab.cnt == 3
+        assert (
+            repr(magazine_number_content_trigram_fts_vocab)
+            == "MagazineNumberContentTrigramFTSVocab(term=tes,doc=2,cnt=3)"
+        )
+
     def test_MagazineDetails(self):
         magazine_details = MagazineDetails(
             id=1,
@@ -101,3 +169,39 @@ class TestModels:
             repr(magazine_details)
             == "MagazineDetails(id=1,magazine_id=1,year=Anul 1899,distinct_magazine_numbers_count=10,distinct_pages_count=100)"
         )
+
+    def test_SearchHits(self):
+        search_hit = SearchHits(
+            id=1,
+            display_order=2,
+            name="testName",
+            year="testYear",
+            magazine_number="testMagazineNumber",
+            magazine_page=1,
+            magazine_number_link="testMagazineNumberLink",
+        )
+
+        assert search_hit.id == 1
+        assert search_hit.display_order == 2
+        assert search_hit.name == "testName"
+        assert search_hit.year == "testYear"
+        assert search_hit.magazine_number == "testMagazineNumber"
+        assert search_hit.magazine_page == 1
+        assert search_hit.magazine_number_link == "testMagazineNumberLink"
+        assert (
+            repr(search_hit)
+            == "SearchHits(id=1,display_order=2,name=testName,year=testYear,magazine_number=testMagazineNumber,magazine_page=1,magazine_number_link=testMagazineNumberLink)"
+        )
+
+    def test_DatabaseBuild(self):
+        database_build = DatabaseBuild(
+            id=1, build_id="testBuildId", created_at="2024-01-01 00:00:00"
+        )
+
+        assert database_build.id == 1
+        assert database_build.build_id == "testBuildId"
+        assert database_build.created_at == "2024-01-01 00:00:00"
+        assert (
+            repr(database_build)
+            == "DatabaseBuild(id=1,build_id=testBuildId,created_at=2024-01-01 00:00:00)"
+        )
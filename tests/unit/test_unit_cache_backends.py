@@ -0,0 +1,158 @@
+import time
+
+from cachelib import FileSystemCache, SimpleCache
+from flask import Flask
+from flask_caching import Cache
+
+from application.cache_backends import FileLock, TwoTierCache, get_cache_lock
+
+
+class LocalInvalidation:
+    """An invalidation channel shared by the caches of the same test."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def publish(self, instance_id, keys):
+        for callback in self.callbacks:
+            callback(instance_id, keys)
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+
+class TestTwoTierCache:
+    def test_two_tier_cache_reads_the_local_tier_first(self):
+        remote = SimpleCache()
+        two_tier_cache = TwoTierCache(remote)
+        two_tier_cache.set("key_1", "value_1")
+        remote.clear()
+
+        assert two_tier_cache.get("key_1") == "value_1"
+
+    def test_two_tier_cache_writes_through_to_the_remote_backend(self):
+        remote = SimpleCache()
+        two_tier_cache = TwoTierCache(remote)
+        two_tier_cache.set("key_1", "value_1")
+        two_tier_cache.set_many({"key_2": "value_2"})
+        two_tier_cache.add("key_3", "value_3")
+
+        assert remote.get_many("key_1", "key_2", "key_3") == [
+            "value_1",
+            "value_2",
+            "value_3",
+        ]
+
+    def test_two_tier_cache_get_many_stores_the_remote_values_locally(self):
+        remote = SimpleCache()
+        remote.set("key_1", "value_1")
+        two_tier_cache = TwoTierCache(remote)
+
+        assert two_tier_cache.get_many("key_1", "key_2") == ["value_1", None]
+        remote.clear()
+        assert two_tier_cache.get_many("key_1") == ["value_1"]
+
+    def test_two_tier_cache_evicts_the_least_recently_used_entries(self):
+        two_tier_cache = TwoTierCache(SimpleCache(), max_entries=2)
+        two_tier_cache.set("key_1", "value_1")
+        two_tier_cache.set("key_2", "value_2")
+        two_tier_cache.get("key_1")
+        two_tier_cache.set("key_3", "value_3")
+        two_tier_cache.remote.clear()
+
+        assert two_tier_cache.get_many("key_1", "key_2", "key_3") == [
+            "value_1",
+            None,
+            "value_3",
+        ]
+
+    def test_two_tier_cache_is_bounded_by_the_size_of_the_entries(self):
+        two_tier_cache = TwoTierCache(SimpleCache(), max_bytes=3_000)
+        for index in range(10):
+            two_tier_cache.set(f"key_{index}", b"x" * 1_000)
+
+        assert two_tier_cache.stats["entries"] == 2
+        assert two_tier_cache.stats["memory_bytes"] <= 3_000
+
+    def test_two_tier_cache_local_entries_expire(self):
+        remote = SimpleCache()
+        two_tier_cache = TwoTierCache(remote, local_timeout=0.01)
+        two_tier_cache.set("key_1", "value_1")
+        remote.set("key_1", "value_2")
+        time.sleep(0.02)
+
+        assert two_tier_cache.get("key_1") == "value_2"
+
+    def test_two_tier_cache_delete(self):
+        two_tier_cache = TwoTierCache(SimpleCache())
+        two_tier_cache.set("key_1", "value_1")
+        two_tier_cache.delete("key_1")
+
+        assert two_tier_cache.get("key_1") is None
+        assert not two_tier_cache.has("key_1")
+
+    def test_two_tier_cache_invalidates_the_local_tier_of_the_other_caches(self):
+        remote = SimpleCache()
+        invalidation = LocalInvalidation()
+        two_tier_cache_1 = TwoTierCache(remote, invalidation=invalidation)
+        two_tier_cache_2 = TwoTierCache(remote, invalidation=invalidation)
+        two_tier_cache_1.get("key_1")
+        two_tier_cache_2.get("key_1")
+
+        two_tier_cache_1.set("key_1", "value_1")
+        assert two_tier_cache_2.get("key_1") == "value_1"
+        two_tier_cache_2.set("key_1", "value_2")
+
+        assert two_tier_cache_1.get("key_1") == "value_2"
+        two_tier_cache_2.clear()
+        assert two_tier_cache_1.stats["entries"] == 0
+
+    def test_two_tier_cache_factory(self):
+        app = Flask(__name__)
+        app.config.update(
+            CACHE_TYPE="application.cache_backends.TwoTierCache",
+            CACHE_TWO_TIER_REMOTE_TYPE="SimpleCache",
+            CACHE_TWO_TIER_MAX_ENTRIES=10,
+            CACHE_DEFAULT_TIMEOUT=60,
+        )
+        cache = Cache(app)
+
+        with app.app_context():
+            cache.set("key_1", "value_1")
+
+            assert isinstance(cache.cache, TwoTierCache)
+            assert cache.cache.max_entries == 10
+            assert cache.cache.remote.get("key_1") == "value_1"
+            assert cache.get("key_1") == "value_1"
+
+
+class TestFileLock:
+    def test_file_lock_is_held_by_a_single_lock(self, tmp_path):
+        lock_1 = FileLock(str(tmp_path / "locks" / "1.lock"))
+        lock_2 = FileLock(str(tmp_path / "locks" / "1.lock"))
+
+        assert lock_1.acquire(blocking=False)
+        assert not lock_2.acquire(blocking_timeout=0.05)
+        lock_1.release()
+        assert lock_2.acquire(blocking=False)
+        lock_2.release()
+
+
+class TestGetCacheLock:
+    def test_get_cache_lock_for_a_shared_backend_without_a_server(self, tmp_path):
+        backend = FileSystemCache(str(tmp_path / "cache"))
+        lock = get_cache_lock(backend, "key_1", 30, str(tmp_path))
+
+        assert isinstance(lock, FileLock)
+        assert (
+            lock.path
+            == get_cache_lock(TwoTierCache(backend), "key_1", 30, str(tmp_path)).path
+        )
+        assert lock.path != get_cache_lock(backend, "key_2", 30, str(tmp_path)).path
+
+    def test_get_cache_lock_for_a_backend_of_a_process(self, tmp_path):
+        assert get_cache_lock(SimpleCache(), "key_1", 30, str(tmp_path)) is None
+        assert (
+            get_cache_lock(TwoTierCache(SimpleCache()), "key_1", 30, str(tmp_path))
+            is None
+        )
@@ -5,13 +5,22 @@ import pytest
 from flask import current_app
 
 from application.cli_database.cli_data_repository import (
+    compress_page_texts,
     create_database,
+    create_folded_content_table,
+    create_fts_shard_tables,
     create_fts_table,
+    create_fts_vocab_table,
     create_magazine_details_table,
+    create_search_hits_table,
+    create_trigram_fts_table,
     get_data_from_csv_file,
+    get_magazine_ids_by_shard,
+    stamp_database_build_id,
     write_data_to_database,
     write_to_database,
 )
+from application.page_text_compression import decompress_page_text
 
 
 class TestCreateDatabase:
@@ -209,6 +218,63 @@ class TestCreateMagazineDetailsTable:
         assert inserted_data == [(1, 1, "year_1", 1, 2)]
 
 
+class TestCreateSearchHitsTable:
+    def test_create_search_hits_table_created(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        create_search_hits_table(database_path)
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        inserted_data = c.execute("SELECT * FROM search_hits").fetchall()
+        conn.close()
+
+        assert inserted_data == [
+            (1, 1, "magazine_name_1", "year_1", "number_1", 1, "number_link_1"),
+            (2, 2, "magazine_name_1", "year_1", "number_1", 2, "number_link_1"),
+        ]
+
+    def test_create_search_hits_table_display_order_is_chronological(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        conn = sqlite3.connect(database_path)
+        with conn:
+            conn.execute(
+                "INSERT INTO magazine_number_content VALUES(3, 2, 'content_3', 1)"
+            )
+            conn.execute(
+                "INSERT INTO magazine_number_content VALUES(4, 1, 'content_4', 3)"
+            )
+
+        create_search_hits_table(database_path)
+
+        ids_by_display_order = conn.execute(
+            "SELECT id FROM search_hits ORDER BY display_order"
+        ).fetchall()
+        conn.close()
+
+        # number_1 pages 1, 2, 3 come before number_2 page 1
+        assert ids_by_display_order == [(1,), (2,), (4,), (3,)]
+
+    def test_create_search_hits_table_can_be_recreated(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        create_search_hits_table(database_path)
+        create_search_hits_table(database_path)
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        inserted_data = c.execute("SELECT COUNT(*) FROM search_hits").fetchone()
+        conn.close()
+
+        assert inserted_data == (2,)
+
+
 class TestCreateFtsTable:
     def test_create_fts_table_with_match_query(
         self, insert_data_in_magazine_number_content_table
@@ -230,3 +296,263 @@ class TestCreateFtsTable:
         conn.close()
 
         assert len(inserted_data) == 2
+
+    def test_create_fts_table_with_prefix_index_lengths(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        create_fts_table(database_path, prefix_index_lengths=(4, 5, 6))
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        table_sql = c.execute(
+            """
+        SELECT sql FROM sqlite_master
+        WHERE name = 'magazine_number_content_fts'
+           """
+        ).fetchone()[0]
+        inserted_data = c.execute(
+            """
+        SELECT rowid
+        FROM magazine_number_content_fts
+        WHERE magazine_number_content_fts MATCH '"maga"*'
+           """
+        ).fetchall()
+        conn.close()
+
+        assert "prefix = '4 5 6'" in table_sql
+        assert len(inserted_data) == 2
+
+
+class TestCreateFoldedContentTable:
+    def test_create_folded_content_table_folds_the_content(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        conn = sqlite3.connect(database_path)
+        with conn:
+            conn.execute(
+                "UPDATE magazine_number_content SET magazine_content ="
+                " 'Mărţişor  din   BUCUREŞTI' WHERE id = 1"
+            )
+        conn.close()
+
+        create_folded_content_table(database_path)
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        inserted_data = c.execute(
+            """
+        SELECT id, magazine_content_normalized, magazine_content_folded
+        FROM magazine_number_content_folded
+        ORDER BY id
+           """
+        ).fetchall()
+        conn.close()
+
+        assert inserted_data == [
+            (1, "Mărţişor din BUCUREŞTI", "martisor din bucuresti"),
+            (2, "magazine_content_2", "magazine_content_2"),
+        ]
+
+
+class TestStampDatabaseBuildId:
+    def test_stamp_database_build_id_stores_a_new_build_id(self, create_test_db):
+        database_path = create_test_db
+
+        stamp_database_build_id(database_path)
+        build_id = stamp_database_build_id(database_path)
+
+        conn = sqlite3.connect(database_path)
+        stored_build_ids = conn.execute(
+            "SELECT build_id FROM database_build"
+        ).fetchall()
+        conn.close()
+
+        assert stored_build_ids == [(build_id,)]
+
+
+class TestCompressPageTexts:
+    @pytest.mark.parametrize("use_dictionary", [True, False])
+    def test_compress_page_texts_keeps_the_fts_table_working(
+        self, insert_data_in_magazine_number_content_table, use_dictionary
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        conn = sqlite3.connect(database_path)
+        with conn:
+            conn.executemany(
+                "UPDATE magazine_number_content SET magazine_content = ? WHERE id = ?",
+                [("ana are mere", 1), ("ana are pere", 2)],
+            )
+        conn.close()
+        create_folded_content_table(database_path)
+        create_fts_table(database_path, content_table="magazine_number_content_text")
+
+        report = compress_page_texts(database_path, use_dictionary=use_dictionary)
+
+        conn = sqlite3.connect(database_path)
+        dictionary = (
+            conn.execute("SELECT dictionary FROM page_text_dictionary").fetchone()[0]
+            if use_dictionary
+            else None
+        )
+        conn.create_function(
+            "decompress_page_text",
+            1,
+            lambda value: decompress_page_text(value, dictionary),
+        )
+        c = conn.cursor()
+        stored_content = c.execute(
+            "SELECT magazine_content FROM magazine_number_content WHERE id = 1"
+        ).fetchone()[0]
+        stored_normalized_content, stored_folded_content = c.execute(
+            """
+        SELECT magazine_content_normalized, magazine_content_folded
+        FROM magazine_number_content_folded
+        WHERE id = 1
+           """
+        ).fetchone()
+        highlighted_content = c.execute(
+            """
+        SELECT highlight(magazine_number_content_fts, 0, '<', '>')
+        FROM magazine_number_content_fts
+        WHERE magazine_number_content_fts MATCH '"mere"*'
+           """
+        ).fetchall()
+        conn.close()
+
+        assert isinstance(stored_content, bytes)
+        assert decompress_page_text(stored_content, dictionary) == "ana are mere"
+        assert (
+            decompress_page_text(stored_normalized_content, dictionary)
+            == "ana are mere"
+        )
+        assert decompress_page_text(stored_folded_content, dictionary) == "ana are mere"
+        assert highlighted_content == [("ana are <mere>",)]
+        assert report["text_size"] == 6 * len("ana are mere")
+        assert report["compressed_size"] > 0
+        assert (report["dictionary_size"] > 0) == use_dictionary
+        assert report["decompression_time_mean"] > 0
+
+
+class TestCreateTrigramFtsTable:
+    def test_create_trigram_fts_table_with_substring_match_query(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        create_trigram_fts_table(database_path)
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        inserted_data = c.execute(
+            """
+        SELECT rowid
+        FROM magazine_number_content_trigram_fts
+        WHERE magazine_number_content_trigram_fts MATCH '"zine_content_2"'
+           """
+        ).fetchall()
+        conn.close()
+
+        assert inserted_data == [(2,)]
+
+    def test_create_trigram_fts_table_converts_diacritics(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        conn = sqlite3.connect(database_path)
+        with conn:
+            conn.execute(
+                "UPDATE magazine_number_content SET magazine_content = 'Bucureşti'"
+                " WHERE id = 1"
+            )
+        conn.close()
+
+        create_trigram_fts_table(database_path)
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        inserted_data = c.execute(
+            """
+        SELECT rowid
+        FROM magazine_number_content_trigram_fts
+        WHERE magazine_number_content_trigram_fts MATCH '"curesti"'
+           """
+        ).fetchall()
+        conn.close()
+
+        assert inserted_data == [(1,)]
+
+    def test_create_trigram_fts_table_returns_build_time_and_size(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        build_time, index_size = create_trigram_fts_table(database_path)
+
+        assert build_time >= 0
+        assert index_size > 0
+
+
+class TestCreateFtsVocabTable:
+    def test_create_fts_vocab_table_counts_the_documents_of_a_term(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        create_fts_table(database_path)
+
+        create_fts_vocab_table(database_path, "magazine_number_content_fts")
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        inserted_data = c.execute(
+            """
+        SELECT term, doc
+        FROM magazine_number_content_fts_vocab
+        ORDER BY term
+           """
+        ).fetchall()
+        conn.close()
+
+        assert inserted_data == [("1", 1), ("2", 1), ("content", 2), ("magazine", 2)]
+
+
+class TestCreateFtsShardTables:
+    @pytest.mark.parametrize(
+        "shards, expected", [(1, [[1, 2]]), (2, [[1], [2]]), (3, [[1], [2], []])]
+    )
+    def test_get_magazine_ids_by_shard(
+        self, insert_data_in_magazine_number_content_table, shards, expected
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        assert get_magazine_ids_by_shard(database_path, shards) == expected
+
+    def test_create_fts_shard_tables_splits_the_pages_by_magazine(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+
+        create_fts_shard_tables(database_path, 2)
+
+        conn = sqlite3.connect(database_path)
+        c = conn.cursor()
+        shard_0_data = c.execute(
+            """
+        SELECT rowid
+        FROM magazine_number_content_fts_shard_0
+        WHERE magazine_number_content_fts_shard_0 MATCH '"magazine"*'
+           """
+        ).fetchall()
+        shard_1_data = c.execute(
+            """
+        SELECT rowid
+        FROM magazine_number_content_fts_shard_1
+        WHERE magazine_number_content_fts_shard_1 MATCH '"magazine"*'
+           """
+        ).fetchall()
+        conn.close()
+
+        assert shard_0_data == [(1,), (2,)]
+        assert shard_1_data == []
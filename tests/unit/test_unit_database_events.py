@@ -0,0 +1,155 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from application.database_events import (
+    get_read_only_database_uri,
+    set_page_text_decompression,
+    set_pragmas,
+    set_query_time_budget,
+)
+from application.page_text_compression import compress_page_text
+
+# a query that runs until it is interrupted
+ENDLESS_QUERY = """
+WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM numbers)
+SELECT COUNT(*) FROM numbers
+"""
+
+
+class TestSetQueryTimeBudget:
+    def test_set_query_time_budget_interrupts_a_long_query(self):
+        engine = create_engine("sqlite://")
+        set_query_time_budget(engine, 0.05)
+
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError, match="interrupted"):
+                conn.execute(text(ENDLESS_QUERY))
+
+    def test_set_query_time_budget_does_not_interrupt_a_short_query(self):
+        engine = create_engine("sqlite://")
+        set_query_time_budget(engine, 0.05)
+
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError, match="interrupted"):
+                conn.execute(text(ENDLESS_QUERY))
+            # the deadline is reset for every query
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    def test_set_query_time_budget_with_no_time_budget(self):
+        engine = create_engine("sqlite://")
+        set_query_time_budget(engine, None)
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+class TestGetReadOnlyDatabaseUri:
+    @pytest.mark.parametrize(
+        "database_uri, expected",
+        [
+            (
+                "sqlite:////instance/app.db",
+                "sqlite:///file:/instance/app.db?mode=ro&immutable=1&uri=true",
+            ),
+            ("sqlite:///app.db", "sqlite:///file:app.db?mode=ro&immutable=1&uri=true"),
+            (
+                "sqlite:////data/a#b%c d.db",
+                "sqlite:///file:/data/a%2523b%2525c%2520d.db?mode=ro&immutable=1&uri=true",
+            ),
+            ("sqlite://", "sqlite://"),
+            ("sqlite:///file:app.db?uri=true", "sqlite:///file:app.db?uri=true"),
+            ("postgresql://user@host/db", "postgresql://user@host/db"),
+        ],
+    )
+    def test_get_read_only_database_uri(self, database_uri, expected):
+        assert get_read_only_database_uri(database_uri) == expected
+
+    def test_get_read_only_database_uri_opens_the_database_read_only(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        engine = create_engine(get_read_only_database_uri(f"sqlite:///{database_path}"))
+
+        with engine.connect() as conn:
+            assert (
+                conn.execute(
+                    text("SELECT COUNT(*) FROM magazine_number_content")
+                ).scalar()
+                == 2
+            )
+            with pytest.raises(OperationalError, match="readonly"):
+                conn.execute(text("DELETE FROM magazine_number_content"))
+
+    def test_get_read_only_database_uri_with_special_characters_in_the_path(
+        self, tmp_path
+    ):
+        database_folder = tmp_path / "a#b%c d"
+        database_folder.mkdir()
+        database_path = database_folder / "test.db"
+        conn = sqlite3.connect(database_path)
+        with conn:
+            conn.execute("CREATE TABLE magazines(id integer PRIMARY KEY, name text)")
+            conn.execute("INSERT INTO magazines VALUES (1, 'Albina')")
+        conn.close()
+        engine = create_engine(get_read_only_database_uri(f"sqlite:///{database_path}"))
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT name FROM magazines")).scalar() == "Albina"
+
+
+class TestSetPragmas:
+    def test_set_pragmas(self):
+        engine = create_engine("sqlite://")
+        set_pragmas(engine, {"cache_size": -1024, "temp_store": "MEMORY"})
+
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == -1024
+            # 2 is MEMORY
+            assert conn.execute(text("PRAGMA temp_store")).scalar() == 2
+
+
+class TestSetPageTextDecompression:
+    def test_set_page_text_decompression_with_compressed_text(
+        self, insert_data_in_magazine_number_content_table
+    ):
+        database_path = insert_data_in_magazine_number_content_table
+        dictionary = b"magazine_content_"
+        conn = sqlite3.connect(database_path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE page_text_dictionary(id integer PRIMARY KEY,"
+                " dictionary blob)"
+            )
+            conn.execute(
+                "INSERT INTO page_text_dictionary(dictionary) VALUES(?)",
+                (dictionary,),
+            )
+            conn.execute(
+                "UPDATE magazine_number_content SET magazine_content = ?"
+                " WHERE id = 1",
+                (compress_page_text("magazine_content_1", dictionary),),
+            )
+        conn.close()
+        engine = create_engine(f"sqlite:///{database_path}")
+        set_page_text_decompression(engine)
+
+        with engine.connect() as conn:
+            assert conn.execute(
+                text(
+                    "SELECT decompress_page_text(magazine_content)"
+                    " FROM magazine_number_content ORDER BY id"
+                )
+            ).fetchall() == [("magazine_content_1",), ("magazine_content_2",)]
+
+    def test_set_page_text_decompression_with_uncompressed_text(self):
+        engine = create_engine("sqlite://")
+        set_page_text_decompression(engine)
+
+        with engine.connect() as conn:
+            assert (
+                conn.execute(text("SELECT decompress_page_text('text')")).scalar()
+                == "text"
+            )
@@ -0,0 +1,55 @@
+from application.page_text_compression import (
+    MAX_DICTIONARY_SIZE,
+    compress_page_text,
+    decompress_page_text,
+    train_compression_dictionary,
+)
+
+PAGE_TEXT = "Mărţişorul elaborat de Liga Apărării contra Atacurilor Aeriene " * 5
+
+
+# Tests for compress_page_text and decompress_page_text
+class TestCompressPageText:
+    def test_compress_page_text_without_dictionary(self):
+        compressed_text = compress_page_text(PAGE_TEXT)
+
+        assert isinstance(compressed_text, bytes)
+        assert len(compressed_text) < len(PAGE_TEXT.encode("utf-8"))
+        assert decompress_page_text(compressed_text) == PAGE_TEXT
+
+    def test_compress_page_text_with_dictionary(self):
+        dictionary = train_compression_dictionary([PAGE_TEXT, PAGE_TEXT])
+        text = "Liga Apărării contra Atacurilor Aeriene"
+
+        compressed_text = compress_page_text(text, dictionary)
+
+        assert len(compressed_text) < len(compress_page_text(text))
+        assert decompress_page_text(compressed_text, dictionary) == text
+
+    def test_compress_page_text_with_none(self):
+        assert compress_page_text(None) is None
+
+    def test_decompress_page_text_returns_the_uncompressed_text_unchanged(self):
+        assert decompress_page_text(PAGE_TEXT) == PAGE_TEXT
+        assert decompress_page_text(None) is None
+
+
+# Tests for train_compression_dictionary
+class TestTrainCompressionDictionary:
+    def test_train_compression_dictionary_puts_the_most_saving_words_last(self):
+        dictionary = train_compression_dictionary(["mere mere mere ana ana pere "])
+
+        # the words found only once are left out
+        assert dictionary == b"ana mere "
+
+    def test_train_compression_dictionary_size(self):
+        texts = [" ".join(f"word{i}" for i in range(20_000))] * 2
+
+        assert len(train_compression_dictionary(texts, 1_000)) <= 1_000
+        assert (
+            len(train_compression_dictionary(texts, 10 * MAX_DICTIONARY_SIZE))
+            <= MAX_DICTIONARY_SIZE
+        )
+
+    def test_train_compression_dictionary_with_no_words(self):
+        assert train_compression_dictionary(["", None]) == b""
@@ -0,0 +1,41 @@
+from application.search_page.cache_warming import (
+    get_top_search_terms,
+    read_search_log_terms,
+)
+
+
+# Tests for read_search_log_terms
+class TestReadSearchLogTerms:
+    def test_read_search_log_terms_reads_the_rotated_log_files(self, tmp_path):
+        log_line = (
+            "2024-01-01 10:00:00,000 INFO: Formatted search_box parameter to:"
+            " {} [in search_page_routes.py:84]\n"
+        )
+        (tmp_path / "Darwin_App.log").write_text(
+            log_line.format("Bucuresti")
+            + "2024-01-01 10:00:00,000 INFO: Displaying /search page: 1\n",
+            encoding="utf-8",
+        )
+        (tmp_path / "Darwin_App.log.2024-01-01").write_text(
+            log_line.format("Victor Babeș"), encoding="utf-8"
+        )
+
+        assert read_search_log_terms(str(tmp_path / "Darwin_App.log")) == [
+            "Bucuresti",
+            "Victor Babeș",
+        ]
+
+    def test_read_search_log_terms_without_log_file(self, tmp_path):
+        assert read_search_log_terms(str(tmp_path / "Darwin_App.log")) == []
+
+
+# Tests for get_top_search_terms
+class TestGetTopSearchTerms:
+    def test_get_top_search_terms_counts_the_normalized_terms(self):
+        terms = ["Victor Babeș", "bucurești", "Bucuresti", "BUCURESTI", "Bucuresti"]
+
+        assert get_top_search_terms(terms, 2) == ["Bucuresti", "Victor Babeș"]
+        assert get_top_search_terms(terms, 1) == ["Bucuresti"]
+
+    def test_get_top_search_terms_leaves_out_the_terms_not_searched(self):
+        assert get_top_search_terms(["abc", "a" * 201, "abcd"], 5) == ["abcd"]
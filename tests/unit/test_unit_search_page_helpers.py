@@ -1,7 +1,13 @@
 import pytest
 from flask import request
 
-from application.search_page.helpers import format_search_word
+from application.search_page.helpers import (
+    decode_cursor,
+    encode_cursor,
+    format_search_word,
+    pack_ids,
+    unpack_ids,
+)
 
 
 # Tests for store_s_word_in_session()
@@ -113,3 +119,56 @@ class TestFormatSearchWord:
     ):
         formatted_s_word = format_search_word(input)
         assert formatted_s_word == expected
+
+
+# Tests for encode_cursor() and decode_cursor()
+class TestEncodeDecodeCursor:
+    @pytest.mark.parametrize(
+        "direction, key",
+        [
+            ("next", 10708),
+            ("prev", 1),
+            ("next", 2**63 - 1),
+            ("prev", None),
+        ],
+    )
+    def test_decode_cursor_returns_what_was_encoded(self, direction, key):
+        cursor = encode_cursor(direction, key)
+
+        assert decode_cursor(cursor) == (direction, key)
+
+    def test_encode_cursor_is_url_safe(self):
+        cursor = encode_cursor("next", 2**40)
+
+        assert all(c.isalnum() or c in "-_" for c in cursor)
+
+    invalid_cursors = [
+        None,
+        "",
+        "not a cursor!",
+        encode_cursor("up", 1),
+        encode_cursor("next", "1"),
+        encode_cursor("next", True),
+        encode_cursor("next", 2**63),
+        encode_cursor("prev", -(2**63) - 1),
+        encode_cursor("next", 10**30),
+        3,
+    ]
+
+    @pytest.mark.parametrize("cursor", invalid_cursors)
+    def test_decode_cursor_with_invalid_cursor(self, cursor):
+        assert decode_cursor(cursor) is None
+
+
+# Tests for pack_ids and unpack_ids
+class TestPackUnpackIds:
+    @pytest.mark.parametrize("compress", [False, True])
+    @pytest.mark.parametrize("ids", [[], [1], [5, 3, 4_000_000_000, 1]])
+    def test_unpack_ids_returns_what_was_packed(self, ids, compress):
+        assert list(unpack_ids(pack_ids(ids, compress))) == ids
+
+    def test_pack_ids_uses_four_bytes_per_id(self):
+        assert len(pack_ids(range(1000))) == 1 + 4000
+
+    def test_pack_ids_compressed_is_smaller(self):
+        assert len(pack_ids(range(1000), compress=True)) < len(pack_ids(range(1000)))
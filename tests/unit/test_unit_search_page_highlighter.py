@@ -0,0 +1,50 @@
+from application.search_page.highlighter import Highlighter
+from application.search_page.previews import fold_text
+
+
+def highlight(s_word, content):
+    return Highlighter(fold_text(s_word)).add_html_mark_tags(
+        content, fold_text(content)
+    )
+
+
+# Tests for Highlighter
+class TestHighlighter:
+    def test_highlighter_with_variants_of_a_single_word(self):
+        content = "Darwin darwin DARWIN Dărwin"
+
+        assert highlight("darwin", content) == (
+            "<mark>Darwin</mark> <mark>darwin</mark> <mark>DARWIN</mark>"
+            " <mark>Dărwin</mark>"
+        )
+
+    def test_highlighter_doesnt_nest_mark_tags(self):
+        assert highlight("Darwin", "Darwinism Darwin") == (
+            "<mark>Darwin</mark>ism <mark>Darwin</mark>"
+        )
+
+    def test_highlighter_with_the_words_of_a_term_with_several_words(self):
+        content = "D. Andrei Mocioni si ANDREI din Mocionii, nuandrei"
+
+        assert highlight("Andrei Mocioni", content) == (
+            "D. <mark>Andrei Mocioni</mark> si <mark>ANDREI</mark> din"
+            " <mark>Mocioni</mark>i, nuandrei"
+        )
+
+    def test_highlighter_doesnt_highlight_short_words_on_their_own(self):
+        assert highlight("fotbal la Cluj", "fotbal la Cluj, la Cluj") == (
+            "<mark>fotbal la Cluj</mark>, la <mark>Cluj</mark>"
+        )
+
+    def test_highlighter_escapes_the_content(self):
+        assert highlight("Darwin", "<b>Darwin</b> & Wallace") == (
+            "&lt;b&gt;<mark>Darwin</mark>&lt;/b&gt; &amp; Wallace"
+        )
+
+    def test_highlighter_with_no_occurrences(self):
+        assert highlight("Darwin", "Charles Robert") == "Charles Robert"
+
+    def test_highlighter_find_spans(self):
+        highlighter = Highlighter(fold_text("ana are"))
+
+        assert highlighter.find_spans("ana are mere, ana") == [(0, 7), (14, 17)]
@@ -0,0 +1,110 @@
+from cachelib import SimpleCache
+
+from application.search_page.preview_cache import (
+    PreviewCache,
+    get_cached_previews,
+    get_preview_cache_key_prefix,
+)
+
+
+# Tests for PreviewCache
+class TestPreviewCache:
+    def test_preview_cache_get_many_returns_only_the_cached_previews(self):
+        preview_cache = PreviewCache(max_entries=10)
+        preview_cache.set_many({"key_1": "preview_1", "key_2": "preview_2"})
+
+        assert preview_cache.get_many(["key_1", "key_3"]) == {"key_1": "preview_1"}
+
+    def test_preview_cache_evicts_the_least_recently_used_previews(self):
+        preview_cache = PreviewCache(max_entries=2)
+        preview_cache.set_many({"key_1": "preview_1", "key_2": "preview_2"})
+        preview_cache.get_many(["key_1"])
+        preview_cache.set_many({"key_3": "preview_3"})
+
+        assert preview_cache.get_many(["key_1", "key_2", "key_3"]) == {
+            "key_1": "preview_1",
+            "key_3": "preview_3",
+        }
+
+    def test_preview_cache_without_in_process_tier_keeps_no_previews(self):
+        preview_cache = PreviewCache(max_entries=0)
+        preview_cache.set_many({"key_1": "preview_1"})
+
+        assert preview_cache.get_many(["key_1"]) == {}
+
+    def test_preview_cache_reads_the_missing_previews_from_the_backend(self):
+        backend = SimpleCache()
+        backend.set_many({"key_1": "preview_1"})
+        preview_cache = PreviewCache(max_entries=10, backend=backend)
+
+        assert preview_cache.get_many(["key_1", "key_2"]) == {"key_1": "preview_1"}
+        assert preview_cache.stats["backend_hits"] == 1
+        # the preview read from the backend isn't kept in the memory of the
+        # process too
+        assert preview_cache.stats["entries"] == 0
+
+    def test_preview_cache_writes_the_previews_only_to_the_backend(self):
+        backend = SimpleCache()
+        preview_cache = PreviewCache(max_entries=10, backend=backend)
+        preview_cache.set_many({"key_1": "preview_1"})
+
+        assert backend.get("key_1") == "preview_1"
+        assert preview_cache.stats["entries"] == 0
+        backend.clear()
+        assert preview_cache.get_many(["key_1"]) == {}
+
+    def test_preview_cache_stats(self):
+        preview_cache = PreviewCache(max_entries=10)
+        preview_cache.set_many({"key_1": "preview_1"})
+        preview_cache.get_many(["key_1", "key_2", "key_3"])
+
+        stats = preview_cache.stats
+
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["hit_ratio"] == 1 / 3
+        assert stats["entries"] == 1
+        assert stats["memory_bytes"] > 0
+
+    def test_preview_cache_clear(self):
+        preview_cache = PreviewCache(max_entries=10)
+        preview_cache.set_many({"key_1": "preview_1"})
+        preview_cache.get_many(["key_1"])
+        preview_cache.clear()
+
+        assert preview_cache.get_many(["key_1"]) == {}
+        assert preview_cache.stats["memory_bytes"] == 0
+        assert preview_cache.stats["hits"] == 0
+
+
+# Tests for get_preview_cache_key_prefix
+class TestGetPreviewCacheKeyPrefix:
+    def test_get_preview_cache_key_prefix_normalizes_the_searched_term(self):
+        assert get_preview_cache_key_prefix(
+            "python", "Bucureşti  Noi", 200
+        ) == get_preview_cache_key_prefix("python", "bucuresti+noi", 200)
+
+    def test_get_preview_cache_key_prefix_with_different_preview_options(self):
+        assert get_preview_cache_key_prefix(
+            "python", "bucuresti", 200
+        ) != get_preview_cache_key_prefix("python", "bucuresti", 100)
+
+
+# Tests for get_cached_previews
+class TestGetCachedPreviews:
+    def test_get_cached_previews_builds_only_the_missing_previews(self):
+        preview_cache = PreviewCache(max_entries=10)
+        preview_cache.set_many({"prefix_1": "cached preview 1"})
+        built_for = []
+
+        def get_previews(results):
+            built_for.extend(result[-1] for result in results)
+            return [[result[-1], f"preview {result[-1]}"] for result in results]
+
+        previews = get_cached_previews(
+            preview_cache, [("name", 2), ("name", 1)], "prefix", get_previews
+        )
+
+        assert previews == [[2, "preview 2"], [1, "cached preview 1"]]
+        assert built_for == [2]
+        assert preview_cache.get_many(["prefix_2"]) == {"prefix_2": "preview 2"}
@@ -1,11 +1,10 @@
 import pytest
 
 from application.search_page.previews import (
-    add_html_mark_tags_to_the_searched_term,
     add_html_tags_around_preview_string_parantheses,
     convert_diacritics_to_basic_latin_characters,
+    fold_text,
     get_all_start_and_end_indexes_for_preview_substrings,
-    get_distinct_s_word_variants,
     get_indexes_for_highlighting_s_word,
     get_preview_string,
     merge_overlapping_preview_substrings,
@@ -129,6 +128,22 @@ class TestConvertDiacriticsToBasicLatinCharacters:
         )
 
 
+# Tests for fold_text
+class TestFoldText:
+    def test_fold_text_with_diacritics_and_uppercase_letters(
+        self,
+    ):
+        assert fold_text("Mărţişor BUCUREŞTI") == "martisor bucuresti"
+
+    def test_fold_text_keeps_the_length_of_the_text(
+        self,
+    ):
+        text = "İstanbul Ţară"
+
+        assert fold_text(text) == "İstanbul tara"
+        assert len(fold_text(text)) == len(text)
+
+
 # Tests for get_indexes_for_highlighting_s_word
 class TestGetIndexesForHighlightingSWord:
     def test_get_indexes_for_highlighting_s_word_with_a_single_letter(
@@ -154,55 +169,25 @@ class TestGetIndexesForHighlightingSWord:
         )
         assert get_indexes_for_highlighting_s_word(s_word, content) == [10, 105, 165]
 
-
-# Tests for get_distinct_s_word_variants
-class TestGetDistinctSWordsVariants:
-    def test_get_distinct_s_word_variants_with_term_differing_in_letter_case(
+    def test_get_indexes_for_highlighting_s_word_with_overlapping_occurrences(
         self,
     ):
-        content = "Darwin darwin Darwin DARWIN"
-        s_word_string_length = 6
-        indexes_for_highlighting_s_word = [0, 7, 14, 21]
+        assert get_indexes_for_highlighting_s_word("aa", "aaaaa baa") == [0, 2, 7]
 
-        assert get_distinct_s_word_variants(
-            indexes_for_highlighting_s_word, content, s_word_string_length
-        ) == ["Darwin", "darwin", "DARWIN"]
-
-    def test_get_distinct_s_word_variants_with_term_differing_in_diacritics(
+    def test_get_indexes_for_highlighting_s_word_with_folded_content(
         self,
     ):
-        content = "Babeș Babes Babeș Babes"
-        s_word_string_length = 5
-        indexes_for_highlighting_s_word = [0, 6, 12, 18]
-
-        assert get_distinct_s_word_variants(
-            indexes_for_highlighting_s_word, content, s_word_string_length
-        ) == ["Babeș", "Babes"]
+        content = "Ana are mere"
+        folded_content = "ana are mere"
 
+        assert get_indexes_for_highlighting_s_word("ANA", content, folded_content) == [
+            0
+        ]
 
-# Tests for add_html_mark_tags_to_the_searched_term
-class TestAddHtmlMarkTagsToTheSearchedTerm:
-    def test_add_html_mark_tags_to_the_searched_term_with_a_single_variant(
-        self,
-    ):
-        distinct_s_word_variants = ["Darwin"]
-        content = "Charles Darwin was a great scientist"
-
-        assert (
-            add_html_mark_tags_to_the_searched_term(distinct_s_word_variants, content)
-            == "Charles <mark>Darwin</mark> was a great scientist"
-        )
-
-    def test_add_html_mark_tags_to_the_searched_term_with_a_multiple_variants(
+    def test_get_indexes_for_highlighting_s_word_with_an_empty_term(
         self,
     ):
-        distinct_s_word_variants = ["Babeș", "BABEȘ", "Babes"]
-        content = "Different versions of Babeș name: Babeș, BABEȘ, Babes."
-
-        assert (
-            add_html_mark_tags_to_the_searched_term(distinct_s_word_variants, content)
-            == "Different versions of <mark>Babeș</mark> name: <mark>Babeș</mark>, <mark>BABEȘ</mark>, <mark>Babes</mark>."
-        )
+        assert get_indexes_for_highlighting_s_word("", "Ana are mere") == []
 
 
 # Tests for get_all_start_and_end_indexes_for_preview_substrings
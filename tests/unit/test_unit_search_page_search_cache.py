@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from cachelib import FileSystemCache, SimpleCache
+
+from application.cache_backends import get_cache_lock
+from application.search_page.search_cache import (
+    SearchCache,
+    make_search_cache_key,
+    normalize_search_term,
+)
+
+
+# Tests for SearchCache
+class TestSearchCache:
+    def test_search_cache_make_key_is_namespaced_by_the_build_id(self):
+        assert SearchCache(build_id="build_1").make_key(
+            "results", "Bucuresti", None
+        ) != SearchCache(build_id="build_2").make_key("results", "Bucuresti", None)
+
+    def test_search_cache_get_many_returns_only_the_cached_data(self):
+        backend = SimpleCache()
+        search_cache = SearchCache(backend=backend, build_id="build")
+        backend.set_many({"key_1": "data_1", "key_2": "data_2"})
+
+        assert search_cache.get_many(["key_1", "key_3"]) == {"key_1": "data_1"}
+        assert search_cache.get_many([]) == {}
+
+    def test_search_cache_get_and_add(self):
+        search_cache = SearchCache(backend=SimpleCache(), build_id="build")
+        search_cache.add("key_1", "data_1")
+        search_cache.add("key_1", "data_2")
+
+        assert search_cache.get("key_1") == "data_1"
+        assert search_cache.get("key_2") is None
+
+    def test_search_cache_get_or_compute_computes_the_data_once(self, tmp_path):
+        search_cache = SearchCache(
+            backend=SimpleCache(), build_id="build", lock_folder=str(tmp_path)
+        )
+        compute = mock.Mock(return_value="data_1")
+
+        assert search_cache.get_or_compute("key_1", compute) == "data_1"
+        assert search_cache.get_or_compute("key_1", compute) == "data_1"
+        compute.assert_called_once()
+
+    def test_search_cache_get_or_compute_is_single_flight(self, tmp_path):
+        search_cache = SearchCache(
+            backend=SimpleCache(), build_id="build", lock_folder=str(tmp_path)
+        )
+        barrier = threading.Barrier(4)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "data_1"
+
+        def get_or_compute():
+            barrier.wait()
+            return search_cache.get_or_compute("key_1", compute)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: get_or_compute(), range(4)))
+
+        assert results == ["data_1"] * 4
+        assert len(calls) == 1
+
+    def test_search_cache_get_or_compute_computes_the_keys_in_parallel(self, tmp_path):
+        search_cache = SearchCache(
+            backend=SimpleCache(), build_id="build", lock_folder=str(tmp_path)
+        )
+        computing = threading.Event()
+        done = threading.Event()
+
+        def compute():
+            computing.set()
+            done.wait(5)
+            return "data_1"
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(search_cache.get_or_compute, "key_1", compute)
+            computing.wait(5)
+            try:
+                start = time.monotonic()
+                assert search_cache.get_or_compute("key_25", lambda: "data_2") == (
+                    "data_2"
+                )
+                assert time.monotonic() - start < 1
+            finally:
+                done.set()
+
+            assert future.result() == "data_1"
+
+        assert search_cache._process_locks == {}
+
+    def test_search_cache_get_or_compute_returns_the_stale_data(self, tmp_path):
+        backend = FileSystemCache(str(tmp_path / "cache"))
+        search_cache = SearchCache(
+            backend=backend, build_id="build", lock_folder=str(tmp_path)
+        )
+        backend.set("key_1", ("stale_data", 0.1, time.time() - 1))
+        lock = get_cache_lock(backend, "key_1", 30, str(tmp_path))
+        lock.acquire()
+        compute = mock.Mock(return_value="data_1")
+        try:
+            data = search_cache.get_or_compute("key_1", compute)
+        finally:
+            lock.release()
+
+        assert data == "stale_data"
+        compute.assert_not_called()
+        assert search_cache.get_or_compute("key_1", compute) == "data_1"
+
+    @pytest.mark.parametrize(
+        "early_refresh_beta, refreshed", [(0, False), (1_000_000, True)]
+    )
+    def test_search_cache_get_or_compute_refreshes_the_data_early(
+        self, tmp_path, early_refresh_beta, refreshed
+    ):
+        backend = SimpleCache()
+        search_cache = SearchCache(
+            backend=backend,
+            build_id="build",
+            early_refresh_beta=early_refresh_beta,
+            lock_folder=str(tmp_path),
+        )
+        backend.set("key_1", ("data_1", 1, time.time() + 60))
+
+        assert search_cache.get_or_compute("key_1", lambda: "data_2") == (
+            "data_2" if refreshed else "data_1"
+        )
+
+
+# Tests for normalize_search_term
+class TestNormalizeSearchTerm:
+    def test_normalize_search_term(self):
+        assert normalize_search_term(" Bucureşti+NOI  ") == "bucuresti noi"
+
+
+# Tests for make_search_cache_key
+class TestMakeSearchCacheKey:
+    def test_make_search_cache_key(self):
+        assert (
+            make_search_cache_key(
+                "build", "results", "Bucureşti+Noi", None, "substring"
+            )
+            == "search_build_results_None_substring_bucuresti noi"
+        )
+
+    def test_make_search_cache_key_without_folding_the_term(self):
+        assert (
+            make_search_cache_key(
+                "build", "page", " Bucureşti  Noi ", 2, fold_term=False
+            )
+            == "search_build_page_2_Bucureşti Noi"
+        )
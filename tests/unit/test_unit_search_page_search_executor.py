@@ -0,0 +1,106 @@
+from array import array
+from collections import namedtuple
+
+import pytest
+
+from application.search_page.search_executor import (
+    count_hits_by_magazine_name,
+    get_ids_for_magazine_filter,
+    get_page_ids,
+    get_results_count,
+)
+
+Hit = namedtuple("Hit", ["name", "year", "magazine_number", "magazine_page", "id"])
+
+
+# Tests for count_hits_by_magazine_name
+class TestCountHitsByMagazineName:
+    def test_count_hits_by_magazine_name_with_no_hits(self):
+        assert count_hits_by_magazine_name([]) == []
+
+    def test_count_hits_by_magazine_name_groups_and_orders_by_name(self):
+        hits = [
+            Hit("Amicul Şcoalei (1925-1935)", "ANUL 1930", "Nr.1", 1, 3),
+            Hit("Albina (1866-1876)", "ANUL 1866", "Nr.1", 1, 1),
+            Hit("Amicul Şcoalei (1925-1935)", "ANUL 1930", "Nr.1", 2, 4),
+            Hit("Albina (1866-1876)", "ANUL 1866", "Nr.1", 2, 2),
+            Hit("Amicul Şcoalei (1925-1935)", "ANUL 1931", "Nr.2", 1, 5),
+        ]
+
+        assert count_hits_by_magazine_name(hits) == [
+            ("Albina (1866-1876)", 2),
+            ("Amicul Şcoalei (1925-1935)", 3),
+        ]
+
+
+# Tests for get_results_count
+class TestGetResultsCount:
+    distinct_magazines_and_count = [
+        ("Albina (1866-1876)", 26),
+        ("Amicul Şcoalei (1925-1935)", 186),
+    ]
+
+    @pytest.mark.parametrize(
+        "magazine_filter, expected",
+        [
+            (None, 212),
+            ("", 212),
+            ("Albina (1866-1876)", 26),
+            ("Amicul Şcoalei (1925-1935)", 186),
+            ("inexistent magazine", 0),
+        ],
+    )
+    def test_get_results_count(self, magazine_filter, expected):
+        assert (
+            get_results_count(self.distinct_magazines_and_count, magazine_filter)
+            == expected
+        )
+
+
+# Tests for get_ids_for_magazine_filter
+class TestGetIdsForMagazineFilter:
+    search_results = {
+        "distinct_magazines_and_count": [
+            ("Albina (1866-1876)", 2),
+            ("Amicul Şcoalei (1925-1935)", 1),
+        ],
+        "ids": array("I", [1, 2, 3]),
+        "ids_by_magazine_name": {
+            "Albina (1866-1876)": array("I", [2, 1]),
+            "Amicul Şcoalei (1925-1935)": array("I", [3]),
+        },
+    }
+
+    @pytest.mark.parametrize(
+        "magazine_filter, expected",
+        [
+            (None, [1, 2, 3]),
+            ("", [1, 2, 3]),
+            ("Albina (1866-1876)", [2, 1]),
+            ("inexistent magazine", []),
+        ],
+    )
+    def test_get_ids_for_magazine_filter(self, magazine_filter, expected):
+        assert (
+            list(get_ids_for_magazine_filter(self.search_results, magazine_filter))
+            == expected
+        )
+
+    def test_get_ids_for_magazine_filter_when_ids_were_not_kept(self):
+        search_results = {
+            "distinct_magazines_and_count": [],
+            "ids": None,
+            "ids_by_magazine_name": None,
+        }
+
+        assert get_ids_for_magazine_filter(search_results) is None
+
+
+# Tests for get_page_ids
+class TestGetPageIds:
+    @pytest.mark.parametrize(
+        "page, expected",
+        [(1, [5, 4]), (2, [3, 2]), (3, [1]), (4, []), (0, [5, 4])],
+    )
+    def test_get_page_ids(self, page, expected):
+        assert get_page_ids(array("I", [5, 4, 3, 2, 1]), page, 2) == expected
@@ -0,0 +1,92 @@
+import threading
+
+from flask import Flask
+
+from application.search_page.search_pipeline import (
+    STAGE_EXECUTOR_EXTENSION,
+    format_stage_timings,
+    init_stage_executor,
+    run_search_stages,
+)
+
+
+# Tests for run_search_stages
+class TestRunSearchStages:
+    def test_run_search_stages_one_after_another(self):
+        thread_names = []
+
+        def stage(value):
+            thread_names.append(threading.current_thread().name)
+            return value
+
+        results, timings = run_search_stages(
+            {"page": lambda: stage(1), "previews": lambda: stage(2)}
+        )
+
+        assert results == {"page": 1, "previews": 2}
+        assert list(timings) == ["page", "previews"]
+        assert all(seconds >= 0 for seconds in timings.values())
+        assert thread_names == [threading.current_thread().name] * 2
+
+    def test_run_search_stages_concurrently(self):
+        app = Flask(__name__)
+        app.config["SEARCH_STAGE_WORKERS"] = 2
+        app.config["PREVIEW_DEFERRED_LOADING"] = False
+        init_stage_executor(app)
+        thread_names = []
+
+        def stage(value):
+            thread_names.append(threading.current_thread().name)
+            return value
+
+        with app.app_context():
+            results, timings = run_search_stages(
+                {"page": lambda: stage(1), "previews": lambda: stage(2)},
+                concurrent=True,
+            )
+
+        assert results == {"page": 1, "previews": 2}
+        assert list(timings) == ["page", "previews"]
+        assert all(name.startswith("search_stage") for name in thread_names)
+
+    def test_run_search_stages_concurrently_without_workers(self):
+        app = Flask(__name__)
+        app.config["SEARCH_STAGE_WORKERS"] = 0
+        app.config["PREVIEW_DEFERRED_LOADING"] = False
+        init_stage_executor(app)
+        thread_names = []
+
+        def stage(value):
+            thread_names.append(threading.current_thread().name)
+            return value
+
+        with app.app_context():
+            results, _ = run_search_stages(
+                {"page": lambda: stage(1), "previews": lambda: stage(2)},
+                concurrent=True,
+            )
+
+        assert app.extensions[STAGE_EXECUTOR_EXTENSION] is None
+        assert results == {"page": 1, "previews": 2}
+        assert thread_names == [threading.current_thread().name] * 2
+
+
+# Tests for init_stage_executor
+class TestInitStageExecutor:
+    def test_init_stage_executor_with_deferred_previews(self):
+        app = Flask(__name__)
+        app.config["SEARCH_STAGE_WORKERS"] = 2
+        app.config["PREVIEW_DEFERRED_LOADING"] = True
+
+        init_stage_executor(app)
+
+        assert app.extensions[STAGE_EXECUTOR_EXTENSION] is None
+
+
+# Tests for format_stage_timings
+class TestFormatStageTimings:
+    def test_format_stage_timings(self):
+        assert (
+            format_stage_timings({"page": 0.0012, "previews": 0.01234})
+            == "page: 1.2 ms, previews: 12.3 ms"
+        )